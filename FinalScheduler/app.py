@@ -1,10 +1,11 @@
-from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException, Form, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException, Form, Body, Query, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, List
 from copy import deepcopy
+import asyncio
 import json
 import logging
 from datetime import datetime
@@ -16,8 +17,20 @@ load_dotenv()
 
 import tempfile
 from pathlib import Path
-from nlp_processor import TimetableNLPProcessor
-from db_utils import get_config_by_params
+from nlp_processor import TimetableNLPProcessor, nlp_result_cache
+from nlp_rules import rule_stats
+from db_utils import get_config_entry_async, start_config_change_watcher, ensure_config_indexes, close_connections
+from result_store import ResultScope, NS_RESULTS, NS_PARSED_CONFIG
+from state_backend import state_backend, JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED
+from llm_providers import provider_registry
+from llm_transport import llm_transport
+from rate_limiter import rate_limiter
+from provider_router import ProviderRouter
+from pdf_extraction import shutdown_pdf_pool
+from timetable_extractor import shutdown_text_executor
+from structured_loader import load_structured
+from text_compaction import compaction_stats
+from upload_spool import SpooledUpload, UploadLimitMiddleware, UploadTooLarge, spool_upload
 
 # =============================================================================
 # CONFIGURATION & SETUP
@@ -30,27 +43,39 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic here
-    if USE_CEREBRAS:
-        print("Using Cerebras Inference")
-    elif llm_extractor:
-        print("Using Gemini API")
+    providers = provider_registry.names
+    if providers:
+        print(f"LLM providers registered (lazy): {', '.join(providers)}")
+        print("Provider health is probed in the background")
     else:
         print("WARNING: No LLM extraction available!")
-        print("   Please set CEREBRAS_API_KEY or GEMINI_API_KEY")
+        print("   Please set CEREBRAS_API_KEY, GROQ_API_KEY or GEMINI_API_KEY")
         print("   in your environment variables.")
 
-    if USE_CEREBRAS:
-        print("\nCerebras Ultra-Fast Extraction Ready!")
-    elif llm_extractor:
-        print("\nLLM extraction is ready")
-    else:
-        print("\nLLM extraction disabled")
-
     print("\nAPI Documentation available at:")
     print("Swagger UI: http://localhost:8000/docs")
     print("ReDoc: http://localhost:8000/redoc")
     print("="*60 + "\n")
+
+    # Provider health probes run off the startup path
+    probe_task = asyncio.create_task(provider_registry.run_health_probes()) if providers else None
+
+    # Index bootstrap runs off the startup path; MongoDB is connected lazily
+    index_task = asyncio.create_task(ensure_config_indexes())
+
+    # Push-based config cache invalidation (only when CONFIG_CACHE_CHANGE_STREAMS is set)
+    config_watcher = start_config_change_watcher()
     yield
+    if config_watcher is not None:
+        config_watcher.set()
+    index_task.cancel()
+    if probe_task is not None:
+        probe_task.cancel()
+    await llm_transport.aclose()
+    llm_transport.close()
+    shutdown_pdf_pool()
+    shutdown_text_executor()
+    close_connections()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -72,6 +97,22 @@ allowed_origins = [
 if "http://localhost:5173" not in allowed_origins:
     allowed_origins.append("http://localhost:5173")
 
+# App configuration
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_FORM_OVERHEAD = 1024 * 1024  # multipart boundaries and form fields on top of the file
+SSE_KEEPALIVE_SECONDS = 5  # idle streams get a keep-alive comment and a disconnect check
+ALLOWED_EXTENSIONS = {'.pdf', '.xlsx', '.xls', '.xlsm', '.csv', '.json'}
+UPLOAD_PATHS = {'/api/parse-timetable', '/api/parse-timetable/stream'}
+
+# Oversized uploads are refused before the multipart parser reads them
+# (added before CORS so the 413 still carries the CORS headers)
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=MAX_FILE_SIZE + MAX_FORM_OVERHEAD,
+    paths=UPLOAD_PATHS,
+    detail='File too large. Maximum size is 50MB.'
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -80,10 +121,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# App configuration
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-ALLOWED_EXTENSIONS = {'.pdf', '.xlsx', '.xls', '.xlsm', '.json'}
-
 # Health check endpoint
 @app.get("/health")
 def health_check():
@@ -92,7 +129,7 @@ def health_check():
         "status": "ok",
         "service": "finalscheduler",
         "timestamp": datetime.now().isoformat(),
-        "llm_backend": "cerebras" if USE_CEREBRAS else ("gemini" if llm_extractor else "none"),
+        "llm_backend": (provider_registry.primary() or "none").lower(),
     }
 
 # =============================================================================
@@ -131,91 +168,22 @@ class NLPRequest(BaseModel):
     organisation_id: Optional[str] = Field(None, description="The MongoDB ObjectId of the Organisation")
 
 # =============================================================================
-# ULTRA-FAST LLM EXTRACTOR SETUP WITH CEREBRAS + GEMINI DYNAMIC FALLBACK
+# ULTRA-FAST LLM EXTRACTOR SETUP WITH CEREBRAS + GROQ + GEMINI DYNAMIC FALLBACK
 # =============================================================================
 
-# Both extractors are initialized independently at startup.
-# This allows runtime fallback: if Cerebras returns 429 mid-session,
-# the request is automatically retried with Gemini without crashing.
-from timetable_extractor import TimetableExtractor
-
-cerebras_extractor = None
-groq_extractor = None
-gemini_extractor = None
-USE_CEREBRAS = False
-
-# 1. Initialize Cerebras (Primary - ultra-fast)
-try:
-    CEREBRAS_API_KEY = os.getenv('CEREBRAS_API_KEY')
-    if CEREBRAS_API_KEY:
-        cerebras_extractor = TimetableExtractor(CEREBRAS_API_KEY)
-        if getattr(cerebras_extractor, 'is_connected', False):
-            USE_CEREBRAS = True
-            logger.info("Cerebras extractor ready (primary)")
-        else:
-            logger.warning("Cerebras startup ping failed (likely 429). Keeping it active for runtime retries.")
-            # We DO NOT set cerebras_extractor = None here anymore!
-            # A rate limit is temporary. We want the runtime router to keep trying it.
-    else:
-        logger.warning("CEREBRAS_API_KEY not set - Cerebras disabled")
-except Exception as e:
-    logger.warning(f"Cerebras initialization failed: {e}")
-    cerebras_extractor = None
-
-# 2. Initialize Groq (Secondary - ultra-fast)
-try:
-    GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-    if GROQ_API_KEY:
-        groq_extractor = TimetableExtractor(
-            cerebras_api_key=GROQ_API_KEY,
-            endpoint_url="https://api.groq.com/openai/v1/chat/completions",
-            model="llama-3.1-8b-instant"
-        )
-        if getattr(groq_extractor, 'is_connected', False):
-            logger.info("Groq extractor ready (secondary)")
-        else:
-            logger.warning("Groq startup ping failed (likely 429). Keeping it active for runtime retries.")
-            # DO NOT set groq_extractor = None. Keep it active for the router!
-    else:
-        logger.warning("GROQ_API_KEY not set - Groq disabled")
-except Exception as e:
-    logger.warning(f"Groq initialization failed: {e}")
-    groq_extractor = None
-
-# 3. Initialize Gemini (Tertiary - highly reliable fallback)
-try:
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    if GEMINI_API_KEY:
-        gemini_extractor = TimetableExtractor(
-            cerebras_api_key=GEMINI_API_KEY,
-            endpoint_url="https://generativelanguage.googleapis.com/v1beta/openai/chat/completions",
-            model="gemini-2.0-flash"
-        )
-        logger.info("Gemini extractor ready (fallback)")
-    else:
-        logger.warning("GEMINI_API_KEY not set - Gemini disabled")
-except Exception as e:
-    logger.warning(f"Gemini initialization failed: {e}")
-    gemini_extractor = None
-
-# Keep llm_extractor as a single reference for backward compatibility
-# (used by health check, status endpoints, etc.)
-llm_extractor = cerebras_extractor or gemini_extractor
+# Providers are registered from their API keys but their extractors are built
+# lazily on first use; no network call happens at import time. Health comes
+# from background probes (started in lifespan) and from real request outcomes
+# (see llm_providers.py).
 
 def get_extractor_with_fallback():
     """
-    Returns extractors in priority order: [Cerebras, Groq, Gemini]
-    The parse endpoint iterates this list and uses the first one that succeeds.
-    If Cerebras/Groq return 429 mid-session, it automatically shifts to the next.
+    Returns extractors ordered by the provider health table: healthy first,
+    then unknown, then unhealthy, with open circuit breakers last, keeping the
+    [Cerebras, Groq, Gemini] priority within each group. Every provider stays
+    in the list; the router skips open breakers per call.
     """
-    extractors = []
-    if cerebras_extractor is not None:
-        extractors.append(("Cerebras", cerebras_extractor))
-    if groq_extractor is not None:
-        extractors.append(("Groq", groq_extractor))
-    if gemini_extractor is not None:
-        extractors.append(("Gemini", gemini_extractor))
-    return extractors
+    return provider_registry.ordered_extractors()
 
 # Import timetable modules
 try:
@@ -227,42 +195,113 @@ except ImportError as e:
 # GLOBAL STATE MANAGEMENT
 # =============================================================================
 
-# Store the latest timetable generation results
-timetable_results = {
-    "status": "not_started",
-    "timestamp": None,
-    "data": None,
-    "parsed_config": None
-}
+# Parsed configs, generated timetables, job state and GA progress live in the
+# shared state backend (see state_backend.py): in-process by default, Redis
+# when STATE_BACKEND=redis so several workers/containers can share them.
+# Scoped documents are keyed by organisation/course/year/semester/job id.
+
+def result_scope(
+    organisation_id: Optional[str] = Query(None, description="The MongoDB ObjectId of the Organisation"),
+    course: Optional[str] = Query(None, description="Course Name (e.g., b.tech)"),
+    year: Optional[str] = Query(None, description="Year (e.g., 2nd)"),
+    semester: Optional[str] = Query(None, description="Semester (e.g., 3rd)")
+) -> ResultScope:
+    """FastAPI dependency resolving the tenant scope of a stored result"""
+    return ResultScope.build(organisation_id, course, year, semester)
+
+def get_completed_result(scope: ResultScope, job_id: Optional[str] = None, rank: int = 1) -> Dict[str, Any]:
+    """Return the exported solution of the given rank from a completed job, or raise 404"""
+    stored = state_backend.get(NS_RESULTS, scope, job_id)
+    if not stored or stored.get("status") != "completed" or not stored.get("solutions"):
+        raise HTTPException(status_code=404, detail="No timetables generated yet")
 
-# Store dynamic update results
-latest_dynamic_update = {
-    "status": "not_started",
-    "timestamp": None,
-    "data": None,
-    "events": None
-}
+    solutions = stored["solutions"]
+    if not 1 <= rank <= len(solutions):
+        raise HTTPException(status_code=404, detail=f"Solution rank {rank} not found")
+    return solutions[rank - 1]
 
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
 
+def start_job(job_id: str, scope: ResultScope, kind: str):
+    """Record a new generation job in the shared state backend"""
+    state_backend.set_job(job_id, {
+        "job_id": job_id,
+        "kind": kind,
+        "status": JOB_QUEUED,
+        "scope": scope._asdict(),
+        "created_at": datetime.now().isoformat()
+    })
+
+def finish_job(job_id: str, scope: ResultScope, status: str, **extra) -> Dict[str, Any]:
+    """Mark a job completed/failed and store its result document under the scope"""
+    document = {
+        "status": status,
+        "job_id": job_id,
+        "timestamp": datetime.now().isoformat(),
+        **extra
+    }
+    state_backend.put(NS_RESULTS, scope, document, job_id=job_id)
+    state_backend.update_job(job_id, status=status, finished_at=document["timestamp"], error=extra.get("error"))
+    return document
+
+def run_generation(config: Dict[str, Any], job_id: str, data_obj: Optional["TimetableData"] = None) -> List[Dict[str, Any]]:
+    """
+    Run the GA for a config and export the top solutions.
+    A pre-compiled TimetableData (e.g. from the config cache) skips re-processing.
+    Blocking and CPU-bound: call via asyncio.to_thread from async handlers so
+    the event loop keeps serving other requests. Progress is published to the
+    state backend under the job id.
+    Returns an empty list if no valid solution was found.
+    """
+    state_backend.update_job(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+
+    if data_obj is None:
+        data_obj = TimetableData(config_dict=config)
+    genetic_algo = GeneticAlgorithm(
+        data_obj,
+        progress_callback=lambda progress: state_backend.set_progress(job_id, progress)
+    )
+    genetic_algo.initialize_population()
+    genetic_algo.evolve()
+
+    # Top 3 solutions
+    solutions = genetic_algo.get_best_solution()
+    if not solutions:
+        return []
+
+    exported_solutions = []
+    for idx, sol in enumerate(solutions, start=1):
+        exporter = TimetableExporter(sol, data_obj)
+        exported_solutions.append({
+            "rank": idx,
+            "fitness": sol.fitness_score,
+            "constraint_violations": sol.constraint_violations,
+            "sections": exporter.get_section_wise_data(),
+            "faculty": exporter.get_faculty_wise_data(),
+            "detailed": exporter.get_detailed_data(),
+            "statistics": exporter.get_statistics(),
+        })
+    return exported_solutions
+
 def allowed_file(filename: str) -> bool:
     """Check if uploaded file has allowed extension"""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
-async def generate_timetables_async(config_data: Optional[Dict] = None):
+async def generate_timetables_async(config_data: Optional[Dict] = None, scope: Optional[ResultScope] = None, job_id: Optional[str] = None):
     """
     Generate timetables in background
     Args:
         config_data (dict): Configuration to use, or None to use default
+        scope (ResultScope): Tenant scope to store the results under
+        job_id (str): Job id to store the results under (generated if omitted)
     """
-    global timetable_results
+    scope = scope or ResultScope.build()
+    job_id = job_id or state_backend.new_job_id()
+    start_job(job_id, scope, "generate")
+
     try:
-        # Update status to in progress
-        timetable_results["status"] = "in_progress"
-        timetable_results["timestamp"] = datetime.now().isoformat()
-        
         # Use provided config or load from file
         if config_data:
             config = config_data
@@ -273,47 +312,23 @@ async def generate_timetables_async(config_data: Optional[Dict] = None):
                     config = json.load(f)
                 logger.info("Using default configuration file")
             except FileNotFoundError:
-                timetable_results["status"] = "failed"
-                timetable_results["error"] = "Default config file not found!"
+                finish_job(job_id, scope, JOB_FAILED, error="Default config file not found!")
                 return
         
-        # Initialize timetable data and genetic algorithm
+        # Generate population, evolve and export off the event loop
         logger.info("Initializing timetable generation...")
-        data = TimetableData(config_dict=config)
-        ga = GeneticAlgorithm(data)
-        
-        # Generate population and evolve
-        ga.initialize_population()
-        ga.evolve()
-        
-        # Get the best solution
-        best_solution = ga.get_best_solution()
-        if not best_solution:
-            timetable_results["status"] = "failed"
-            timetable_results["error"] = "No valid solution found!"
+        exported_solutions = await asyncio.to_thread(run_generation, config, job_id)
+        if not exported_solutions:
+            finish_job(job_id, scope, JOB_FAILED, error="No valid solution found!")
             logger.error("Failed to find valid timetable solution")
             return
         
-        # Export results in all formats
-        logger.info("Exporting timetable results...")
-        exporter = TimetableExporter(best_solution, data)
-        
-        # Store all generated data
-        timetable_results["data"] = {
-            "sections": exporter.get_section_wise_data(),
-            "faculty": exporter.get_faculty_wise_data(),
-            "detailed": exporter.get_detailed_data(),
-            "statistics": exporter.get_statistics()
-        }
-        
-        # Mark as completed
-        timetable_results["status"] = "completed"
-        timetable_results["timestamp"] = datetime.now().isoformat()
+        # Store all generated data and mark as completed
+        finish_job(job_id, scope, JOB_COMPLETED, solutions=exported_solutions)
         logger.info("Timetable generation completed successfully")
         
     except Exception as e:
-        timetable_results["status"] = "failed"
-        timetable_results["error"] = str(e)
+        finish_job(job_id, scope, JOB_FAILED, error=str(e))
         logger.error(f"Timetable generation failed: {str(e)}")
 
 def apply_events_to_config(config: Dict, events: List[Dict]) -> Dict:
@@ -432,98 +447,100 @@ async def home():
         'message': 'Smart Timetable Generator API with Ultra-Fast Cerebras',
         'status': 'running',
         'version': '3.0',
-        'llm_backend': 'Cerebras' if USE_CEREBRAS else 'Gemini'
+        'llm_backend': provider_registry.primary() or 'none'
     }
 
 # =============================================================================
 # TIMETABLE PARSING ENDPOINTS
 # =============================================================================
 
-@app.post("/api/parse-timetable")
-async def parse_timetable(
-    file: UploadFile = File(...),
-    college_name: Optional[str] = Form(None),
-    session: Optional[str] = Form(None)
-):
-    """
-    Parse uploaded PDF/Excel timetable file using LLM with dynamic runtime fallback.
-    Tries Cerebras first (ultra-fast). If it fails with 429 or any error,
-    automatically falls back to Gemini without crashing the request.
-
-    - **file**: PDF, XLSX, XLS, or XLSM file
-    - **college_name**: Optional college name
-    - **session**: Optional session info
-    """
-    # Get extractors in priority order [Cerebras, Gemini]
-    extractors = get_extractor_with_fallback()
-
-    if not extractors:
-        raise HTTPException(
-            status_code=503,
-            detail='No LLM extractors are available. Please check CEREBRAS_API_KEY and GEMINI_API_KEY.'
-        )
-
-    # Validate file format
+async def read_upload(file: UploadFile) -> SpooledUpload:
+    """Validate an upload's format and take over its spooled file, hashed and size-capped (caller closes it)"""
     if not allowed_file(file.filename):
         raise HTTPException(
             status_code=400,
-            detail='Invalid file format. Allowed: PDF, XLSX, XLS, XLSM, JSON'
+            detail='Invalid file format. Allowed: PDF, XLSX, XLS, XLSM, CSV, JSON'
         )
 
-    # Read file content once (before the fallback loop)
-    file_content = await file.read()
-
-    if len(file_content) > MAX_FILE_SIZE:
+    # The body was capped by UploadLimitMiddleware; this enforces the exact file limit
+    try:
+        return await spool_upload(file, MAX_FILE_SIZE)
+    except UploadTooLarge:
         raise HTTPException(
             status_code=413,
             detail='File too large. Maximum size is 50MB.'
         )
 
-    filename = file.filename
-    result = None
-    used_backend = None
-    start_time = datetime.now()
+
+async def extract_upload(
+    upload: SpooledUpload,
+    filename: str,
+    college_name: Optional[str] = None,
+    session: Optional[str] = None,
+    progress=None
+):
+    """
+    Run the structured fast path or the routed LLM extraction.
+    Returns (validated config dict, backend label); raises HTTPException on failure.
+    """
+    # Structured fast path: validated locally, no provider needed
+    result = await asyncio.to_thread(load_structured, upload.source, filename, college_name, session)
+    if result is not None:
+        return result, 'structured'
+
+    # Get extractors in priority order [Cerebras, Groq, Gemini]
+    extractors = get_extractor_with_fallback()
+    if not extractors:
+        raise HTTPException(
+            status_code=503,
+            detail='No LLM extractors are available. Please check CEREBRAS_API_KEY and GEMINI_API_KEY.'
+        )
 
     # -------------------------------------------------------------------------
-    # RUNTIME FALLBACK LOOP
-    # Try each extractor in order. On any failure (429, timeout, etc.),
-    # log the error and move to the next provider transparently.
+    # PER-CALL PROVIDER ROUTING
+    # The first extractor reads the file and chunks it once; each Stage-1 /
+    # Stage-2 LLM call then fails over to the next provider on its own
+    # (429, timeout, etc.), so chunks that already succeeded are kept.
     # -------------------------------------------------------------------------
-    for backend_name, extractor in extractors:
-        try:
-            logger.info(f"Attempting extraction using {backend_name}...")
-            result = extractor.extract_timetable_data(
-                file_content=file_content,
-                filename=filename,
-                college_name=college_name,
-                session=session
-            )
-            used_backend = backend_name
-            logger.info(f"Extraction succeeded using {backend_name}")
-            break  # Success — stop trying other providers
-        except HTTPException:
-            raise  # Re-raise FastAPI HTTP errors directly
-        except Exception as e:
-            logger.warning(f"{backend_name} extraction failed: {e}. Trying next provider...")
-            continue  # Move to the next provider
-
-    # If all providers failed, return a meaningful error
-    if result is None:
+    router = ProviderRouter(extractors)
+    primary_name, primary = extractors[0]
+    try:
+        logger.info(f"Extracting with {primary_name} (failover: {[n for n, _ in extractors[1:]]})...")
+        result = await primary.extract_timetable_data_async(
+            file_content=upload.source,
+            filename=filename,
+            college_name=college_name,
+            session=session,
+            router=router,
+            progress=progress,
+            content_hash=upload.hasher()
+        )
+    except HTTPException:
+        raise  # Re-raise FastAPI HTTP errors directly
+    except Exception as e:
+        # If all providers failed, return a meaningful error
+        logger.warning(f"Extraction failed on all providers: {e} ({router.stats()})")
         raise HTTPException(
             status_code=500,
-            detail='All LLM backends (Cerebras + Gemini) failed to parse the timetable. Please try again later.'
+            detail='All LLM backends (Cerebras + Groq + Gemini) failed to parse the timetable. Please try again later.'
         )
 
-    extraction_time = (datetime.now() - start_time).total_seconds()
+    used_backend = router.backend_label()
+    logger.info(f"Extraction succeeded using {used_backend} ({router.stats()})")
+    return result, used_backend
 
-    # Store parsed config for later use by generate endpoints
-    timetable_results["parsed_config"] = result
+
+def parsed_response(result: Dict[str, Any], used_backend: str, start_time: datetime, scope: ResultScope) -> Dict[str, Any]:
+    """Store a parsed config for the generate endpoints and build the API response"""
+    extraction_time = (datetime.now() - start_time).total_seconds()
+    job_id = state_backend.put(NS_PARSED_CONFIG, scope, result)
 
     logger.info(f"Timetable parsing completed via {used_backend} in {extraction_time:.2f}s")
 
     return {
         'success': True,
         'message': f"Timetable parsed successfully using {used_backend} in {extraction_time:.2f}s",
+        'job_id': job_id,
         'data': result,
         'extraction_info': {
             **result.get('extraction_info', {}),
@@ -533,6 +550,119 @@ async def parse_timetable(
     }
 
 
+@app.post("/api/parse-timetable")
+async def parse_timetable(
+    file: UploadFile = File(...),
+    college_name: Optional[str] = Form(None),
+    session: Optional[str] = Form(None),
+    organisation_id: Optional[str] = Form(None),
+    course: Optional[str] = Form(None),
+    year: Optional[str] = Form(None),
+    semester: Optional[str] = Form(None)
+):
+    """
+    Parse uploaded PDF/Excel timetable file using LLM with dynamic runtime fallback.
+    Tries Cerebras first (ultra-fast). Each LLM call that fails with 429 or
+    any other error is retried on the next provider (Groq, then Gemini)
+    without redoing the calls that already succeeded.
+
+    Structured uploads (JSON in our schema, or sheets matching a registered
+    template) are loaded deterministically without calling any LLM.
+
+    - **file**: PDF, XLSX, XLS, XLSM, CSV or JSON file
+    - **college_name**: Optional college name
+    - **session**: Optional session info
+    - **organisation_id / course / year / semester**: Optional scope the parsed config is stored under
+    """
+    upload = await read_upload(file)
+    start_time = datetime.now()
+
+    try:
+        result, used_backend = await extract_upload(upload, file.filename, college_name, session)
+    finally:
+        upload.close()
+
+    scope = ResultScope.build(organisation_id, course, year, semester)
+    return parsed_response(result, used_backend, start_time, scope)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/parse-timetable/stream")
+async def parse_timetable_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    college_name: Optional[str] = Form(None),
+    session: Optional[str] = Form(None),
+    organisation_id: Optional[str] = Form(None),
+    course: Optional[str] = Form(None),
+    year: Optional[str] = Form(None),
+    semester: Optional[str] = Form(None)
+):
+    """
+    Streaming variant of /api/parse-timetable (text/event-stream).
+
+    Events, in order as work completes:
+    - **cache_hit** or **text_extracted** (text length, pages, sheets, chunks)
+    - **structure**: Stage-1 result (college info, time slots, departments, rooms)
+    - **chunk** per finished chunk: its Stage-2 result plus the running merged config
+      (**chunk_failed** when a chunk failed on every provider)
+    - **result**: the validated config, same body as /api/parse-timetable; or **error**
+
+    Closing the connection cancels the remaining LLM calls.
+    """
+    upload = await read_upload(file)
+    start_time = datetime.now()
+    scope = ResultScope.build(organisation_id, course, year, semester)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def progress(event: str, data: Dict[str, Any]):
+        queue.put_nowait((event, data))
+
+    async def run():
+        try:
+            result, used_backend = await extract_upload(upload, file.filename, college_name, session, progress)
+            queue.put_nowait(('result', parsed_response(result, used_backend, start_time, scope)))
+        except HTTPException as e:
+            queue.put_nowait(('error', {'status_code': e.status_code, 'detail': e.detail}))
+        except Exception as e:
+            logger.error(f"Streaming extraction failed: {e}")
+            queue.put_nowait(('error', {'status_code': 500, 'detail': str(e)}))
+        finally:
+            # The extraction task owns the spool; it outlives the request handler
+            upload.close()
+
+    task = asyncio.create_task(run())
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        logger.info("Stream client disconnected; cancelling extraction")
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(event, data)
+                if event in ('result', 'error'):
+                    break
+        finally:
+            # Client gone or stream finished: stop any LLM calls still in flight
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.post("/api/nlp/parse", status_code=200)
 async def parse_natural_language(
     request: NLPRequest = Body(...) # Accepts the raw JSON body
@@ -543,28 +673,31 @@ async def parse_natural_language(
     """
     logger.info(f"Received NLP request for {request.course}/{request.year}/{request.semester}")
     
-    # 1. Load context from MongoDB using request parameters
-    config = get_config_by_params(
+    # 1. Load context from MongoDB (via the config cache) using request parameters
+    config_entry = await get_config_entry_async(
         course=request.course,
         year=request.year,
         semester=request.semester,
         organisation_id=request.organisation_id
     )
     
-    if not config:
+    if not config_entry:
         raise HTTPException(
             status_code=404, 
             detail=f"Configuration not found in DB for: {request.course}/{request.year}/{request.semester}. Cannot parse entities."
         )
 
+    config = config_entry.config
+
     # 2. Initialize Processor (LLM API Key check is inside the Processor's __init__)
+    #    The processor is memoised on the cache entry, so hot configs skip re-processing.
     try:
-        processor = TimetableNLPProcessor(config)
+        processor = config_entry.derive("nlp_processor", TimetableNLPProcessor)
     except EnvironmentError as e:
         raise HTTPException(status_code=503, detail=f"LLM Processor Error: {e}")
 
     # 3. Parse and Validate
-    result = processor.parse_request(request.text)
+    result = await processor.parse_request_async(request.text)
 
     if "error" in result:
         # Pydantic validation failure or LLM failure
@@ -596,7 +729,8 @@ async def parse_natural_language(
 
 @app.post("/api/generate")
 async def generate_timetable(
-    request: Optional[Dict[str, Any]] = Body(None)
+    request: Optional[Dict[str, Any]] = Body(None),
+    scope: ResultScope = Depends(result_scope)
 ):
     """
     Generate timetable using configuration and return results directly
@@ -605,72 +739,43 @@ async def generate_timetable(
     1. Use JSON configuration from request body
     2. Use default configuration file
     
-    Returns the generated timetable data directly without caching
+    Returns the generated timetable data directly. A copy is kept in the
+    state backend under the request scope so /api/timetables/* can serve it.
     """
+    # Validate before a job exists, so a bad request leaves no queued job behind
+    if not request:
+        raise HTTPException(
+            status_code=400,
+            detail="Config file not found! Please provide configuration in request body."
+        )
+    config_data = request
+    logger.info("Using configuration from request body")
+
+    job_id = state_backend.new_job_id()
+    start_job(job_id, scope, "generate")
     try:
-        config_data = None
-        
-        # Try to get configuration from request
-        if request:
-            config_data = request
-            logger.info("Using configuration from request body")
-        else:
+        # Generate timetables (GA runs in a worker thread, request still waits for it)
+        exported_solutions = await asyncio.to_thread(run_generation, config_data, job_id)
+
+        if not exported_solutions:
             raise HTTPException(
                 status_code=400,
-                detail="Config file not found! Please provide configuration in request body."
+                detail="No valid solution found!"
             )
-        
-        # Generate timetables synchronously
-        try:
-            # Build TimetableData from provided config dict
-            data_obj = TimetableData(config_dict=config_data)
-
-            genetic_algo = GeneticAlgorithm(data_obj)
-            genetic_algo.initialize_population()
-            genetic_algo.evolve()
-
-            # NEW: get top 3 solutions
-            solutions = genetic_algo.get_best_solution()
-
-            if not solutions:
-                raise HTTPException(
-                    status_code=400,
-                    detail="No valid solution found!"
-                )
-
-            exported_solutions = []
-            for idx, sol in enumerate(solutions, start=1):
-                exporter = TimetableExporter(sol, data_obj)
-                exported_solutions.append({
-                    "rank": idx,
-                    "fitness": sol.fitness_score,
-                    "constraint_violations": sol.constraint_violations,
-                    "sections": exporter.get_section_wise_data(),
-                    "faculty": exporter.get_faculty_wise_data(),
-                    "detailed": exporter.get_detailed_data(),
-                    "statistics": exporter.get_statistics(),
-                })
-
-            logger.info("Timetable generation completed successfully")
-            
-            return {
-                "status": "completed",
-                "timestamp": datetime.now().isoformat(),
-                "solutions": exported_solutions,  # list of 3
-            }
 
-        except Exception as e:
-            logger.error(f"Timetable generation failed: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Generation failed: {str(e)}"
-            )
+        logger.info("Timetable generation completed successfully")
+
+        return finish_job(job_id, scope, JOB_COMPLETED, solutions=exported_solutions)  # list of 3
 
+    except HTTPException as e:
+        finish_job(job_id, scope, JOB_FAILED, error=str(e.detail))
+        raise
     except Exception as e:
-        logger.error(f"Failed to generate timetable: {str(e)}")
+        logger.error(f"Timetable generation failed: {str(e)}")
+        finish_job(job_id, scope, JOB_FAILED, error=str(e))
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to generate timetable: {str(e)}"
+            detail=f"Generation failed: {str(e)}"
         )
 
 
@@ -679,27 +784,46 @@ async def generate_timetable(
 # =============================================================================
 
 @app.get("/api/status")
-async def get_status():
-    """Get current timetable generation status"""
+async def get_status(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None):
+    """Get timetable generation status for a scope (latest job unless job_id is given)"""
+    stored = state_backend.get(NS_RESULTS, scope, job_id) or {}
     return {
-        "status": timetable_results["status"],
-        "timestamp": timetable_results.get("timestamp"),
-        "error": timetable_results.get("error"),
-        "has_parsed_config": timetable_results.get("parsed_config") is not None,
-        "has_results": timetable_results.get("data") is not None,
-        "llm_backend": "Cerebras" if USE_CEREBRAS else "Gemini"
+        "status": stored.get("status", "not_started"),
+        "job_id": stored.get("job_id"),
+        "timestamp": stored.get("timestamp"),
+        "error": stored.get("error"),
+        "has_parsed_config": state_backend.get(NS_PARSED_CONFIG, scope) is not None,
+        "has_results": bool(stored.get("solutions")),
+        "llm_backend": provider_registry.primary() or "none"
     }
 
 @app.get("/api/results")
-async def get_all_results():
-    """Get all timetable generation results"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
+async def get_all_results(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None):
+    """Get all timetable generation results for a scope"""
+    stored = state_backend.get(NS_RESULTS, scope, job_id)
+    if not stored or stored.get("status") != "completed" or not stored.get("solutions"):
         raise HTTPException(status_code=404, detail="No completed timetables available")
     
+    best = stored["solutions"][0]
     return {
         "status": "success",
-        "timestamp": timetable_results["timestamp"],
-        "data": timetable_results["data"]
+        "job_id": stored.get("job_id"),
+        "timestamp": stored["timestamp"],
+        # Same shape as before solutions were ranked: the rank-1 export
+        "data": {key: best[key] for key in ("sections", "faculty", "detailed", "statistics")},
+        "solutions": stored["solutions"]
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get job state and live GA progress (served by any worker via the shared backend)"""
+    job = state_backend.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    return {
+        **job,
+        "progress": state_backend.get_progress(job_id)
     }
 
 # =============================================================================
@@ -707,20 +831,14 @@ async def get_all_results():
 # =============================================================================
 
 @app.get("/api/timetables/sections")
-async def get_all_sections():
+async def get_all_sections(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get all section timetables"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    return timetable_results["data"]["sections"]
+    return get_completed_result(scope, job_id, rank)["sections"]
 
 @app.get("/api/timetables/sections/{section_id}")
-async def get_single_section(section_id: str):
+async def get_single_section(section_id: str, scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get specific section timetable"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    section_data = timetable_results["data"]["sections"].get(section_id)
+    section_data = get_completed_result(scope, job_id, rank)["sections"].get(section_id)
     if not section_data:
         raise HTTPException(status_code=404, detail=f"Section '{section_id}' not found")
     
@@ -731,20 +849,14 @@ async def get_single_section(section_id: str):
 # =============================================================================
 
 @app.get("/api/timetables/faculty")
-async def get_all_faculty():
+async def get_all_faculty(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get all faculty timetables"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    return timetable_results["data"]["faculty"]
+    return get_completed_result(scope, job_id, rank)["faculty"]
 
 @app.get("/api/timetables/faculty/{faculty_id}")
-async def get_single_faculty(faculty_id: str):
+async def get_single_faculty(faculty_id: str, scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get specific faculty timetable"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    faculty_data = timetable_results["data"]["faculty"].get(faculty_id)
+    faculty_data = get_completed_result(scope, job_id, rank)["faculty"].get(faculty_id)
     if not faculty_data:
         raise HTTPException(status_code=404, detail=f"Faculty '{faculty_id}' not found")
     
@@ -755,32 +867,27 @@ async def get_single_faculty(faculty_id: str):
 # =============================================================================
 
 @app.get("/api/timetables/detailed")
-async def get_detailed_timetable():
+async def get_detailed_timetable(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get detailed timetable data (all entries in list format)"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    return timetable_results["data"]["detailed"]
+    return get_completed_result(scope, job_id, rank)["detailed"]
 
 @app.get("/api/timetables/statistics")
-async def get_statistics():
+async def get_statistics(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None, rank: int = 1):
     """Get timetable generation statistics"""
-    if timetable_results["status"] != "completed" or not timetable_results["data"]:
-        raise HTTPException(status_code=404, detail="No timetables generated yet")
-    
-    return timetable_results["data"]["statistics"]
+    return get_completed_result(scope, job_id, rank)["statistics"]
 
 # =============================================================================
 # CONFIGURATION ENDPOINTS
 # =============================================================================
 
 @app.get("/api/config/parsed")
-async def get_parsed_config():
-    """Get the most recently parsed configuration"""
-    if not timetable_results.get("parsed_config"):
+async def get_parsed_config(scope: ResultScope = Depends(result_scope), job_id: Optional[str] = None):
+    """Get the most recently parsed configuration for a scope"""
+    parsed_config = state_backend.get(NS_PARSED_CONFIG, scope, job_id)
+    if not parsed_config:
         raise HTTPException(status_code=404, detail="No parsed configuration available")
     
-    return timetable_results["parsed_config"]
+    return parsed_config
 
 @app.post("/api/config/validate")
 async def validate_config(config: Dict[str, Any] = Body(...)):
@@ -848,8 +955,11 @@ async def regenerate_with_events(
     Prioritizes Config from:
     1. Request Body (request.config)
     2. MongoDB (using request.course/year/semester)
-    3. In-Memory Cache (timetable_results)
+    3. Result Store (last parsed file for the same scope)
     """
+    scope = ResultScope.build(request.organisation_id, request.course, request.year, request.semester)
+    job_id = state_backend.new_job_id()
+    start_job(job_id, scope, "regenerate_with_events")
     try:
         logger.info(f"Regenerating with {len(request.events)} events")
 
@@ -857,23 +967,26 @@ async def regenerate_with_events(
         # 1. RESOLVE CONFIGURATION
         # -----------------------------------------------------------------
         base_config = request.config
+        config_entry = None
 
-        # If not in body, try fetching from Database
+        # If not in body, try fetching from Database (via the config cache)
         if not base_config and request.organisation_id and request.course and request.year and request.semester:
             logger.info(f"Fetching config from DB for {request.organisation_id}/{request.course} / {request.year} / {request.semester}")
-            base_config = get_config_by_params(
+            config_entry = await get_config_entry_async(
                 course=request.course,
                 year=request.year,
                 semester=request.semester,
                 organisation_id=request.organisation_id
             )
-            if not base_config:
+            if config_entry:
+                base_config = config_entry.config
+            else:
                 logger.warning("Database params provided but no config found.")
 
-        # If still not found, try the in-memory cache (last parsed file)
+        # If still not found, try the result store (last parsed file for this scope)
         if not base_config:
-            logger.info("Checking in-memory cache for configuration...")
-            base_config = timetable_results.get("parsed_config")
+            logger.info("Checking result store for configuration...")
+            base_config = state_backend.get(NS_PARSED_CONFIG, scope)
 
         # Final validation
         if not base_config:
@@ -892,50 +1005,40 @@ async def regenerate_with_events(
         modified_config = apply_events_to_config(modified_config, request.events)
 
         # -----------------------------------------------------------------
-        # 3. GENERATE TIMETABLE
+        # 3. GENERATE TIMETABLE (GA runs in a worker thread)
         # -----------------------------------------------------------------
-        data_obj = TimetableData(config_dict=modified_config)
-        
-        genetic_algo = GeneticAlgorithm(data_obj)
-        genetic_algo.initialize_population()
-        genetic_algo.evolve()
+        # Without events the cached config is used as-is, so reuse its compiled TimetableData
+        data_obj = None
+        if config_entry and not request.events:
+            data_obj = await asyncio.to_thread(
+                config_entry.derive, "timetable_data",
+                lambda config: TimetableData(config_dict=deepcopy(config))
+            )
 
-        solutions = genetic_algo.get_best_solution()
-        if not solutions:
+        exported_solutions = await asyncio.to_thread(run_generation, modified_config, job_id, data_obj)
+        if not exported_solutions:
             logger.error("No valid solution found with event constraints")
+            # Recorded as failed once, by the HTTPException handler below
             raise HTTPException(
                 status_code=400,
                 detail="No valid solution found with event constraints"
             )
 
-        # Export solutions
-        exported_solutions = []
-        for idx, sol in enumerate(solutions, start=1):
-            exporter = TimetableExporter(sol, data_obj)
-            exported_solutions.append({
-                "rank": idx,
-                "fitness": sol.fitness_score,
-                "constraint_violations": sol.constraint_violations,
-                "sections": exporter.get_section_wise_data(),
-                "faculty": exporter.get_faculty_wise_data(),
-                "detailed": exporter.get_detailed_data(),
-                "statistics": exporter.get_statistics(),
-            })
-
-        logger.info("Timetable regeneration with events completed successfully (synchronous)")
-
-        return {
-            "status": "completed",
-            "timestamp": datetime.now().isoformat(),
-            "events_applied": len(request.events),
-            "config_source": "database" if (not request.config and request.course) else "request/cache",
-            "solutions": exported_solutions
-        }
+        logger.info("Timetable regeneration with events completed successfully")
 
-    except HTTPException:
+        return finish_job(
+            job_id, scope, JOB_COMPLETED,
+            events_applied=len(request.events),
+            config_source="database" if (not request.config and request.course) else "request/cache",
+            solutions=exported_solutions
+        )
+
+    except HTTPException as e:
+        finish_job(job_id, scope, JOB_FAILED, error=str(e.detail))
         raise
     except Exception as e:
         logger.error(f"Regeneration error: {str(e)}")
+        finish_job(job_id, scope, JOB_FAILED, error=str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Failed to regenerate timetable: {str(e)}"
@@ -951,15 +1054,19 @@ async def health_check():
     return {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'llm_backend': 'Cerebras' if USE_CEREBRAS else 'Gemini',
-        'llm_configured': llm_extractor is not None,
-        'cerebras_available': USE_CEREBRAS,
+        'llm_backend': provider_registry.primary() or 'none',
+        'llm_configured': bool(provider_registry.names),
+        'cerebras_available': provider_registry.is_healthy('Cerebras'),
+        'llm_providers': provider_registry.health_table(),
         'gemini_api_available': os.getenv('GEMINI_API_KEY') is not None,
-        'generation_status': timetable_results["status"],
-        'dynamic_update_status': latest_dynamic_update["status"],
+        'state_backend': state_backend.stats(),
+        'nlp_cache': nlp_result_cache.stats(),
+        'nlp_rules': rule_stats.snapshot(),
+        'llm_rate_limits': rate_limiter.snapshot(),
+        'text_compaction': compaction_stats.snapshot(),
         'features': {
-            'ultra_fast_extraction': USE_CEREBRAS,
-            'llm_extraction': llm_extractor is not None,
+            'ultra_fast_extraction': provider_registry.is_healthy('Cerebras'),
+            'llm_extraction': bool(provider_registry.names),
             'genetic_algorithm': True,
             'dynamic_updates': True,
             'multi_format_support': True
@@ -0,0 +1,95 @@
+"""
+excel_ingest_benchmark.py
+=========================
+Compare workbook ingestion: the previous per-sheet re-read + ``iterrows``
+path against the single-read, vectorized path in TimetableExtractor.
+
+A synthetic multi-sheet workbook (one sheet per department, timetable-like
+cells with gaps) is generated in memory. Run from the FinalScheduler
+directory:
+
+    python benchmarks/excel_ingest_benchmark.py
+    python benchmarks/excel_ingest_benchmark.py --sheets 12 --rows 400 --cols 10 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from timetable_extractor import TimetableExtractor  # noqa: E402
+
+
+def build_workbook(sheets: int, rows: int, cols: int) -> bytes:
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    buf  = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for s in range(sheets):
+            data = [
+                [days[r % 5] if c == 0 else (None if (r + c) % 4 == 0 else f"SUB{s}{c:02d} / F{r % 37:03d} / R{100 + c}")
+                 for c in range(cols)]
+                for r in range(rows)
+            ]
+            pd.DataFrame(data).to_excel(writer, sheet_name=f"DEPT_{s}", header=False, index=False)
+    return buf.getvalue()
+
+
+def legacy_excel(file_content: bytes) -> str:
+    """The previous implementation: workbook re-parsed per sheet, rows via iterrows."""
+    parts: List[str] = []
+    ef = pd.ExcelFile(io.BytesIO(file_content), engine="openpyxl")
+    for sheet in ef.sheet_names:
+        parts.append(f"\n=== SHEET: {sheet} ===")
+        df = pd.read_excel(io.BytesIO(file_content), sheet_name=sheet, engine="openpyxl", header=None)
+        for idx, row in df.iterrows():
+            cells    = [str(v).strip() if pd.notna(v) else "" for v in row]
+            row_text = " | ".join(cells)
+            if row_text.strip():
+                parts.append(f"  Row {idx+1}: {row_text}")
+    return "\n".join(parts).strip()
+
+
+def timed(fn: Callable[[], str], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Excel ingestion benchmark")
+    parser.add_argument("--sheets", type=int, default=8)
+    parser.add_argument("--rows",   type=int, default=300)
+    parser.add_argument("--cols",   type=int, default=9)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    data = build_workbook(args.sheets, args.rows, args.cols)
+    extractor = TimetableExtractor("benchmark", enable_cache=False, test_connection=False)
+
+    print(f"Workbook: {args.sheets} sheets x {args.rows} rows x {args.cols} cols "
+          f"({len(data) / 1024:.0f} KiB)")
+    results = {
+        "legacy (per-sheet read + iterrows)": timed(lambda: legacy_excel(data), args.repeat),
+        "single read + vectorized":           timed(lambda: extractor._extract_text_from_excel(data, "bench.xlsx"), args.repeat),
+    }
+    baseline = statistics.median(next(iter(results.values())))
+    for name, times in results.items():
+        med = statistics.median(times)
+        print(f"  {name:<36} median {med * 1000:8.1f} ms   speed-up x{baseline / med:5.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+startup_benchmark.py
+====================
+Measure cold import time and resident memory (RSS) per module.
+
+Each target is imported in a fresh interpreter so results are independent
+of import order. Run from the FinalScheduler directory:
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py app pandas --repeat 5
+    python benchmarks/startup_benchmark.py --first-parse
+
+``--first-parse`` additionally reports the one-off cost paid by the first
+parse request (the parsing libraries that are now loaded lazily).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+DEFAULT_MODULES = [
+    "fastapi",
+    "numpy",
+    "pandas",
+    "pdfplumber",
+    "fitz",
+    "httpx",
+    "requests",
+    "json_repair",
+    "pymongo",
+    "timetable_generator",
+    "timetable_extractor",
+    "nlp_processor",
+    "db_utils",
+    "app",
+]
+
+# Libraries the first /api/parse-timetable request pulls in
+FIRST_PARSE_MODULES = ["fitz", "pdfplumber", "pandas", "httpx", "json_repair"]
+
+# Runs inside the child interpreter; prints one JSON line
+_CHILD = r"""
+import importlib, json, sys, time
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+sys.path.insert(0, {root!r})
+before_rss = rss_kb()
+t0 = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - t0
+after_rss = rss_kb()
+
+extra = {{}}
+for name in {follow_up!r}:
+    t1 = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        continue   # not installed here; skip rather than hide the main result
+    extra[name] = time.perf_counter() - t1
+print(json.dumps({{
+    "seconds":     elapsed,
+    "rss_kb":      after_rss,
+    "rss_delta_kb": after_rss - before_rss,
+    "follow_up":   extra,
+    "follow_up_rss_kb": rss_kb(),
+    "modules":     len(sys.modules),
+}}))
+"""
+
+
+def measure(module: str, follow_up: List[str]) -> Dict:
+    code = _CHILD.format(root=ROOT, module=module, follow_up=follow_up)
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        err = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+        return {"error": err}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (median reported)")
+    parser.add_argument("--first-parse", action="store_true",
+                        help="also import the lazily-loaded parsing libraries after each module")
+    parser.add_argument("--json", action="store_true", help="emit raw JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    follow_up = FIRST_PARSE_MODULES if args.first_parse else []
+    report: Dict[str, Dict] = {}
+    for module in args.modules:
+        runs = [measure(module, follow_up) for _ in range(max(1, args.repeat))]
+        ok   = [r for r in runs if "error" not in r]
+        if not ok:
+            report[module] = runs[0]
+            continue
+        report[module] = {
+            "seconds":      statistics.median(r["seconds"] for r in ok),
+            "rss_kb":       int(statistics.median(r["rss_kb"] for r in ok)),
+            "rss_delta_kb": int(statistics.median(r["rss_delta_kb"] for r in ok)),
+            "modules":      ok[0]["modules"],
+        }
+        if follow_up:
+            report[module]["first_parse_seconds"] = statistics.median(
+                sum(r["follow_up"].values()) for r in ok)
+            report[module]["first_parse_rss_kb"] = int(statistics.median(
+                r["follow_up_rss_kb"] for r in ok))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    header = f"{'module':<22} {'import ms':>10} {'RSS MB':>8} {'+RSS MB':>8} {'modules':>8}"
+    if follow_up:
+        header += f" {'1st parse ms':>13} {'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for module, r in report.items():
+        if "error" in r:
+            print(f"{module:<22} error: {r['error']}")
+            continue
+        line = (f"{module:<22} {r['seconds'] * 1000:>10.1f} {r['rss_kb'] / 1024:>8.1f} "
+                f"{r['rss_delta_kb'] / 1024:>8.1f} {r['modules']:>8}")
+        if follow_up:
+            line += (f" {r['first_parse_seconds'] * 1000:>13.1f} "
+                     f"{r['first_parse_rss_kb'] / 1024:>8.1f}")
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
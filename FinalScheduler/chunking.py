@@ -0,0 +1,237 @@
+"""
+chunking.py
+===========
+Layout-aware chunking of extracted document text.
+
+The text produced by TimetableExtractor is a sequence of blocks introduced
+by marker lines (``=== PAGE n ===``, ``=== TABLES PAGE n ===``,
+``=== SHEET: name ===``, ``=== CSV FILE ===``). ``LayoutChunker`` packs
+whole blocks into chunks up to a token budget, so pages and tables are
+never cut mid-row.
+
+With ``content_defined`` set, a chunk also closes after every "anchor"
+unit. Whether a unit is an anchor depends only on a hash of its own
+normalized text, with a probability that gives one anchor per
+``ANCHOR_SPACING`` budgets of tokens on average. Boundaries are then fixed
+by content instead of by everything packed before them. An inserted or
+resized page changes only the chunks up to the next anchor, and the
+per-chunk extraction cache (timetable_extractor, OPT-17) still hits for the
+rest of the document. The price is less full chunks: roughly 25-60% more LLM
+calls than greedy packing on page-sized units.
+
+Only a block that is larger than the budget on its own is split, at line
+(table row) boundaries. Each continuation repeats the block's marker line
+and the header of the table being split (the ``Table k:`` line plus the
+markdown header and separator, or the first sheet row), followed by a few
+overlapping rows. Blocks that fit are never overlapped.
+
+Token counts come from ``tiktoken`` when it is installed. Otherwise a
+word-piece estimate is used (about four characters per token, and every
+punctuation mark or pipe counted as one), which tracks Llama-style
+tokenizers closely on tabular text.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Token estimate
+# ===========================================================================
+
+_PIECES  = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_encoder = None
+
+
+def _tiktoken_encoder():
+    global _encoder
+    if _encoder is None:
+        if importlib.util.find_spec("tiktoken") is None:
+            _encoder = False
+        else:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+    return _encoder or None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text`` (tiktoken if available, word-piece estimate otherwise)."""
+    if not text:
+        return 0
+    encoder = _tiktoken_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return sum((len(p) + 3) // 4 if p[0].isalpha() else (len(p) + 2) // 3 if p[0].isdigit() else 1
+               for p in _PIECES.findall(text))
+
+
+# ===========================================================================
+# Units
+# ===========================================================================
+
+MARKER      = re.compile(r"^\s*=== .+ ===\s*$")
+TABLE_TITLE = re.compile(r"^\s*Table \d+:\s*$")
+_PAGE_NUM   = re.compile(r"^(=== (?:TABLES )?PAGE )\d+( ===)$", re.MULTILINE)
+
+
+@dataclass
+class Unit:
+    """One layout block: its marker line (may be empty) and body lines."""
+    header: str
+    lines:  List[str] = field(default_factory=list)
+
+    def text(self) -> str:
+        return "\n".join(([self.header] if self.header else []) + self.lines)
+
+
+def split_units(text: str) -> List[Unit]:
+    """Split text at marker lines; text before the first marker becomes a header-less unit."""
+    units: List[Unit] = [Unit("")]
+    for line in text.splitlines():
+        if MARKER.match(line):
+            units.append(Unit(line.strip()))
+        elif line.strip() or units[-1].lines:
+            units[-1].lines.append(line)
+    return [u for u in units if u.header or any(l.strip() for l in u.lines)]
+
+
+def normalize_chunk(text: str) -> str:
+    """
+    Canonical form of a chunk for cache keys: whitespace collapsed and page
+    numbers dropped from markers, so a page inserted earlier in a revised
+    upload does not invalidate every later chunk.
+    """
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return _PAGE_NUM.sub(r"\1#\2", "\n".join(l for l in lines if l))
+
+
+# ===========================================================================
+# Chunker
+# ===========================================================================
+
+# Content-defined boundaries: average tokens between anchors, in budgets
+ANCHOR_SPACING = 1.5
+
+
+def is_anchor(unit: Unit, tokens: int, target_tokens: int) -> bool:
+    """
+    True for about ``tokens / target_tokens`` of units, decided by a hash of
+    the unit's normalized text alone, so the same unit is an anchor in every
+    revision of a document wherever it lands.
+    """
+    digest = hashlib.sha256(normalize_chunk(unit.text()).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < tokens / max(1, target_tokens)
+
+
+class LayoutChunker:
+    """Packs whole layout units into token-bounded chunks."""
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0, content_defined: bool = False) -> None:
+        self.max_tokens      = max(64, max_tokens)
+        self.overlap_tokens  = max(0, min(overlap_tokens, self.max_tokens // 4))
+        self.content_defined = content_defined
+
+    def chunk(self, text: str) -> List[str]:
+        chunks:  List[str] = []
+        current: List[str] = []
+        used = 0
+        for unit in split_units(text):
+            body   = unit.text()
+            tokens = estimate_tokens(body)
+            if tokens > self.max_tokens:
+                if current:
+                    chunks.append("\n".join(current))
+                    current, used = [], 0
+                pieces = self._split_unit(unit)
+                chunks.extend(pieces[:-1])
+                # The tail of a split unit keeps packing with the units after it
+                current, used = [pieces[-1]], estimate_tokens(pieces[-1]) + 1
+                continue
+            if used + tokens > self.max_tokens and current:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(body)
+            used += tokens + 1
+            if self.content_defined and is_anchor(unit, tokens, int(self.max_tokens * ANCHOR_SPACING)):
+                chunks.append("\n".join(current))
+                current, used = [], 0
+        if current:
+            chunks.append("\n".join(current))
+        return [c for c in chunks if c.strip()]
+
+    # ------------------------------------------------------------------ #
+    # Oversized units                                                      #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _table_header(lines: List[str], index: int) -> List[str]:
+        """Header lines to repeat when splitting before ``lines[index]``."""
+        if not lines[index].lstrip().startswith("|"):
+            return []
+        start = index
+        while start > 0 and lines[start - 1].lstrip().startswith("|"):
+            start -= 1
+        header = lines[start:start + 1] if start < index else []
+        if start + 1 < index and set(lines[start + 1].strip()) <= set("|-: "):
+            header.append(lines[start + 1])               # markdown separator, when not compacted away
+        if start > 0 and TABLE_TITLE.match(lines[start - 1]):
+            header.insert(0, lines[start - 1])
+        return header
+
+    @staticmethod
+    def _sheet_header(unit: Unit) -> List[str]:
+        """First row of a sheet/CSV block (usually the column titles)."""
+        if unit.header.startswith(("=== SHEET", "=== CSV")) and unit.lines:
+            return [unit.lines[0]]
+        return []
+
+    def _hard_split(self, line: str) -> List[str]:
+        """Last resort for a single line over budget: cut by characters."""
+        step = max(256, self.max_tokens * 3)
+        return [line[i:i + step] for i in range(0, len(line), step)]
+
+    def _split_unit(self, unit: Unit) -> List[str]:
+        lines: List[str] = []
+        for line in unit.lines:
+            lines.extend(self._hard_split(line) if estimate_tokens(line) > self.max_tokens // 2 else [line])
+        sheet_header = self._sheet_header(unit)
+
+        pieces: List[str] = []
+        start = 0
+        while start < len(lines):
+            prefix = ([unit.header] if unit.header else [])
+            if start > 0:
+                prefix += sheet_header or self._table_header(lines, start)
+            budget = self.max_tokens - estimate_tokens("\n".join(prefix))
+            end, used = start, 0
+            while end < len(lines):
+                cost = estimate_tokens(lines[end]) + 1
+                if used + cost > budget and end > start:
+                    break
+                used += cost
+                end  += 1
+            pieces.append("\n".join(prefix + lines[start:end]))
+            if end >= len(lines):
+                break
+            start = self._overlap_start(lines, start, end)
+        logger.debug("Unit %r split into %d pieces", unit.header, len(pieces))
+        return pieces
+
+    def _overlap_start(self, lines: List[str], start: int, end: int) -> int:
+        """Step back over at most ``overlap_tokens`` of rows, always making progress."""
+        back, used = end, 0
+        while back - 1 > start:
+            cost = estimate_tokens(lines[back - 1]) + 1
+            if used + cost > self.overlap_tokens:
+                break
+            used += cost
+            back -= 1
+        return back
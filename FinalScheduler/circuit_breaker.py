@@ -0,0 +1,224 @@
+"""
+circuit_breaker.py
+==================
+Per-provider circuit breaker for LLM calls.
+
+States
+------
+closed
+    Calls flow. Outcomes go into a rolling window; the breaker trips when
+    enough recent calls failed (429s count double) or were slow, or after
+    a run of consecutive 429s.
+open
+    Calls are refused immediately, so the router moves straight to the next
+    provider instead of sitting through retries and backoff. The cooldown
+    starts at BREAKER_OPEN_SECONDS, is never shorter than a server
+    Retry-After, and doubles each time a trial fails.
+half-open
+    Once the cooldown has elapsed, a single trial is let through: a
+    background probe (llm_providers.run_health_probes) or a real request.
+    ``allow()`` hands that call a trial ticket. Only the outcome reported
+    with the ticket resolves the state: success closes the breaker, failure
+    re-opens it. Outcomes of calls that started before the trip are
+    ignored while the breaker is open or half-open.
+
+Configuration (environment)
+---------------------------
+BREAKER_WINDOW              outcomes kept per provider                 (default 20)
+BREAKER_MIN_CALLS           outcomes needed before the rate can trip   (default 5)
+BREAKER_FAILURE_RATE        weighted failure share that trips          (default 0.5)
+BREAKER_CONSECUTIVE_429     consecutive 429s that trip                 (default 2)
+BREAKER_SLOW_CALL_SECONDS   a success slower than this counts as slow  (default 30)
+BREAKER_SLOW_CALL_RATE      slow share that trips                      (default 0.8)
+BREAKER_OPEN_SECONDS        first cooldown                             (default 15)
+BREAKER_MAX_OPEN_SECONDS    cooldown ceiling                           (default 300)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+STATE_CLOSED    = "closed"
+STATE_OPEN      = "open"
+STATE_HALF_OPEN = "half_open"
+
+WINDOW            = int(os.getenv("BREAKER_WINDOW", "20"))
+MIN_CALLS         = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+FAILURE_RATE      = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+CONSECUTIVE_429   = int(os.getenv("BREAKER_CONSECUTIVE_429", "2"))
+SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "30"))
+SLOW_CALL_RATE    = float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.8"))
+OPEN_SECONDS      = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+MAX_OPEN_SECONDS  = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "300"))
+
+# A rate-limit response weighs more than a generic failure
+RATE_LIMIT_WEIGHT     = 2.0
+TRIAL_TIMEOUT_SECONDS = 120.0
+
+# allow() result for an ordinary call while closed; trials get a ticket > 0
+NO_TRIAL = 0
+
+
+@dataclass
+class _Outcome:
+    failed:       bool
+    rate_limited: bool
+    slow:         bool
+
+
+# ===========================================================================
+# Breaker
+# ===========================================================================
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of call outcomes."""
+
+    def __init__(self, name: str) -> None:
+        self.name             = name
+        self.state            = STATE_CLOSED
+        self.opened_at: Optional[float] = None
+        self.open_until       = 0.0
+        self.cooldown         = OPEN_SECONDS
+        self.trips            = 0
+        self._outcomes: Deque[_Outcome] = deque(maxlen=WINDOW)
+        self._consecutive_429 = 0
+        self._trial_started: Optional[float] = None
+        self._trial_ticket    = NO_TRIAL
+        self._tickets         = itertools.count(1)
+        self._lock            = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Admission                                                            #
+    # ------------------------------------------------------------------ #
+
+    def allow(self) -> Optional[int]:
+        """
+        None if no call may go to this provider now. Otherwise a ticket to
+        report the outcome with: NO_TRIAL while closed, or the half-open
+        trial's ticket, which this call now holds.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return NO_TRIAL
+            if self.state == STATE_OPEN:
+                if time.monotonic() < self.open_until:
+                    return None
+                self.state = STATE_HALF_OPEN
+                logger.info("Breaker %s: half-open", self.name)
+            if self._trial_busy():
+                return None
+            self._trial_started = time.monotonic()
+            self._trial_ticket  = next(self._tickets)
+            return self._trial_ticket
+
+    def trial_due(self) -> bool:
+        """Open with its cooldown elapsed (or half-open and idle): worth a background probe."""
+        with self._lock:
+            if self.state == STATE_OPEN:
+                return time.monotonic() >= self.open_until
+            return self.state == STATE_HALF_OPEN and not self._trial_busy()
+
+    # ------------------------------------------------------------------ #
+    # Outcomes                                                             #
+    # ------------------------------------------------------------------ #
+
+    def _is_trial(self, ticket: Optional[int]) -> bool:
+        return self.state == STATE_HALF_OPEN and ticket is not None and ticket == self._trial_ticket
+
+    def record_success(self, latency: Optional[float] = None, ticket: Optional[int] = None) -> None:
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                # Only the trial closes the breaker; late successes from before the trip are ignored
+                if self._is_trial(ticket):
+                    self._close()
+                return
+            self._consecutive_429 = 0
+            slow = latency is not None and latency > SLOW_CALL_SECONDS
+            self._outcomes.append(_Outcome(failed=False, rate_limited=False, slow=slow))
+            if slow and self._slow_rate() >= SLOW_CALL_RATE:
+                self._open(f"{self._slow_rate():.0%} of recent calls slower than {SLOW_CALL_SECONDS:.0f}s")
+
+    def record_failure(self, http_status: Optional[int] = None, retry_after: Optional[float] = None,
+                       ticket: Optional[int] = None) -> None:
+        rate_limited = http_status == 429
+        with self._lock:
+            if self._is_trial(ticket):
+                self.cooldown = min(MAX_OPEN_SECONDS, self.cooldown * 2)
+                self._open("trial call failed", retry_after)
+                return
+            if self.state != STATE_CLOSED:
+                # Late failures from calls started before the trip
+                if self.state == STATE_OPEN and retry_after:
+                    self.open_until = max(self.open_until, time.monotonic() + min(retry_after, MAX_OPEN_SECONDS))
+                return
+            self._consecutive_429 = self._consecutive_429 + 1 if rate_limited else 0
+            self._outcomes.append(_Outcome(failed=True, rate_limited=rate_limited, slow=False))
+            if self._consecutive_429 >= CONSECUTIVE_429:
+                self._open(f"{self._consecutive_429} consecutive 429s", retry_after)
+            elif len(self._outcomes) >= MIN_CALLS and self._failure_rate() >= FAILURE_RATE:
+                self._open(f"failure rate {self._failure_rate():.0%}", retry_after)
+
+    # ------------------------------------------------------------------ #
+    # Transitions (caller holds the lock)                                  #
+    # ------------------------------------------------------------------ #
+
+    def _trial_busy(self) -> bool:
+        # A trial that never reported back (e.g. a cancelled hedge) frees up after a while
+        return (self._trial_started is not None
+                and time.monotonic() - self._trial_started < TRIAL_TIMEOUT_SECONDS)
+
+    def _failure_rate(self) -> float:
+        weights = [(RATE_LIMIT_WEIGHT if o.rate_limited else 1.0) if o.failed else 0.0 for o in self._outcomes]
+        total   = sum(weights) + sum(1 for o in self._outcomes if not o.failed)
+        return sum(weights) / total if total else 0.0
+
+    def _slow_rate(self) -> float:
+        if len(self._outcomes) < MIN_CALLS:
+            return 0.0
+        return sum(1 for o in self._outcomes if o.slow) / len(self._outcomes)
+
+    def _open(self, reason: str, retry_after: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if self.state != STATE_OPEN:
+            self.trips    += 1
+            self.opened_at = now
+        self.state          = STATE_OPEN
+        self._trial_started = None
+        self._trial_ticket  = NO_TRIAL
+        self.open_until     = now + max(self.cooldown, min(retry_after or 0.0, MAX_OPEN_SECONDS))
+        logger.warning("Breaker %s: open for %.0fs (%s)", self.name, self.open_until - now, reason)
+
+    def _close(self) -> None:
+        logger.info("Breaker %s: closed", self.name)
+        self.state          = STATE_CLOSED
+        self.cooldown       = OPEN_SECONDS
+        self.opened_at      = None
+        self._trial_started = None
+        self._trial_ticket  = NO_TRIAL
+        self._consecutive_429 = 0
+        self._outcomes.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state":         self.state,
+                "failure_rate":  round(self._failure_rate(), 3),
+                "window":        len(self._outcomes),
+                "open_for":      round(max(0.0, self.open_until - time.monotonic()), 1)
+                                 if self.state == STATE_OPEN else 0.0,
+                "trips":         self.trips,
+            }
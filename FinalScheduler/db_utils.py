@@ -1,10 +1,15 @@
 import os
+import time
+import hashlib
+import inspect
 import logging
+import threading
 from pathlib import Path
 from pymongo import MongoClient
 from bson import ObjectId
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Tuple
+from result_store import BoundedCache
 # Note: You might need to install python-dotenv: pip install python-dotenv
 
 # Use absolute path so .env is always found regardless of where Uvicorn is launched from
@@ -16,45 +21,195 @@ MONGO_URI = os.getenv("MONGO_URL") or os.getenv("MONGODB_URL")
 DB_NAME = os.getenv("MONGO_DB_NAME", "SYNCHRON")
 COLLECTION_NAME = "organisationdatas"
 
-# Initialize global variables explicitly as None
+# Config cache: entries expire after the TTL, the cache holds at most
+# CONFIG_CACHE_MAX_ENTRIES configs / CONFIG_CACHE_MAX_BYTES bytes, and a cached
+# config older than CONFIG_CACHE_REVALIDATE_SECONDS is revalidated with a cheap
+# updatedAt-only lookup before being served again.
+CONFIG_CACHE_TTL_SECONDS = float(os.getenv("CONFIG_CACHE_TTL_SECONDS", "600"))
+CONFIG_CACHE_MAX_ENTRIES = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "128"))
+CONFIG_CACHE_MAX_BYTES = int(os.getenv("CONFIG_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CONFIG_CACHE_REVALIDATE_SECONDS = float(os.getenv("CONFIG_CACHE_REVALIDATE_SECONDS", "10"))
+
+# Connection pool and explicit timeouts (shared by the sync and async clients)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "3000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+
+# Only the fields the scheduler and NLP processor read (plus version fields)
+SCHEDULER_FIELDS = (
+    "organisationId", "course", "year", "semester",
+    "college_info", "time_slots", "elective_slots", "departments", "sections",
+    "subjects", "labs", "faculty", "rooms", "subject_name_mapping",
+    "constraints", "special_requirements", "genetic_algorithm_params"
+)
+CONFIG_PROJECTION = {**{field: 1 for field in SCHEDULER_FIELDS}, "updatedAt": 1, "__v": 1}
+VERSION_PROJECTION = {"_id": 0, "updatedAt": 1, "__v": 1}
+
+# Same compound index the Mongoose schema declares for the primary lookup
+CONFIG_INDEX_KEYS = [("organisationId", 1), ("course", 1), ("year", 1), ("semester", 1)]
+CONFIG_INDEX_NAME = "organisationId_1_course_1_year_1_semester_1"
+
+# Clients are created lazily on first use: importing this module never
+# touches the network, so startup does not wait on MongoDB.
 client: Optional[MongoClient] = None
 # Using Any for Collection type for simplicity
 config_collection: Optional[Any] = None
+async_client: Optional[Any] = None
+async_config_collection: Optional[Any] = None
+_connect_lock = threading.Lock()
 
 # -----------------------------------------------------------------------------
 # DATABASE CONNECTION
 # -----------------------------------------------------------------------------
-try:
-    if MONGO_URI:
-        client = MongoClient(MONGO_URI)
-        # Check connection status
-        client.admin.command('ping') 
-        db = client[DB_NAME]
-        config_collection = db[COLLECTION_NAME]
-        logger.info("Connected to MongoDB successfully")
-    else:
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+def get_config_collection() -> Optional[Any]:
+    """Synchronous collection, connected lazily on first use"""
+    global client, config_collection
+    if config_collection is not None:
+        return config_collection
+    if not MONGO_URI:
+        logger.error("Neither MONGO_URL nor MONGODB_URL environment variable is set. Database connection skipped.")
+        return None
+    with _connect_lock:
+        if config_collection is None:
+            try:
+                client = MongoClient(MONGO_URI, **_client_options())
+                config_collection = client[DB_NAME][COLLECTION_NAME]
+            except Exception as e:
+                logger.error(f"Failed to create MongoDB client: {e}")
+                client = None
+                config_collection = None
+    return config_collection
+
+def get_async_config_collection() -> Optional[Any]:
+    """
+    Async (motor) collection, created lazily inside the running event loop.
+    Any stand-in installed with set_config_collections is returned instead.
+    """
+    global async_client, async_config_collection
+    if async_config_collection is not None:
+        return async_config_collection
+    if not MONGO_URI:
         logger.error("Neither MONGO_URL nor MONGODB_URL environment variable is set. Database connection skipped.")
-except Exception as e:
-    # Use logger for consistency instead of print
-    logger.error(f"Failed to connect to MongoDB at {MONGO_URI}: {e}")
-    client = None
-    config_collection = None # Ensure this is also set to None on failure
+        return None
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        async_client = AsyncIOMotorClient(MONGO_URI, **_client_options())
+        async_config_collection = async_client[DB_NAME][COLLECTION_NAME]
+    except Exception as e:
+        logger.error(f"Failed to create async MongoDB client: {e}")
+        async_client = None
+        async_config_collection = None
+    return async_config_collection
+
+def set_config_collections(sync_collection: Any = None, async_collection: Any = None):
+    """
+    Install in-process stand-ins, e.g. a mongomock collection (sync) and a
+    mongomock_motor collection (async). A plain mongomock collection also
+    works for the async path: non-awaitable results are used as-is.
+    """
+    global config_collection, async_config_collection
+    config_collection = sync_collection
+    async_config_collection = async_collection if async_collection is not None else sync_collection
+    invalidate_config()
+
+async def _resolve(result: Any) -> Any:
+    """Await motor results; pass through results of synchronous stand-ins"""
+    return await result if inspect.isawaitable(result) else result
+
+async def ensure_config_indexes() -> bool:
+    """Bootstrap the (organisationId, course, year, semester) lookup index; safe to call repeatedly"""
+    collection = get_async_config_collection()
+    if collection is None:
+        return False
+    try:
+        await _resolve(collection.create_index(CONFIG_INDEX_KEYS, name=CONFIG_INDEX_NAME, unique=True))
+        logger.info(f"Ensured index {CONFIG_INDEX_NAME} on {COLLECTION_NAME}")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not ensure index {CONFIG_INDEX_NAME}: {e}")
+        return False
+
+def close_connections():
+    """Close pooled clients (called on application shutdown)"""
+    global client, config_collection, async_client, async_config_collection
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        async_client.close()
+    client = config_collection = async_client = async_config_collection = None
 
 # -----------------------------------------------------------------------------
-# DATABASE UTILITY FUNCTION (FIXED)
+# CONFIG CACHE
 # -----------------------------------------------------------------------------
 
-def get_config_by_params(course: str, year: str, semester: str, organisation_id: str = None) -> Optional[Dict[str, Any]]:
+ConfigKey = Tuple[str, str, str, str]
+
+class CachedConfig:
     """
-    Fetches the timetable configuration document based on the Mongoose Schema hierarchy.
+    A cached configuration document plus artefacts derived from it
+    (e.g. the compiled TimetableData). Derived artefacts live and die with
+    the entry, so they are invalidated together with the config.
+    The config dict is shared between requests: treat it as read-only.
     """
-    
-    # FIX: Use explicit comparison 'is None' instead of 'not client' or 'not config_collection'
-    if client is None or config_collection is None:
-        logger.error("Database connection failed or not initialized. Cannot fetch config.")
-        return None
 
-    # Build Query based on your Mongoose Schema
+    def __init__(self, key: ConfigKey, config: Dict[str, Any], version: str, doc_id: Any = None):
+        self.key = key
+        self.config = config
+        self.version = version
+        self.doc_id = doc_id
+        self.fingerprint = hashlib.sha256(f"{key}|{version}".encode()).hexdigest()
+        self.checked_at = time.monotonic()
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def derive(self, name: str, builder: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Build (once) and memoise an artefact computed from this config"""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self.config)
+            return self._derived[name]
+
+
+config_cache = BoundedCache(
+    max_bytes=CONFIG_CACHE_MAX_BYTES,
+    ttl_seconds=CONFIG_CACHE_TTL_SECONDS,
+    max_entries=CONFIG_CACHE_MAX_ENTRIES
+)
+_change_stream_active = False
+
+def _config_version(document: Dict[str, Any]) -> str:
+    """Version token of a config document: updatedAt (Mongoose timestamps) plus __v"""
+    return f"{document.get('updatedAt')}|{document.get('__v')}"
+
+def invalidate_config(course: str = None, year: str = None, semester: str = None, organisation_id: str = None):
+    """Drop one cached config, or the whole cache when called without arguments"""
+    if course is None:
+        config_cache.clear()
+        return
+    config_cache.pop(_config_key(course, year, semester, organisation_id))
+
+def _config_key(course: str, year: str, semester: str, organisation_id: Optional[str]) -> ConfigKey:
+    return (
+        (organisation_id or "").strip(),
+        course.lower().strip(),
+        year.lower().strip(),
+        semester.lower().strip()
+    )
+
+def _build_query(course: str, year: str, semester: str, organisation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Build the lookup query based on the Mongoose Schema hierarchy (None if the org id is invalid)"""
     query = {
         "course": course.lower().strip(),
         "year": year.lower().strip(),
@@ -68,22 +223,151 @@ def get_config_by_params(course: str, year: str, semester: str, organisation_id:
         except Exception:
             logger.error(f"Invalid Organisation ID format: {organisation_id}")
             return None
+    return query
 
-    logger.info(f"Querying MongoDB with: {query}")
+def _store_config(key: ConfigKey, document: Dict[str, Any]) -> CachedConfig:
+    """Strip Mongo-specific fields from a fetched document and cache it"""
+    version = _config_version(document)
+    doc_id = document.pop("_id", None)
+    for field in ("__v", "updatedAt"):
+        document.pop(field, None)
 
-    # Fetch document and exclude Mongo-specific fields (_id, __v, etc.)
-    projection = {
-        "_id": 0, 
-        "__v": 0, 
-        "createdAt": 0, 
-        "updatedAt": 0
-    }
-    
-    config_document = config_collection.find_one(query, projection=projection)
-    
+    entry = CachedConfig(key, document, version, doc_id)
+    config_cache.put(key, entry, size=len(str(document)))
+    return entry
+
+def _invalidate_document(doc_id: Any) -> Optional[ConfigKey]:
+    """Drop the cached config built from a document _id (change-stream events only carry the _id)"""
+    for key, entry in config_cache.items():
+        if entry.doc_id == doc_id:
+            config_cache.pop(key)
+            return key
+    return None
+
+# -----------------------------------------------------------------------------
+# DATABASE UTILITY FUNCTIONS
+# -----------------------------------------------------------------------------
+
+def _fresh_entry(key: ConfigKey) -> Tuple[Optional[CachedConfig], bool]:
+    """Return (cached entry, needs_revalidation)"""
+    entry: Optional[CachedConfig] = config_cache.get(key)
+    if entry is None:
+        return None, False
+    fresh = _change_stream_active or time.monotonic() - entry.checked_at < CONFIG_CACHE_REVALIDATE_SECONDS
+    return entry, not fresh
+
+def _revalidated(entry: CachedConfig, version_doc: Optional[Dict[str, Any]]) -> bool:
+    if version_doc is not None and _config_version(version_doc) == entry.version:
+        entry.checked_at = time.monotonic()
+        return True
+    logger.info(f"Cached config for {entry.key} is outdated; re-fetching")
+    return False
+
+def _fetched(key: ConfigKey, config_document: Optional[Dict[str, Any]]) -> Optional[CachedConfig]:
     if config_document is None: # FIX: Check against None explicitly
-        logger.warning(f"No configuration found for {course} - {year} - {semester}")
+        logger.warning(f"No configuration found for {key[1]} - {key[2]} - {key[3]}")
+        config_cache.pop(key)
+        return None
+    return _store_config(key, config_document)
+
+def get_config_entry(course: str, year: str, semester: str, organisation_id: str = None) -> Optional[CachedConfig]:
+    """
+    Read-through cached lookup of a configuration document.
+
+    - Fresh hit (checked within CONFIG_CACHE_REVALIDATE_SECONDS, or kept fresh
+      by the change-stream watcher): served without touching the database.
+    - Stale hit: revalidated with an updatedAt/__v-only projection; the full
+      document is only re-fetched when the version changed.
+    - Miss: full fetch (scheduler fields only), then cached.
+
+    Blocking: async handlers should use get_config_entry_async instead.
+    """
+    collection = get_config_collection()
+    if collection is None:
+        logger.error("Database connection failed or not initialized. Cannot fetch config.")
+        return None
+
+    query = _build_query(course, year, semester, organisation_id)
+    if query is None:
         return None
 
+    key = _config_key(course, year, semester, organisation_id)
+    entry, stale = _fresh_entry(key)
+    if entry is not None and (not stale or _revalidated(entry, collection.find_one(query, projection=VERSION_PROJECTION))):
+        return entry
+
+    logger.info(f"Querying MongoDB with: {query}")
+    return _fetched(key, collection.find_one(query, projection=CONFIG_PROJECTION))
+
+async def get_config_entry_async(course: str, year: str, semester: str, organisation_id: str = None) -> Optional[CachedConfig]:
+    """Non-blocking variant of get_config_entry for async handlers (same caching rules)"""
+    collection = get_async_config_collection()
+    if collection is None:
+        logger.error("Database connection failed or not initialized. Cannot fetch config.")
+        return None
+
+    query = _build_query(course, year, semester, organisation_id)
+    if query is None:
+        return None
+
+    key = _config_key(course, year, semester, organisation_id)
+    entry, stale = _fresh_entry(key)
+    if entry is not None:
+        if not stale:
+            return entry
+        version_doc = await _resolve(collection.find_one(query, projection=VERSION_PROJECTION))
+        if _revalidated(entry, version_doc):
+            return entry
+
+    logger.info(f"Querying MongoDB with: {query}")
+    return _fetched(key, await _resolve(collection.find_one(query, projection=CONFIG_PROJECTION)))
+
+def get_config_by_params(course: str, year: str, semester: str, organisation_id: str = None) -> Optional[Dict[str, Any]]:
+    """
+    Fetches the timetable configuration document based on the Mongoose Schema hierarchy.
+    Served from the config cache when possible; the returned dict is shared, treat it as read-only.
+    """
+    entry = get_config_entry(course, year, semester, organisation_id)
     # Returns the fetched configuration dictionary
-    return config_document
\ No newline at end of file
+    return entry.config if entry is not None else None
+
+async def get_config_by_params_async(course: str, year: str, semester: str, organisation_id: str = None) -> Optional[Dict[str, Any]]:
+    """Non-blocking variant of get_config_by_params"""
+    entry = await get_config_entry_async(course, year, semester, organisation_id)
+    return entry.config if entry is not None else None
+
+def watch_config_changes(stop_event: Optional[threading.Event] = None):
+    """
+    Invalidate cached configs from a MongoDB change stream (requires a replica
+    set / Atlas). Blocking: run it in a daemon thread. While the stream is
+    open, cached configs are served without per-request revalidation.
+    """
+    global _change_stream_active
+    collection = get_config_collection()
+    if collection is None:
+        return
+    try:
+        with collection.watch() as stream:
+            _change_stream_active = True
+            logger.info("Config change stream active; cache invalidation is push-based")
+            while stop_event is None or not stop_event.is_set():
+                change = stream.try_next()
+                if change is None:
+                    time.sleep(0.5)
+                    continue
+                doc_id = change.get("documentKey", {}).get("_id")
+                key = _invalidate_document(doc_id)
+                if key is not None:
+                    logger.info(f"Config {key} changed ({change.get('operationType')}); cache entry dropped")
+    except Exception as e:
+        logger.warning(f"Config change stream unavailable, falling back to updatedAt revalidation: {e}")
+    finally:
+        _change_stream_active = False
+
+def start_config_change_watcher() -> Optional[threading.Event]:
+    """Start watch_config_changes in a daemon thread when CONFIG_CACHE_CHANGE_STREAMS is enabled"""
+    if os.getenv("CONFIG_CACHE_CHANGE_STREAMS", "false").lower() not in ("1", "true", "yes"):
+        return None
+    stop_event = threading.Event()
+    threading.Thread(target=watch_config_changes, args=(stop_event,), name="config-change-stream", daemon=True).start()
+    return stop_event
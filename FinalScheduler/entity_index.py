@@ -0,0 +1,195 @@
+"""
+entity_index.py
+===============
+Local fuzzy entity resolution for NLP requests.
+
+An ``EntityIndex`` is built once per configuration from the name -> id maps
+of faculty, rooms, sections and subjects. Every name/id is split into
+tokens, each token into padded character trigrams, and an inverted index
+trigram -> tokens is kept. Resolving a request then costs one pass over the
+request's own trigrams:
+
+- a token matches when most of its trigrams occur in the text (tolerates
+  typos, punctuation and suffixes: "Smith's", "CSE-A" vs "cse a");
+- an entity scores the IDF-weighted share of its tokens that matched, so
+  distinctive tokens ("Sharma") count more than common ones ("Lab").
+
+``candidates`` returns the entities above a score threshold plus a small
+top-k per kind, which is all the NLP prompt needs instead of the whole
+config. ``canonicalize`` folds a request to a stable cache key, replacing
+exact entity mentions by their IDs. Names that only differ in what the
+folding drops ("Lab 1" / "Lab-1", "Dr. A Rao" / "A Rao") but belong to
+different IDs are recorded in ``collisions``; a request mentioning one
+keeps its punctuation and honorifics in the key.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Tokens that carry no identity on their own
+STOP_TOKENS = frozenset({"dr", "prof", "mr", "mrs", "ms", "sir", "madam", "the", "of", "and"})
+
+TOKEN_MATCH_RATIO = 0.6    # share of a token's trigrams that must occur in the text
+ENTITY_THRESHOLD  = 0.5    # IDF-weighted share of an entity's tokens that must match
+DEFAULT_TOP_K     = 3
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lower-case and fold punctuation/underscores to single spaces."""
+    return _NON_ALNUM.sub(" ", (text or "").lower()).strip()
+
+
+def tokens(text: str) -> List[str]:
+    return [t for t in normalize(text).split() if t not in STOP_TOKENS]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text: str) -> Set[str]:
+    grams: Set[str] = set()
+    for word in normalize(text).split():
+        grams |= trigrams(word)
+    return grams
+
+
+class EntityIndex:
+    """Trigram index over ``{kind: {name: id}}`` entity maps."""
+
+    def __init__(self, entities: Dict[str, Dict[str, str]]) -> None:
+        self.entities = entities
+        # entity key = (kind, name); token ids index into self._tokens
+        self._tokens:        List[str]                                 = []
+        self._token_grams:   List[int]                                 = []
+        self._gram_index:    Dict[str, List[int]]                      = defaultdict(list)
+        self._entity_tokens: Dict[Tuple[str, str], List[Tuple[int, float]]] = {}
+        # exact token phrase (name or id) -> every entity id it names
+        self._phrases:       Dict[Tuple[str, ...], Set[str]]           = defaultdict(set)
+
+        token_ids: Dict[str, int] = {}
+        per_entity: Dict[Tuple[str, str], Set[str]] = {}
+        df: Dict[str, int] = defaultdict(int)
+        for kind, mapping in entities.items():
+            for name, entity_id in mapping.items():
+                toks = set(tokens(name)) | set(tokens(str(entity_id)))
+                for phrase in {tuple(tokens(name)), tuple(tokens(str(entity_id)))}:
+                    if phrase:
+                        self._phrases[phrase].add(str(entity_id))
+                per_entity[(kind, name)] = toks
+                for tok in toks:
+                    df[tok] += 1
+
+        n_entities = max(1, len(per_entity))
+        for key, toks in per_entity.items():
+            weighted: List[Tuple[int, float]] = []
+            for tok in toks:
+                tid = token_ids.get(tok)
+                if tid is None:
+                    tid = token_ids[tok] = len(self._tokens)
+                    grams = trigrams(tok)
+                    self._tokens.append(tok)
+                    self._token_grams.append(len(grams))
+                    for g in grams:
+                        self._gram_index[g].append(tid)
+                weighted.append((tid, math.log(1 + n_entities / df[tok])))
+            self._entity_tokens[key] = weighted
+        self._max_phrase = max((len(p) for p in self._phrases), default=0)
+        # Phrases that fold to the same tokens but name different ids
+        self.collisions: Dict[Tuple[str, ...], Set[str]] = {
+            phrase: ids for phrase, ids in self._phrases.items() if len(ids) > 1
+        }
+
+    def __len__(self) -> int:
+        return len(self._entity_tokens)
+
+    # ------------------------------------------------------------------ #
+    # Scoring                                                              #
+    # ------------------------------------------------------------------ #
+
+    def _matched_tokens(self, text: str) -> Set[int]:
+        hits: Dict[int, int] = defaultdict(int)
+        for g in text_trigrams(text):
+            for tid in self._gram_index.get(g, ()):
+                hits[tid] += 1
+        return {tid for tid, n in hits.items() if n / self._token_grams[tid] >= TOKEN_MATCH_RATIO}
+
+    def scores(self, text: str) -> Dict[Tuple[str, str], float]:
+        """Score every entity that shares at least one matched token with the text."""
+        matched = self._matched_tokens(text)
+        if not matched:
+            return {}
+        out: Dict[Tuple[str, str], float] = {}
+        for key, weighted in self._entity_tokens.items():
+            total = sum(w for _, w in weighted)
+            if not total:
+                continue
+            got = sum(w for tid, w in weighted if tid in matched)
+            if got:
+                out[key] = got / total
+        return out
+
+    def candidates(
+        self,
+        text:      str,
+        top_k:     int   = DEFAULT_TOP_K,
+        threshold: float = ENTITY_THRESHOLD,
+        kinds:     Iterable[str] = (),
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        ``{kind: {name: id}}`` restricted to entities scoring >= ``threshold``
+        plus the ``top_k`` best-scoring others per kind. A kind with no hits
+        gets its first ``top_k`` entities, so the prompt still has valid ids.
+        """
+        by_kind: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        for (kind, name), score in self.scores(text).items():
+            by_kind[kind].append((score, name))
+
+        result: Dict[str, Dict[str, str]] = {kind: {} for kind in (kinds or self.entities)}
+        for kind, scored in by_kind.items():
+            scored.sort(key=lambda x: (-x[0], x[1]))
+            chosen = [name for score, name in scored if score >= threshold]
+            chosen += [name for score, name in scored if score < threshold][:top_k]
+            result[kind] = {name: self.entities[kind][name] for name in chosen}
+        for kind in result:
+            if kind not in by_kind:
+                result[kind] = dict(itertools.islice(self.entities.get(kind, {}).items(), top_k))
+        return result
+
+    # ------------------------------------------------------------------ #
+    # Canonical form                                                       #
+    # ------------------------------------------------------------------ #
+
+    def canonicalize(self, text: str) -> str:
+        """
+        Fold case, whitespace, punctuation and honorifics, and replace exact
+        entity mentions by ``<id>``: "Dr. Smith absent Monday!" and
+        "smith  absent monday" share one canonical form. A mention of a
+        colliding name only folds case and whitespace, so "Dr. A Rao" and
+        "A Rao" keep separate keys.
+        """
+        words = tokens(text)
+        out: List[str] = []
+        i = 0
+        while i < len(words):
+            for size in range(min(self._max_phrase, len(words) - i), 0, -1):
+                ids = self._phrases.get(tuple(words[i:i + size]))
+                if not ids:
+                    continue
+                if len(ids) > 1:
+                    return " ".join(text.lower().split())
+                out.append("<" + "_".join(normalize(next(iter(ids))).split()) + ">")
+                i += size
+                break
+            else:
+                out.append(words[i])
+                i += 1
+        return " ".join(out)
@@ -0,0 +1,193 @@
+"""
+extraction_cache.py
+===================
+Content-addressed, size-bounded SQLite cache for LLM extraction results.
+
+Keys are derived from a SHA-256 of the *raw upload bytes* plus the model
+name and prompt version, so a re-upload is recognised before any PDF/Excel
+parsing happens, and a prompt or model change never serves stale results.
+The extractor also stores per-stage results here (OPT-17), keyed on the
+normalized text of each Stage-1 digest and Stage-2 chunk instead.
+
+- SQLite in WAL mode: concurrent readers, one writer, safe across uvicorn
+  workers and processes sharing the same file.
+- Values are zlib-compressed compact JSON.
+- Least-recently-used entries are evicted once the total stored size
+  exceeds the byte cap.
+
+Configuration (environment)
+---------------------------
+EXTRACTION_CACHE_PATH       SQLite file                 (default extraction_cache.sqlite3)
+EXTRACTION_CACHE_MAX_BYTES  Compressed size cap         (default 128 MiB)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+DEFAULT_PATH      = os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3")
+DEFAULT_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Evict down to this share of the cap so every write does not trigger eviction
+EVICT_TARGET_RATIO = 0.9
+# Skip the LRU timestamp write when an entry was touched this recently
+TOUCH_INTERVAL_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    key         TEXT PRIMARY KEY,
+    value       BLOB    NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL    NOT NULL,
+    accessed_at REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extraction_cache_accessed ON extraction_cache (accessed_at);
+"""
+
+
+def content_key(raw: Union[bytes, "hashlib._Hash"], *parts: str) -> str:
+    """
+    SHA-256 over the raw bytes and any qualifiers (model, prompt version, ...).
+    ``raw`` may also be a running sha256 of the bytes (e.g. from an upload
+    spool); it is copied, and the key is the same as for the bytes.
+    """
+    h = raw.copy() if hasattr(raw, "digest") else hashlib.sha256(raw)
+    for part in parts:
+        h.update(b"\0" + str(part).encode())
+    return h.hexdigest()
+
+
+# ===========================================================================
+# Cache
+# ===========================================================================
+
+class ExtractionCache:
+    """SQLite-backed LRU cache with a compressed-byte cap."""
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path      = path
+        self.max_bytes = max_bytes
+        self._local    = threading.local()   # one connection per thread
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------ #
+    # Connections                                                          #
+    # ------------------------------------------------------------------ #
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                           #
+    # ------------------------------------------------------------------ #
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            conn = self._connect()
+            row  = conn.execute(
+                "SELECT value, accessed_at FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL_SECONDS:
+                conn.execute("UPDATE extraction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, zlib.error, ValueError) as exc:
+            logger.warning("Extraction cache read failed: %s", exc)
+            return None
+
+    def put(self, key: str, value: Any) -> bool:
+        blob = zlib.compress(json.dumps(value, default=str, separators=(",", ":")).encode(), 6)
+        if len(blob) > self.max_bytes:
+            logger.warning("Extraction result (%d bytes) exceeds cache cap; not cached", len(blob))
+            return False
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extraction_cache (key, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), now, now),
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return True
+        except sqlite3.Error as exc:
+            logger.warning("Extraction cache write failed: %s", exc)
+            return False
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least-recently-used rows until the total is under the target (caller holds the write lock)."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target  = int(self.max_bytes * EVICT_TARGET_RATIO)
+        evicted = 0
+        for key, size in conn.execute(
+            "SELECT key, size FROM extraction_cache ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+            total   -= size
+            evicted += 1
+        logger.info("Extraction cache evicted %d entries (now %d bytes)", evicted, total)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extraction_cache"
+            ).fetchone()
+        except sqlite3.Error as exc:
+            return {"path": self.path, "error": str(exc)}
+        return {"path": self.path, "entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+# One instance per file, shared by every extractor in the process
+_caches: Dict[str, ExtractionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_extraction_cache(path: str = DEFAULT_PATH) -> ExtractionCache:
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ExtractionCache(path)
+        return cache
@@ -0,0 +1,78 @@
+"""
+lazy_imports.py
+===============
+Deferred imports for heavy optional libraries (pandas, pdfplumber, PyMuPDF,
+httpx, json-repair, ...).
+
+``lazy_module("pandas")`` returns a module proxy that performs the real
+import on first attribute access. Modules that only need a library on a
+rare path (PDF parsing, CSV export) therefore no longer pay its import time
+and resident memory at startup.
+
+    pd = lazy_module("pandas")      # nothing imported yet
+    pd.read_csv(...)                # pandas imported here, once
+
+Load times are recorded in ``load_times`` and logged at INFO level.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import sys
+import threading
+import time
+import types
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# module name -> seconds spent importing it on first use
+load_times: Dict[str, float] = {}
+
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the target module on first attribute access."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = None
+
+    def _load(self) -> types.ModuleType:
+        target = self.__dict__["_lazy_target"]
+        if target is None:
+            with _lock:
+                target = self.__dict__["_lazy_target"]
+                if target is None:
+                    t0     = time.perf_counter()
+                    target = importlib.import_module(self.__name__)
+                    load_times[self.__name__] = time.perf_counter() - t0
+                    logger.info("Lazy import: %s loaded in %.3fs",
+                                self.__name__, load_times[self.__name__])
+                    self.__dict__["_lazy_target"] = target
+        return target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_target"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> Any:
+    """Return the module if already imported, otherwise a lazy proxy for it."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """True once the real module has been imported (by us or anyone else)."""
+    return name in sys.modules
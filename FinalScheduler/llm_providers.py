@@ -0,0 +1,238 @@
+"""
+llm_providers.py
+================
+Lazy registry of LLM extraction providers with a background-probed health
+table.
+
+Nothing here touches the network at import time. A provider is registered
+when its API key is present, but its TimetableExtractor is only built on
+first use. Health comes from two sources:
+
+- background probes (``run_health_probes``) started from the app lifespan,
+  off the startup path;
+- passive results of real requests (``record_success`` / ``record_failure``).
+
+Each provider also has a circuit breaker (circuit_breaker.py) fed by the
+same outcomes. ``allow`` refuses calls to a provider whose breaker is open;
+the probe loop re-checks open providers as soon as their cooldown ends.
+
+``ordered_extractors`` returns providers healthy-first, with open breakers
+last, while keeping the configured priority inside each class.
+
+Configuration (environment)
+---------------------------
+CEREBRAS_API_KEY / GROQ_API_KEY / GEMINI_API_KEY   enable each provider
+PROVIDER_PROBE_INTERVAL_SECONDS                    probe period (default 300)
+PROVIDER_PROBE_TIMEOUT_SECONDS                     per-probe timeout (default 10)
+BREAKER_PROBE_INTERVAL_SECONDS                     how often open breakers are checked (default 5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from circuit_breaker import NO_TRIAL, STATE_OPEN, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+PROBE_INTERVAL_SECONDS = float(os.getenv("PROVIDER_PROBE_INTERVAL_SECONDS", "300"))
+PROBE_TIMEOUT_SECONDS  = float(os.getenv("PROVIDER_PROBE_TIMEOUT_SECONDS", "10"))
+BREAKER_PROBE_SECONDS  = float(os.getenv("BREAKER_PROBE_INTERVAL_SECONDS", "5"))
+
+HEALTH_UNKNOWN   = "unknown"
+HEALTH_HEALTHY   = "healthy"
+HEALTH_UNHEALTHY = "unhealthy"
+
+_HEALTH_RANK = {HEALTH_HEALTHY: 0, HEALTH_UNKNOWN: 1, HEALTH_UNHEALTHY: 2}
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    name:         str
+    api_key_env:  str
+    endpoint_url: str
+    model:        str
+
+
+# Priority order: Cerebras (primary), Groq (secondary), Gemini (fallback)
+PROVIDER_SPECS: Tuple[ProviderSpec, ...] = (
+    ProviderSpec("Cerebras", "CEREBRAS_API_KEY",
+                 "https://api.cerebras.ai/v1/chat/completions", "llama3.1-8b"),
+    ProviderSpec("Groq", "GROQ_API_KEY",
+                 "https://api.groq.com/openai/v1/chat/completions", "llama-3.1-8b-instant"),
+    ProviderSpec("Gemini", "GEMINI_API_KEY",
+                 "https://generativelanguage.googleapis.com/v1beta/openai/chat/completions", "gemini-2.0-flash"),
+)
+
+
+@dataclass
+class ProviderHealth:
+    status:       str             = HEALTH_UNKNOWN
+    last_checked: Optional[float] = None
+    latency:      Optional[float] = None
+    http_status:  Optional[int]   = None
+    last_error:   Optional[str]   = None
+    source:       Optional[str]   = None   # "probe" or "request"
+
+
+# ===========================================================================
+# Registry
+# ===========================================================================
+
+class ProviderRegistry:
+    """Holds provider specs, lazily-built extractors and the health table."""
+
+    def __init__(self, specs: Tuple[ProviderSpec, ...] = PROVIDER_SPECS) -> None:
+        self._specs: Dict[str, ProviderSpec] = {}
+        self._keys:  Dict[str, str]          = {}
+        for spec in specs:
+            key = os.getenv(spec.api_key_env)
+            if key:
+                self._specs[spec.name] = spec
+                self._keys[spec.name]  = key
+            else:
+                logger.warning("%s not set - %s disabled", spec.api_key_env, spec.name)
+        self._extractors: Dict[str, Any]            = {}
+        self._health:     Dict[str, ProviderHealth] = {n: ProviderHealth() for n in self._specs}
+        self._breakers:   Dict[str, CircuitBreaker] = {n: CircuitBreaker(n) for n in self._specs}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Providers                                                            #
+    # ------------------------------------------------------------------ #
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def get_extractor(self, name: str) -> Any:
+        """Build the provider's extractor on first use (no startup ping)."""
+        with self._lock:
+            extractor = self._extractors.get(name)
+            if extractor is None:
+                from timetable_extractor import TimetableExtractor
+                spec = self._specs[name]
+                extractor = TimetableExtractor(
+                    cerebras_api_key = self._keys[name],
+                    endpoint_url     = spec.endpoint_url,
+                    model            = spec.model,
+                    test_connection  = False,
+                )
+                self._extractors[name] = extractor
+            return extractor
+
+    def ordered_names(self) -> List[str]:
+        """Provider names, healthy first, then unknown, then unhealthy, open breakers last (stable by priority)."""
+        return sorted(self._specs, key=lambda n: (self._breakers[n].state == STATE_OPEN,
+                                                  _HEALTH_RANK[self._health[n].status]))
+
+    def ordered_extractors(self) -> List[Tuple[str, Any]]:
+        return [(name, self.get_extractor(name)) for name in self.ordered_names()]
+
+    def primary(self) -> Optional[str]:
+        names = self.ordered_names()
+        return names[0] if names else None
+
+    # ------------------------------------------------------------------ #
+    # Health table                                                         #
+    # ------------------------------------------------------------------ #
+
+    def _update(self, name: str, **fields: Any) -> None:
+        health = self._health.get(name)
+        if health is None:
+            return
+        for k, v in fields.items():
+            setattr(health, k, v)
+        health.last_checked = time.time()
+
+    def record_success(self, name: str, latency: Optional[float] = None, source: str = "request",
+                       ticket: Optional[int] = None) -> None:
+        self._update(name, status=HEALTH_HEALTHY, latency=latency, last_error=None, source=source)
+        if name in self._breakers:
+            self._breakers[name].record_success(latency, ticket)
+
+    def record_failure(self, name: str, error: Any, http_status: Optional[int] = None,
+                       source: str = "request", retry_after: Optional[float] = None,
+                       ticket: Optional[int] = None) -> None:
+        self._update(name, status=HEALTH_UNHEALTHY, last_error=str(error)[:200],
+                     http_status=http_status, source=source)
+        if name in self._breakers:
+            self._breakers[name].record_failure(http_status, retry_after, ticket)
+
+    def allow(self, name: str) -> Optional[int]:
+        """
+        None while the provider's breaker is open; otherwise the ticket to
+        report the outcome with (it claims the half-open trial, if due).
+        """
+        breaker = self._breakers.get(name)
+        return NO_TRIAL if breaker is None else breaker.allow()
+
+    def health_table(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {**asdict(h), "breaker": self._breakers[name].snapshot()}
+                for name, h in self._health.items()}
+
+    def is_healthy(self, name: str) -> bool:
+        health = self._health.get(name)
+        return health is not None and health.status == HEALTH_HEALTHY
+
+    # ------------------------------------------------------------------ #
+    # Background probing                                                   #
+    # ------------------------------------------------------------------ #
+
+    async def probe(self, name: str) -> bool:
+        """Probe one provider without blocking the event loop."""
+        ticket = self.allow(name)
+        if ticket is None:
+            return False                # still cooling down, or its half-open trial is in flight
+        # Building the first extractor imports the extraction stack; keep that off the loop too
+        extractor = await asyncio.to_thread(self.get_extractor, name)
+        t0 = time.perf_counter()
+        status = await extractor._test_connection_async(PROBE_TIMEOUT_SECONDS)
+        latency = time.perf_counter() - t0
+        if status == 200:
+            self.record_success(name, latency, source="probe", ticket=ticket)
+            return True
+        self.record_failure(name, f"probe HTTP {status}" if status else "unreachable",
+                            http_status=status, source="probe", ticket=ticket)
+        return False
+
+    async def probe_all(self) -> Dict[str, bool]:
+        names   = self.names
+        results = await asyncio.gather(*(self.probe(n) for n in names), return_exceptions=True)
+        return {n: (r is True) for n, r in zip(names, results)}
+
+    async def run_health_probes(self, interval: float = PROBE_INTERVAL_SECONDS) -> None:
+        """
+        Probe all providers now and then every ``interval`` seconds until
+        cancelled; in between, probe any provider whose open breaker has
+        finished its cooldown so it comes back without waiting for traffic.
+        """
+        next_full = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_full:
+                    next_full = time.monotonic() + interval
+                    results = await self.probe_all()
+                    logger.info("Provider health probe: %s", results)
+                else:
+                    due = [n for n, b in self._breakers.items() if b.trial_due()]
+                    if due:
+                        results = await asyncio.gather(*(self.probe(n) for n in due), return_exceptions=True)
+                        logger.info("Breaker trial probe: %s", {n: (r is True) for n, r in zip(due, results)})
+            except Exception as exc:
+                logger.warning("Provider health probe failed: %s", exc)
+            await asyncio.sleep(min(interval, BREAKER_PROBE_SECONDS))
+
+
+provider_registry = ProviderRegistry()
@@ -0,0 +1,385 @@
+"""
+llm_transport.py
+================
+Shared, long-lived HTTP transport for every LLM call (document extraction,
+NLP parsing, provider health probes).
+
+- One pooled ``httpx.AsyncClient`` per event loop (keep-alive, HTTP/2 when
+  the ``h2`` package is installed) and one pooled sync client for threaded
+  callers, so a TLS handshake is paid per connection instead of per call.
+- Per-provider timeouts (connect / read / write / pool).
+- Retries with exponential backoff and full jitter on transport errors, 429
+  and 5xx; ``Retry-After`` is honoured.
+- Admission control: each attempt takes a slot from the provider's shared
+  adaptive limiter (rate_limiter.py) and reports success / 429 back to it.
+  With ``admit_timeout`` set, a provider that cannot admit the call in
+  time fails at once with a 429-style ``LLMTransportError`` (not retried),
+  so a router can move on to the next provider.
+- Cancellation is never retried: a cancelled call propagates immediately and
+  its pooled connection is released.
+
+Configuration (environment)
+---------------------------
+LLM_MAX_CONNECTIONS                   pool size                        (default 20)
+LLM_MAX_KEEPALIVE                     idle keep-alive connections      (default 10)
+LLM_KEEPALIVE_EXPIRY_SECONDS          idle connection lifetime         (default 60)
+LLM_HTTP2                             "0" disables HTTP/2              (default 1)
+LLM_MAX_RETRIES                       attempts per call                (default 3)
+LLM_RETRY_BACKOFF_SECONDS             base backoff                     (default 1)
+LLM_CONNECT_TIMEOUT_SECONDS           connect timeout                  (default 5)
+LLM_READ_TIMEOUT_SECONDS              read timeout for unknown hosts   (default 90)
+LLM_<PROVIDER>_READ_TIMEOUT_SECONDS   per-provider read timeout, e.g. LLM_GROQ_READ_TIMEOUT_SECONDS
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from lazy_imports import lazy_module
+from rate_limiter import ProviderBusy, rate_limiter
+
+httpx = lazy_module("httpx")
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+MAX_CONNECTIONS       = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE         = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY      = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP2_ENABLED         = os.getenv("LLM_HTTP2", "1") != "0"
+DEFAULT_MAX_RETRIES   = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "1"))
+MAX_BACKOFF_SECONDS   = 30.0
+CONNECT_TIMEOUT       = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+DEFAULT_READ_TIMEOUT  = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "90"))
+
+# host -> provider name, used to pick timeouts when the caller does not say
+PROVIDER_HOSTS = {
+    "api.cerebras.ai":                   "cerebras",
+    "api.groq.com":                      "groq",
+    "generativelanguage.googleapis.com": "gemini",
+}
+
+# Default read timeouts; the fast inference providers get a tighter budget
+PROVIDER_READ_TIMEOUTS = {
+    "cerebras": 60.0,
+    "groq":     60.0,
+    "gemini":   90.0,
+}
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class LLMTransportError(RuntimeError):
+    """Raised when an LLM call fails after all retries (or with a non-retryable status)."""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.status      = status
+        self.retry_after = retry_after
+
+
+@dataclass
+class ChatResponse:
+    """Result of one chat-completions call."""
+    text:          str
+    finish_reason: Optional[str]  = None
+    latency:       float          = 0.0
+    status:        int            = 200
+    attempts:      int            = 1
+    provider:      str            = "default"
+    headers:       Dict[str, str] = field(default_factory=dict)
+
+
+# ===========================================================================
+# Transport
+# ===========================================================================
+
+class LLMTransport:
+    """Pooled async/sync clients plus the retry policy shared by all LLM callers."""
+
+    def __init__(
+        self,
+        max_connections:  int   = MAX_CONNECTIONS,
+        max_keepalive:    int   = MAX_KEEPALIVE,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        http2:            bool  = HTTP2_ENABLED,
+        max_retries:      int   = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        self.max_connections  = max_connections
+        self.max_keepalive    = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2            = http2 and importlib.util.find_spec("h2") is not None
+        self.max_retries      = max_retries
+        # An AsyncClient is bound to the loop that first used it
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._sync_client: Any = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # Clients                                                              #
+    # ------------------------------------------------------------------ #
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "limits": httpx.Limits(
+                max_connections           = self.max_connections,
+                max_keepalive_connections = self.max_keepalive,
+                keepalive_expiry          = self.keepalive_expiry,
+            ),
+            "timeout": self.timeout_for(None),
+        }
+
+    def client(self) -> Any:
+        """The pooled AsyncClient for the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(http2=self.http2, **self._client_kwargs())
+                self._clients[loop] = client
+                logger.info("LLM transport: new async pool (http2=%s)", self.http2)
+            return client
+
+    def sync_client(self) -> Any:
+        """The pooled sync client, for callers running in worker threads."""
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                # HTTP/2 multiplexing needs the async client; sync stays on HTTP/1.1
+                self._sync_client = httpx.Client(**self._client_kwargs())
+            return self._sync_client
+
+    async def aclose(self) -> None:
+        """Close the running loop's async pool (call before the loop goes away)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._sync_client = self._sync_client, None
+        if client is not None:
+            client.close()
+
+    # ------------------------------------------------------------------ #
+    # Policy                                                               #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def provider_for_url(url: str) -> str:
+        return PROVIDER_HOSTS.get(urlparse(url).hostname or "", "default")
+
+    def timeout_for(self, provider: Optional[str], read: Optional[float] = None) -> Any:
+        """httpx.Timeout for a provider; ``read`` overrides the configured read timeout."""
+        if read is None:
+            env  = os.getenv(f"LLM_{(provider or '').upper()}_READ_TIMEOUT_SECONDS") if provider else None
+            read = float(env) if env else PROVIDER_READ_TIMEOUTS.get(provider or "", DEFAULT_READ_TIMEOUT)
+        return httpx.Timeout(connect=min(CONNECT_TIMEOUT, read), read=read, write=10.0, pool=5.0)
+
+    @staticmethod
+    def _retry_after(headers: Any) -> Optional[float]:
+        value = headers.get("retry-after") if headers is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None   # HTTP-date form; fall back to our own backoff
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff; a server Retry-After is a floor."""
+        delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = min(MAX_BACKOFF_SECONDS, retry_after) + delay / 4
+        return delay
+
+    @staticmethod
+    def _parse_body(body: Dict[str, Any]) -> Dict[str, Any]:
+        choice = body["choices"][0]
+        return {
+            "text":          (choice.get("message") or {}).get("content") or "",
+            "finish_reason": choice.get("finish_reason"),
+        }
+
+    @staticmethod
+    def _parse_stream_line(line: str, collected: List[str], state: Dict[str, Any]) -> bool:
+        """Handle one SSE line; returns False once the stream reports [DONE]."""
+        line = line.strip()
+        if not line.startswith("data: "):
+            return True
+        payload = line[6:]
+        if payload == "[DONE]":
+            return False
+        try:
+            choice = json.loads(payload)["choices"][0]
+        except (json.JSONDecodeError, KeyError, IndexError):
+            return True
+        collected.append((choice.get("delta") or {}).get("content") or "")
+        if choice.get("finish_reason"):
+            state["finish_reason"] = choice["finish_reason"]
+        return True
+
+    def _error_for(self, status: int, body: Any, headers: Any) -> LLMTransportError:
+        text = body.decode(errors="replace") if isinstance(body, bytes) else str(body)
+        return LLMTransportError(f"HTTP {status}: {text[:200]}", status=status,
+                                 retry_after=self._retry_after(headers))
+
+    # ------------------------------------------------------------------ #
+    # Async API                                                            #
+    # ------------------------------------------------------------------ #
+
+    async def _send_async(self, url, headers, payload, stream, timeout) -> Dict[str, Any]:
+        client = self.client()
+        if stream:
+            collected: List[str]      = []
+            state:     Dict[str, Any] = {"finish_reason": None}
+            async with client.stream("POST", url, headers=headers, json=payload, timeout=timeout) as resp:
+                if resp.status_code != 200:
+                    raise self._error_for(resp.status_code, await resp.aread(), resp.headers)
+                async for line in resp.aiter_lines():
+                    if not self._parse_stream_line(line, collected, state):
+                        break
+                return {"text": "".join(collected), "finish_reason": state["finish_reason"],
+                        "status": resp.status_code, "headers": dict(resp.headers)}
+        resp = await client.post(url, headers=headers, json=payload, timeout=timeout)
+        if resp.status_code != 200:
+            raise self._error_for(resp.status_code, resp.text, resp.headers)
+        return {**self._parse_body(resp.json()), "status": resp.status_code, "headers": dict(resp.headers)}
+
+    async def chat(
+        self,
+        url:      str,
+        headers:  Dict[str, str],
+        payload:  Dict[str, Any],
+        stream:   bool            = False,
+        provider: Optional[str]   = None,
+        timeout:  Optional[float] = None,
+        retries:  Optional[int]   = None,
+        admit_timeout: Optional[float] = None,
+    ) -> ChatResponse:
+        """POST a chat-completions request over the shared pool, retrying transient failures."""
+        provider = provider or self.provider_for_url(url)
+        attempts = max(1, retries if retries is not None else self.max_retries)
+        t_out    = self.timeout_for(provider, timeout)
+        last_exc: Optional[Exception] = None
+        for attempt in range(1, attempts + 1):
+            try:
+                async with rate_limiter.slot(provider, admit_timeout) as limiter:
+                    t0 = time.perf_counter()
+                    try:
+                        result = await self._send_async(url, headers, payload, stream, t_out)
+                    except Exception as exc:
+                        self._feedback(limiter, exc)
+                        raise
+                    limiter.on_success(result["headers"])
+                return ChatResponse(latency=time.perf_counter() - t0, attempts=attempt,
+                                    provider=provider, **result)
+            except asyncio.CancelledError:
+                raise
+            except ProviderBusy as exc:
+                # Nothing was sent; report it like a 429 so the caller's breaker sees it
+                last_exc = LLMTransportError(str(exc), status=429, retry_after=exc.retry_after)
+                break
+            except Exception as exc:
+                last_exc = exc
+                if not self._should_retry(exc) or attempt == attempts:
+                    break
+                delay = self._backoff(attempt, getattr(exc, "retry_after", None))
+                logger.warning("LLM %s attempt %d/%d failed (%s); retrying in %.2fs",
+                               provider, attempt, attempts, exc, delay)
+                await asyncio.sleep(delay)
+        raise self._final_error(provider, attempt, last_exc)
+
+    # ------------------------------------------------------------------ #
+    # Sync API (worker threads)                                            #
+    # ------------------------------------------------------------------ #
+
+    def chat_sync(
+        self,
+        url:      str,
+        headers:  Dict[str, str],
+        payload:  Dict[str, Any],
+        provider: Optional[str]   = None,
+        timeout:  Optional[float] = None,
+        retries:  Optional[int]   = None,
+    ) -> ChatResponse:
+        """Blocking variant of :meth:`chat` (non-streaming) over the shared sync pool."""
+        provider = provider or self.provider_for_url(url)
+        attempts = max(1, retries if retries is not None else self.max_retries)
+        t_out    = self.timeout_for(provider, timeout)
+        last_exc: Optional[Exception] = None
+        for attempt in range(1, attempts + 1):
+            try:
+                with rate_limiter.slot_sync(provider) as limiter:
+                    t0 = time.perf_counter()
+                    try:
+                        resp = self.sync_client().post(url, headers=headers, json=payload, timeout=t_out)
+                        if resp.status_code != 200:
+                            raise self._error_for(resp.status_code, resp.text, resp.headers)
+                    except Exception as exc:
+                        self._feedback(limiter, exc)
+                        raise
+                    limiter.on_success(resp.headers)
+                return ChatResponse(latency=time.perf_counter() - t0, attempts=attempt,
+                                    provider=provider, status=resp.status_code,
+                                    headers=dict(resp.headers), **self._parse_body(resp.json()))
+            except Exception as exc:
+                last_exc = exc
+                if not self._should_retry(exc) or attempt == attempts:
+                    break
+                delay = self._backoff(attempt, getattr(exc, "retry_after", None))
+                logger.warning("LLM %s attempt %d/%d failed (%s); retrying in %.2fs",
+                               provider, attempt, attempts, exc, delay)
+                time.sleep(delay)
+        raise self._final_error(provider, attempt, last_exc)
+
+    # ------------------------------------------------------------------ #
+    # Error helpers                                                        #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _feedback(limiter: Any, exc: Exception) -> None:
+        """Only 429s shrink the limiter; other failures say nothing about capacity."""
+        if isinstance(exc, LLMTransportError) and exc.status == 429:
+            limiter.on_rate_limited(exc.retry_after)
+
+    @staticmethod
+    def _should_retry(exc: Exception) -> bool:
+        if isinstance(exc, LLMTransportError):
+            return exc.status is None or exc.status in RETRYABLE_STATUS
+        # Network errors and malformed bodies are worth another attempt
+        return isinstance(exc, (httpx.TransportError, ValueError, KeyError, IndexError))
+
+    @staticmethod
+    def _final_error(provider: str, attempts: int, exc: Optional[Exception]) -> LLMTransportError:
+        if isinstance(exc, LLMTransportError):
+            err = LLMTransportError(f"{provider}: {exc}", status=exc.status, retry_after=exc.retry_after)
+        else:
+            err = LLMTransportError(f"{provider}: {type(exc).__name__}: {exc}")
+        err.__cause__ = exc
+        logger.error("LLM %s failed after %d attempt(s): %s", provider, attempts, exc)
+        return err
+
+
+llm_transport = LLMTransport()
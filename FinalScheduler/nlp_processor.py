@@ -1,9 +1,14 @@
 import os
 import json
-import requests
+import copy
+import hashlib
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from nlp_models import NLPResponse
+from llm_transport import llm_transport
+from entity_index import EntityIndex
+from nlp_rules import RuleParser
+from result_store import BoundedCache
 
 # --- Configuration ---
 logger = logging.getLogger(__name__)
@@ -30,6 +35,24 @@ else:
     NLP_LLM_MODEL = None
     logger.warning("No LLM API key found for NLP processor")
 
+# Prompt context: small configs are sent whole; larger ones are filtered to
+# the entities the request mentions plus the top-k closest per kind.
+NLP_PROMPT_TOP_K = int(os.getenv("NLP_PROMPT_TOP_K", "3"))
+NLP_FULL_CONTEXT_MAX_ENTITIES = int(os.getenv("NLP_FULL_CONTEXT_MAX_ENTITIES", "40"))
+
+# Deterministic parser for common templates; "0" sends everything to the LLM
+NLP_RULES_ENABLED = os.getenv("NLP_RULES_ENABLED", "1") != "0"
+
+# Static instruction prefix, keyed by config hash (shared across processor instances)
+_prompt_prefix_cache = BoundedCache(max_bytes=4 * 1024 * 1024, ttl_seconds=None, max_entries=256)
+
+# Validated NLPResponse dicts keyed by (config hash, canonical request text)
+nlp_result_cache = BoundedCache(
+    max_bytes=int(os.getenv("NLP_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("NLP_CACHE_TTL_SECONDS", "900")),
+    max_entries=int(os.getenv("NLP_CACHE_MAX_ENTRIES", "2048")),
+)
+
 class TimetableNLPProcessor:
     def __init__(self, current_config: Dict[str, Any]):
         self.config = current_config
@@ -44,15 +67,59 @@ class TimetableNLPProcessor:
         # Helper for subjects (name -> id)
         self.valid_subjects = {s['name']: s.get('subject_id', 'Unknown') for s in self.config.get('subjects', [])}
 
-    def _build_system_prompt(self) -> str:
+        # Built once per config: the processor itself is memoised per cached config entry
+        self.entities = {
+            "faculty":  self.valid_faculty,
+            "rooms":    self.valid_rooms,
+            "sections": self.valid_sections,
+            "subjects": self.valid_subjects,
+        }
+        self.entity_index = EntityIndex(self.entities)
+        self.rule_parser = RuleParser(
+            self.entities, (self.config.get('time_slots') or {}).get('working_days') or ()
+        )
+        self.config_hash = hashlib.sha256(
+            json.dumps(self.config, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _relevant_entities(self, user_text: Optional[str]) -> Dict[str, Dict[str, str]]:
+        """Entities to show the LLM: everything for small configs, otherwise index candidates."""
+        if user_text is None or len(self.entity_index) <= NLP_FULL_CONTEXT_MAX_ENTITIES:
+            return self.entities
+        selected = self.entity_index.candidates(user_text, top_k=NLP_PROMPT_TOP_K)
+        logger.debug(
+            f"NLP prompt context: {sum(len(v) for v in selected.values())}/{len(self.entity_index)} entities"
+        )
+        return selected
+
+    def _build_system_prompt(self, user_text: Optional[str] = None) -> str:
+        entities = self._relevant_entities(user_text)
+        return self._instruction_prefix() + f"""
+        ### DATA CONTEXT (Use these IDs; only entities relevant to this request are listed):
+        - Faculty: {json.dumps(entities["faculty"])}
+        - Rooms: {json.dumps(entities["rooms"])}
+        - Sections: {json.dumps(entities["sections"])}
+        - Subjects: {json.dumps(entities["subjects"])}
+        """
+
+    def _instruction_prefix(self) -> str:
+        prefix = _prompt_prefix_cache.get(self.config_hash)
+        if prefix is None:
+            prefix = self._build_instruction_prefix()
+            _prompt_prefix_cache.put(self.config_hash, prefix)
+        return prefix
+
+    def _build_instruction_prefix(self) -> str:
+        # Static for a given config, and placed first so providers can reuse the prompt prefix
+        time_slots = self.config.get('time_slots') or {}
+        working_days = time_slots.get('working_days') or []
+        periods = len(time_slots.get('periods') or [])
         return f"""
         You are a Schedule Configuration Assistant. Convert user text into a strict JSON object adhering to the provided schema.
 
-        ### DATA CONTEXT (Use these IDs):
-        - Faculty: {json.dumps(self.valid_faculty)}
-        - Rooms: {json.dumps(self.valid_rooms)}
-        - Sections: {json.dumps(self.valid_sections)}
-        - Subjects: {json.dumps(self.valid_subjects)}
+        ### SCHEDULE
+        - Working days: {json.dumps(working_days)}
+        - Periods per day: {periods}
 
         ### 1. CONSTRAINT DIFFERENTIATION (CRITICAL)
         You must distinguish between **HARD** (Rules) and **SOFT** (Preferences).
@@ -114,7 +181,7 @@ class TimetableNLPProcessor:
         }}
         """
 
-    def _call_llm(self, system_prompt: str, user_text: str) -> str:
+    def _build_request(self, system_prompt: str, user_text: str):
         headers = {"Authorization": f"Bearer {NLP_LLM_API_KEY}", "Content-Type": "application/json"}
         data = {
             "model": NLP_LLM_MODEL,
@@ -124,20 +191,77 @@ class TimetableNLPProcessor:
             ],
             "response_format": {"type": "json_object"}
         }
-        
-        resp = requests.post(NLP_LLM_API_URL, headers=headers, json=data)
-        resp.raise_for_status()
-        return resp.json()['choices'][0]['message']['content']
+        return headers, data
+
+    def _call_llm(self, system_prompt: str, user_text: str) -> str:
+        headers, data = self._build_request(system_prompt, user_text)
+        return llm_transport.chat_sync(NLP_LLM_API_URL, headers, data).text
+
+    async def _call_llm_async(self, system_prompt: str, user_text: str) -> str:
+        headers, data = self._build_request(system_prompt, user_text)
+        resp = await llm_transport.chat(NLP_LLM_API_URL, headers, data)
+        return resp.text
+
+    def _validate(self, raw_json: str) -> Dict[str, Any]:
+        # Basic cleanup
+        if "```json" in raw_json:
+            raw_json = raw_json.split("```json")[1].split("```")[0].strip()
+
+        validated = NLPResponse.model_validate_json(raw_json)
+        return validated.model_dump(exclude_none=True)
+
+    # --- Result cache ---
+    def cache_key(self, user_text: str):
+        """Config hash + canonical text (case/space/punctuation folded, entity mentions -> IDs)."""
+        return (self.config_hash, self.entity_index.canonicalize(user_text))
+
+    def _cached(self, key) -> Optional[Dict[str, Any]]:
+        result = nlp_result_cache.get(key)
+        if result is not None:
+            logger.info("NLP cache hit")
+            return copy.deepcopy(result)
+        return None
+
+    def _remember(self, key, result: Dict[str, Any]) -> Dict[str, Any]:
+        # Only validated responses are cached; errors are retried next time
+        nlp_result_cache.put(key, copy.deepcopy(result))
+        return result
+
+    def _rule_parse(self, user_text: str) -> Optional[Dict[str, Any]]:
+        if not NLP_RULES_ENABLED:
+            return None
+        result = self.rule_parser.parse(user_text)
+        if result is not None:
+            logger.info("NLP request handled by rule parser")
+        return result
 
     def parse_request(self, user_text: str) -> Dict[str, Any]:
+        ruled = self._rule_parse(user_text)
+        if ruled is not None:
+            return ruled
+        key = self.cache_key(user_text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        try:
+            result = self._validate(self._call_llm(self._build_system_prompt(user_text), user_text))
+        except Exception as e:
+            logger.error(f"NLP Error: {e}")
+            return {"error": "Parsing Failed", "details": str(e)}
+        return self._remember(key, result)
+
+    async def parse_request_async(self, user_text: str) -> Dict[str, Any]:
+        """Same as parse_request, but awaits the LLM call instead of blocking the event loop."""
+        ruled = self._rule_parse(user_text)
+        if ruled is not None:
+            return ruled
+        key = self.cache_key(user_text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
         try:
-            raw_json = self._call_llm(self._build_system_prompt(), user_text)
-            # Basic cleanup
-            if "```json" in raw_json:
-                raw_json = raw_json.split("```json")[1].split("```")[0].strip()
-            
-            validated = NLPResponse.model_validate_json(raw_json)
-            return validated.model_dump(exclude_none=True)
+            result = self._validate(await self._call_llm_async(self._build_system_prompt(user_text), user_text))
         except Exception as e:
             logger.error(f"NLP Error: {e}")
-            return {"error": "Parsing Failed", "details": str(e)}
\ No newline at end of file
+            return {"error": "Parsing Failed", "details": str(e)}
+        return self._remember(key, result)
\ No newline at end of file
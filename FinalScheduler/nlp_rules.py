@@ -0,0 +1,309 @@
+"""
+nlp_rules.py
+============
+Deterministic fast path for the common /api/nlp/parse templates.
+
+Most requests follow a handful of shapes:
+
+    "Dr. Sharma is absent Monday to Wednesday"        -> faculty_absence
+    "Room 101 under maintenance on Friday"            -> resource_unavailable
+    "CSE-A is on a field trip Thursday"               -> section_unavailable
+    "Max 5 classes a day"                             -> max_classes_per_day_per_section
+
+``RuleParser`` recognises these against the config's exact entity names and
+IDs and emits the same ``NLPResponse`` the LLM path produces. A request is
+only answered here when *every* clause is fully consumed by a rule (entity,
+keyword, days/periods and known filler words); anything else - unknown
+words, several entities in one clause, negations - returns ``None`` and the
+caller escalates to the LLM.
+
+Two days only form a range when joined by "to" / "through" / "till" /
+"until" ("from Monday to Wednesday"). Day lists ("Monday and Wednesday"),
+open-ended ranges ("until Wednesday", "from Tuesday") and days outside the
+config's working days are escalated.
+
+``rule_stats`` counts hits and escalations so the hit rate can be monitored
+(reported by /api/health).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from entity_index import normalize, tokens
+from nlp_models import NLPResponse
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+DAY_ALIASES = {
+    **{d.lower(): d for d in DAYS},
+    "mon": "Monday", "tue": "Tuesday", "tues": "Tuesday", "wed": "Wednesday",
+    "thu": "Thursday", "thur": "Thursday", "thurs": "Thursday", "fri": "Friday",
+    "sat": "Saturday", "sun": "Sunday",
+}
+
+# Multi-word cues are folded into single tokens before matching
+PHRASES = {
+    "not available":  "unavailable",
+    "out of service": "unavailable",
+    "out of order":   "unavailable",
+    "on leave":       "leave",
+    "field trip":     "trip",
+    "industrial visit": "trip",
+    "whole week":     "week",
+    "all week":       "week",
+    "entire week":    "week",
+}
+
+FACULTY_CUES = {"absent", "absence", "leave", "unavailable", "away", "sick", "off", "out"}
+ROOM_CUES    = {"maintenance", "repair", "repairs", "broken", "unavailable", "closed",
+                "renovation", "blocked", "cleaning"}
+SECTION_CUES = {"trip", "excursion", "visit", "exam", "exams", "event", "unavailable",
+                "away", "tour", "fest", "off"}
+
+RANGE_JOINERS = {"to", "till", "until", "through", "thru"}
+RANGE_WORDS   = RANGE_JOINERS | {"from"}
+PERIOD_WORDS  = {"period", "periods", "slot", "slots"}
+FILLER_WORDS  = {
+    "is", "are", "will", "be", "been", "being", "has", "have", "on", "for", "a", "an",
+    "in", "at", "under", "going", "goes", "day", "days", "this", "next", "please",
+    "all", "its", "it", "s", "due", "whole", "entire",
+}
+
+_SENTENCE_SPLIT = re.compile(
+    r"(?<!\bdr)(?<!\bprof)(?<!\bmr)(?<!\bmrs)(?<!\bms)\.(?:\s+|$)|[;\n]+|\balso\b",
+    re.IGNORECASE,
+)
+_MAX_CLASSES = re.compile(
+    r"^(?:strictly |please |set )?(?:max|maximum|at most|no more than|not more than|up to|upto)"
+    r" (\d+) (?:classes|lectures|periods) (?:a|per|each) day(?: per section)?$"
+    r"|^(\d+) (?:classes|lectures|periods) (?:a|per|each) day (?:max|maximum|at most)$"
+)
+_PERIOD_TOKEN = re.compile(r"^p(\d+)$")
+
+
+# ===========================================================================
+# Metrics
+# ===========================================================================
+
+class RuleStats:
+    """Thread-safe hit/escalation counters for the rule fast path."""
+
+    def __init__(self) -> None:
+        self.hits      = 0
+        self.escalated = 0
+        self._lock     = threading.Lock()
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.escalated += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.escalated
+            return {
+                "hits":      self.hits,
+                "escalated": self.escalated,
+                "hit_rate":  round(self.hits / total, 4) if total else None,
+            }
+
+
+rule_stats = RuleStats()
+
+
+# ===========================================================================
+# Parser
+# ===========================================================================
+
+class RuleParser:
+    """Template parser bound to one config's entity maps."""
+
+    def __init__(self, entities: Dict[str, Dict[str, str]], working_days: Sequence[str] = ()) -> None:
+        # phrase (tokens) -> (kind, id); a phrase shared by different entities is ambiguous (None)
+        self._phrases: Dict[Tuple[str, ...], Optional[Tuple[str, str]]] = {}
+        for kind, mapping in entities.items():
+            for name, entity_id in mapping.items():
+                target = (kind, entity_id)
+                for phrase in {tuple(tokens(name)), tuple(tokens(str(entity_id)))}:
+                    if not phrase:
+                        continue
+                    if self._phrases.get(phrase, target) != target:
+                        self._phrases[phrase] = None
+                    else:
+                        self._phrases[phrase] = target
+        self._max_phrase   = max((len(p) for p in self._phrases), default=0)
+        self.working_days  = [DAY_ALIASES.get(d.lower(), d) for d in working_days] or DAYS[:5]
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                           #
+    # ------------------------------------------------------------------ #
+
+    def parse(self, text: str) -> Optional[Dict[str, Any]]:
+        """Validated NLPResponse dict, or None when the LLM is needed."""
+        result = self._parse(text)
+        rule_stats.record(result is not None)
+        return result
+
+    def _parse(self, text: str) -> Optional[Dict[str, Any]]:
+        clauses = [c for c in _SENTENCE_SPLIT.split(text or "") if c and c.strip(" ,")]
+        if not clauses:
+            return None
+
+        events: List[Dict[str, Any]] = []
+        hard:   Dict[str, Any]       = {}
+        for clause in clauses:
+            parsed = self._parse_clause(clause)
+            if parsed is None:
+                return None
+            kind, value = parsed
+            if kind == "event":
+                events.append(value)
+            else:
+                hard.update(value)
+
+        if events and hard:
+            intent = "mixed"
+        elif events:
+            intent = "add_events"
+        else:
+            intent = "update_constraints"
+        raw: Dict[str, Any] = {"intent": intent, "events": events}
+        if hard:
+            # An empty soft_constraints dict would be coerced into HardConstraints defaults
+            raw["constraints"] = {"hard_constraints": hard}
+        try:
+            return NLPResponse.model_validate(raw).model_dump(exclude_none=True)
+        except Exception:
+            return None
+
+    # ------------------------------------------------------------------ #
+    # Clause handling                                                      #
+    # ------------------------------------------------------------------ #
+
+    def _parse_clause(self, clause: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        flat = normalize(clause)
+        m = _MAX_CLASSES.match(flat)
+        if m:
+            return "constraint", {"max_classes_per_day_per_section": int(m.group(1) or m.group(2))}
+
+        for phrase, token in PHRASES.items():
+            flat = re.sub(rf"\b{phrase}\b", token, flat)
+        words = tokens(flat)
+
+        found, rest = self._take_entities(words)
+        if found is None or len(found) != 1:
+            return None
+        kind, entity_id = found[0]
+
+        days, periods, rest = self._take_schedule(rest)
+        if days is None:
+            return None
+
+        cues = {"faculty": FACULTY_CUES, "rooms": ROOM_CUES, "sections": SECTION_CUES}.get(kind)
+        if cues is None:
+            return None
+        matched_cues = [w for w in rest if w in cues]
+        leftover     = [w for w in rest if w not in cues and w not in FILLER_WORDS]
+        if not matched_cues or leftover:
+            return None
+
+        event: Dict[str, Any]
+        if kind == "faculty":
+            if not days:
+                return None
+            event = {"type": "faculty_absence", "faculty_id": entity_id,
+                     "start_day": days[0], "end_day": days[-1]}
+        elif kind == "rooms":
+            event = {"type": "resource_unavailable", "room_id": entity_id}
+            if days:
+                event.update(start_day=days[0], end_day=days[-1])
+        else:
+            if not days:
+                return None
+            event = {"type": "section_unavailable", "section_id": entity_id,
+                     "start_day": days[0], "end_day": days[-1]}
+        if periods:
+            event["timeslots"] = periods
+        return "event", event
+
+    def _take_entities(self, words: List[str]) -> Tuple[Optional[List[Tuple[str, str]]], List[str]]:
+        """Greedy longest-phrase entity matching; returns (entities, remaining words)."""
+        found: List[Tuple[str, str]] = []
+        rest:  List[str]             = []
+        i = 0
+        while i < len(words):
+            for size in range(min(self._max_phrase, len(words) - i), 0, -1):
+                phrase = tuple(words[i:i + size])
+                if phrase in self._phrases:
+                    target = self._phrases[phrase]
+                    if target is None:
+                        return None, words      # ambiguous mention
+                    if target not in found:
+                        found.append(target)
+                    i += size
+                    break
+            else:
+                rest.append(words[i])
+                i += 1
+        return found, rest
+
+    def _take_schedule(self, words: List[str]) -> Tuple[Optional[List[str]], List[int], List[str]]:
+        """Extract a day range and period list; returns (days, periods, remaining words)."""
+        days:     List[str] = []
+        day_at:   List[int] = []              # word index of each day mention
+        periods:  List[int] = []
+        rest:     List[Tuple[int, str]] = []
+        i = 0
+        while i < len(words):
+            w = words[i]
+            if w in DAY_ALIASES:
+                days.append(DAY_ALIASES[w])
+                day_at.append(i)
+            elif w == "week":
+                days.extend([self.working_days[0], self.working_days[-1]])
+                day_at.extend([i, i])
+            elif _PERIOD_TOKEN.match(w):
+                periods.append(int(_PERIOD_TOKEN.match(w).group(1)))
+            elif w in PERIOD_WORDS:
+                nums: List[int] = []
+                j = i + 1
+                while j < len(words) and (words[j].isdigit() or words[j] in ("to", "and")):
+                    if words[j] == "to" and nums and j + 1 < len(words) and words[j + 1].isdigit():
+                        nums.extend(range(nums[-1] + 1, int(words[j + 1]) + 1))
+                        j += 2
+                        continue
+                    if words[j].isdigit():
+                        nums.append(int(words[j]))
+                    j += 1
+                if not nums:
+                    return None, [], words
+                periods.extend(nums)
+                i = j
+                continue
+            else:
+                rest.append((i, w))
+            i += 1
+
+        if len(days) > 2 or any(d not in self.working_days for d in days):
+            return None, [], words
+        consumed: Set[int] = set()
+        if len(days) == 2 and day_at[0] != day_at[1]:
+            # A range needs exactly one joiner between the days, optionally "from" before the first
+            first, second = day_at
+            if second - first != 2 or words[first + 1] not in RANGE_JOINERS:
+                return None, [], words
+            consumed.add(first + 1)
+            if first > 0 and words[first - 1] == "from":
+                consumed.add(first - 1)
+        if len(days) == 2 and self.working_days.index(days[0]) > self.working_days.index(days[1]):
+            return None, [], words
+        # Anything left like "until Wednesday" / "from Tuesday" is open-ended: let the LLM decide
+        remaining = [w for idx, w in rest if idx not in consumed]
+        if any(w in RANGE_WORDS for w in remaining):
+            return None, [], words
+        return days, sorted(set(periods)), remaining
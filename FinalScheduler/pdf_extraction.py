@@ -0,0 +1,281 @@
+"""
+pdf_extraction.py
+=================
+Page-parallel PDF text and table extraction.
+
+The document is split into contiguous page ranges that are processed in a
+process pool and reassembled in page order. Each page is handled in one of
+two modes:
+
+fast (default)
+    PyMuPDF text plus PyMuPDF's table finder. A page is escalated to
+    pdfplumber only when tables were detected but look malformed (ragged
+    rows, single row/column, almost no filled cells).
+accurate
+    pdfplumber ``extract_text`` + ``extract_tables`` on every page (the
+    previous behaviour), with PyMuPDF text as a per-page fallback.
+
+Small documents are processed in-process; the pool only pays off once
+there are enough pages to amortise starting the workers. A spooled upload
+(upload_spool.py) is passed to the workers as a path, so each worker opens
+the file itself instead of receiving a pickled copy of the document.
+
+Each worker is a separate spawned interpreter that imports PyMuPDF and
+pdfplumber, on the order of 50-100 MB resident apiece. The pool is
+therefore small by default, and it is shut down once it has been idle for
+``PDF_POOL_IDLE_SECONDS``, so the workers only hold memory while uploads are
+being parsed. Raise ``PDF_WORKERS`` only where the container has the memory
+for it.
+
+Configuration (environment)
+---------------------------
+PDF_EXTRACT_MODE         "fast" or "accurate"                  (default fast)
+PDF_WORKERS              process pool size                      (default min(2, CPUs))
+PDF_PARALLEL_MIN_PAGES   pages before the pool is used          (default 6)
+PDF_POOL_IDLE_SECONDS    idle time before the pool is shut down (default 60; 0 = keep)
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, List, Optional, Tuple
+
+from lazy_imports import lazy_module
+from upload_spool import FileSource, readable
+
+fitz       = lazy_module("fitz")          # PyMuPDF
+pdfplumber = lazy_module("pdfplumber")
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+MODE_FAST     = "fast"
+MODE_ACCURATE = "accurate"
+
+PDF_EXTRACT_MODE       = os.getenv("PDF_EXTRACT_MODE", MODE_FAST).lower().strip()
+PDF_WORKERS            = int(os.getenv("PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "6"))
+PDF_POOL_IDLE_SECONDS  = float(os.getenv("PDF_POOL_IDLE_SECONDS", "60"))
+
+# A detected table with more empty cells than this is treated as malformed
+MAX_EMPTY_CELL_RATIO = 0.85
+
+
+def table_to_markdown(table: List[List[Any]]) -> str:
+    """Convert a table (list of rows) to a markdown table."""
+    if not table:
+        return ""
+    rows      = [[str(c).strip() if c else "" for c in row] for row in table]
+    header    = "| " + " | ".join(rows[0])   + " |"
+    separator = "| " + " | ".join("---" for _ in rows[0]) + " |"
+    body      = "\n".join("| " + " | ".join(r) + " |" for r in rows[1:])
+    return "\n".join(filter(None, [header, separator, body]))
+
+
+def table_is_wellformed(rows: List[List[Any]]) -> bool:
+    if not rows or len(rows) < 2:
+        return False
+    widths = {len(r) for r in rows}
+    if len(widths) != 1 or min(widths) < 2:
+        return False
+    cells = [c for r in rows for c in r]
+    empty = sum(1 for c in cells if c is None or not str(c).strip())
+    return empty / len(cells) <= MAX_EMPTY_CELL_RATIO
+
+
+def _render_page(page_num: int, text: str, tables: List[List[List[Any]]]) -> str:
+    parts: List[str] = []
+    if text:
+        parts.append(f"\n=== PAGE {page_num} ===\n{text}")
+    rendered = [md for md in (table_to_markdown(t) for t in tables) if md]
+    if rendered:
+        parts.append(f"\n=== TABLES PAGE {page_num} ===")
+        for t_idx, md in enumerate(rendered, 1):
+            parts.append(f"\nTable {t_idx}:\n{md}")
+    return "\n".join(parts)
+
+
+# ===========================================================================
+# Per-range workers (run in the process pool)
+# ===========================================================================
+
+def open_fitz(source: FileSource) -> Any:
+    """PyMuPDF document from a path or from raw bytes."""
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+class _PlumberPages:
+    """Opens the document with pdfplumber only if a page actually needs it."""
+
+    def __init__(self, source: FileSource) -> None:
+        self._source = source
+        self._pdf    = None
+
+    def page(self, index: int) -> Any:
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(readable(self._source))
+        return self._pdf.pages[index]
+
+    def close(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+
+
+def _plumber_page(plumber: _PlumberPages, index: int) -> Tuple[str, List[List[List[Any]]]]:
+    page = plumber.page(index)
+    return page.extract_text() or "", page.extract_tables() or []
+
+
+def _fast_page(doc: Any, plumber: _PlumberPages, index: int) -> Tuple[str, List[List[List[Any]]]]:
+    page = doc[index]
+    text = page.get_text() or ""
+    try:
+        found = page.find_tables()
+    except AttributeError:          # PyMuPDF < 1.23 has no table finder
+        return _plumber_page(plumber, index)
+    tables = [t.extract() for t in found.tables]
+    if tables and not all(table_is_wellformed(t) for t in tables):
+        logger.debug("Page %d: malformed tables, escalating to pdfplumber", index + 1)
+        return _plumber_page(plumber, index)
+    return text, tables
+
+
+def extract_page_range(source: FileSource, start: int, end: int, mode: str = PDF_EXTRACT_MODE) -> List[str]:
+    """Render pages [start, end) in order. Module-level so the pool can pickle it."""
+    doc     = open_fitz(source)
+    plumber = _PlumberPages(source)
+    out: List[str] = []
+    try:
+        for index in range(start, end):
+            if mode == MODE_ACCURATE:
+                try:
+                    text, tables = _plumber_page(plumber, index)
+                except Exception as exc:
+                    logger.warning("pdfplumber failed on page %d (%s); using PyMuPDF", index + 1, exc)
+                    text, tables = doc[index].get_text() or "", []
+            else:
+                text, tables = _fast_page(doc, plumber, index)
+            out.append(_render_page(index + 1, text, tables))
+    finally:
+        plumber.close()
+        doc.close()
+    return out
+
+
+# ===========================================================================
+# Pool
+# ===========================================================================
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock  = threading.Lock()
+_pool_users = 0                                   # extractions currently using the pool
+_idle_timer: Optional[threading.Timer] = None
+
+
+def _acquire_pool() -> ProcessPoolExecutor:
+    """The shared pool, started on demand; pair with _release_pool()."""
+    global _pool, _pool_users
+    with _pool_lock:
+        _cancel_idle_timer()
+        if _pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        _pool_users += 1
+        return _pool
+
+
+def _release_pool() -> None:
+    """Start the idle countdown once the last extraction is done with the pool."""
+    global _pool_users, _idle_timer
+    with _pool_lock:
+        _pool_users = max(0, _pool_users - 1)
+        if _pool_users or _pool is None or PDF_POOL_IDLE_SECONDS <= 0:
+            return
+        _idle_timer = threading.Timer(PDF_POOL_IDLE_SECONDS, _shutdown_if_idle)
+        _idle_timer.daemon = True
+        _idle_timer.start()
+
+
+def _cancel_idle_timer() -> None:
+    global _idle_timer
+    if _idle_timer is not None:
+        _idle_timer.cancel()
+        _idle_timer = None
+
+
+def _shutdown_if_idle() -> None:
+    global _pool, _idle_timer
+    # Check and detach in one critical section: an _acquire_pool() after this gets a new pool
+    with _pool_lock:
+        if _pool_users or _pool is None:
+            return
+        pool, _pool = _pool, None
+        _idle_timer = None
+    logger.info("PDF process pool idle for %.0fs; shutting it down", PDF_POOL_IDLE_SECONDS)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        _cancel_idle_timer()
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def page_ranges(n_pages: int, workers: int) -> List[Tuple[int, int]]:
+    size = max(1, math.ceil(n_pages / max(1, workers)))
+    return [(s, min(s + size, n_pages)) for s in range(0, n_pages, size)]
+
+
+def extract_pdf_text(
+    source:  FileSource,
+    mode:    str = PDF_EXTRACT_MODE,
+    workers: int = PDF_WORKERS,
+) -> str:
+    """Extract all pages (text + markdown tables), in parallel for larger documents."""
+    doc = open_fitz(source)
+    n_pages = len(doc)
+    doc.close()
+
+    if workers <= 1 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        pages = extract_page_range(source, 0, n_pages, mode)
+    else:
+        ranges = page_ranges(n_pages, workers)
+        pages = None
+        for attempt in (1, 2):
+            pool = _acquire_pool()
+            try:
+                futures = [pool.submit(extract_page_range, source, s, e, mode) for s, e in ranges]
+                pages   = [p for f in futures for p in f.result()]
+                break
+            except CancelledError:
+                # The pool was shut down under this extraction (e.g. by another caller's recovery)
+                logger.warning("PDF process pool shut down mid-extraction (attempt %d)", attempt)
+            except BrokenProcessPool as exc:
+                logger.warning("PDF process pool broken (%s); extracting in-process", exc)
+                shutdown_pdf_pool()
+                break
+            finally:
+                _release_pool()
+        if pages is None:
+            pages = extract_page_range(source, 0, n_pages, mode)
+        logger.info("PDF: %d pages extracted across %d ranges (mode=%s)", n_pages, len(ranges), mode)
+
+    return "\n".join(p for p in pages if p).strip()
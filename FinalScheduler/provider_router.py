@@ -0,0 +1,216 @@
+"""
+provider_router.py
+==================
+Per-call provider failover (and optional hedging) for document extraction.
+
+The extraction pipeline makes one LLM call for Stage-1 and one per chunk
+for Stage-2. ``ProviderRouter.call`` is passed in as the pipeline's call
+function, so the text is extracted once and every call falls over on its
+own: a Stage-2 call that fails on Cerebras is retried on Groq, then
+Gemini, while chunks that already succeeded are kept. Providers whose
+circuit breaker is open are skipped without a request.
+
+While another provider is left to fall back to, a call fails fast: one
+attempt, no backoff, and at most ``LLM_FAILOVER_ADMIT_SECONDS`` waiting for
+a rate-limiter slot. Every 429 is therefore reported to the provider's
+breaker as it happens. Only the last provider in line gets the
+transport's full retries and waits out Retry-After.
+
+Hedging (opt-in): when a call has been running longer than the chosen
+percentile of that provider's recent latencies, a duplicate goes to the
+next provider. The first successful answer wins and the other call is
+cancelled, which releases its rate-limiter slot and pooled connection.
+
+Configuration (environment)
+---------------------------
+LLM_HEDGE_ENABLED            "1" enables hedged requests                (default 0)
+LLM_HEDGE_PERCENTILE         latency percentile that triggers a hedge   (default 95)
+LLM_HEDGE_MIN_SAMPLES        latencies needed before hedging            (default 5)
+LLM_FAILOVER_ADMIT_SECONDS   rate-limiter wait before failing over      (default 2)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from circuit_breaker import NO_TRIAL
+from llm_providers import provider_registry
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+HEDGE_ENABLED          = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE       = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES      = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "5"))
+FAILOVER_ADMIT_SECONDS = float(os.getenv("LLM_FAILOVER_ADMIT_SECONDS", "2"))
+LATENCY_WINDOW         = 100
+
+
+class AllProvidersFailed(RuntimeError):
+    """Raised when a call failed on every provider."""
+
+
+# ===========================================================================
+# Latency tracking
+# ===========================================================================
+
+class LatencyTracker:
+    """Rolling per-provider call latencies, shared by every request in the process."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: Dict[str, Deque[float]] = {}
+        self._window  = window
+        self._lock    = threading.Lock()
+
+    def record(self, provider: str, latency: float) -> None:
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self._window)).append(latency)
+
+    def percentile(self, provider: str, pct: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+
+latency_tracker = LatencyTracker()
+
+
+# ===========================================================================
+# Router
+# ===========================================================================
+
+class ProviderRouter:
+    """Routes single LLM calls over an ordered list of (name, extractor) providers."""
+
+    def __init__(
+        self,
+        providers:  List[Tuple[str, Any]],
+        hedge:      bool  = HEDGE_ENABLED,
+        percentile: float = HEDGE_PERCENTILE,
+    ) -> None:
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers  = list(providers)
+        self.hedge      = hedge and len(self.providers) > 1
+        self.percentile = percentile
+        self.served:  Counter = Counter()   # successful calls per provider
+        self.failed:  Counter = Counter()
+        self.hedged   = 0
+
+    @property
+    def primary(self) -> str:
+        return self.providers[0][0]
+
+    def backend_label(self) -> str:
+        """Providers that served calls, busiest first (e.g. "Cerebras+Groq")."""
+        return "+".join(name for name, _ in self.served.most_common()) or self.primary
+
+    def model_label(self) -> str:
+        models = {name: getattr(ex, "model", name) for name, ex in self.providers}
+        return "+".join(models[name] for name, _ in self.served.most_common()) or models[self.primary]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"served": dict(self.served), "failed": dict(self.failed), "hedged": self.hedged}
+
+    async def _attempt(
+        self, name: str, extractor: Any, prompt: str, fail_fast: bool,
+    ) -> Tuple[str, float, Optional[str]]:
+        if fail_fast:
+            # Another provider is left: one attempt, bounded admission wait
+            text, latency, finish_reason = await extractor._call_llm_async(
+                prompt, retries=1, admit_timeout=FAILOVER_ADMIT_SECONDS)
+        else:
+            text, latency, finish_reason = await extractor._call_llm_async(prompt)
+        latency_tracker.record(name, latency)
+        return text, latency, finish_reason
+
+    @staticmethod
+    def _next_allowed(queue: List[Tuple[str, Any]]) -> Optional[Tuple[str, Any, int]]:
+        """Pop the next provider whose breaker admits a call, with its breaker ticket; open ones are skipped."""
+        while queue:
+            name, extractor = queue.pop(0)
+            ticket = provider_registry.allow(name)
+            if ticket is not None:
+                return name, extractor, ticket
+            logger.info("Skipping %s: circuit open", name)
+        return None
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        return latency_tracker.percentile(name, self.percentile)
+
+    async def call(self, prompt: str) -> Tuple[str, float, Optional[str]]:
+        """
+        Same contract as ``TimetableExtractor._call_llm_async``: returns
+        (response_text, latency, finish_reason). Providers are tried in order; with hedging
+        on, the next provider also starts once the current one is slow.
+        """
+        queue   = list(self.providers)
+        pending: Dict[asyncio.Task, Tuple[str, int]] = {}
+        errors:  List[str]               = []
+        hedged  = False
+        started = False
+        try:
+            while True:
+                if not pending:
+                    nxt = self._next_allowed(queue)
+                    if nxt is None and not started:
+                        # Every breaker is open: trying beats failing outright
+                        logger.warning("All provider breakers open; trying %s anyway", self.primary)
+                        nxt = (*self.providers[0], NO_TRIAL)
+                    if nxt is None:
+                        break
+                    name, extractor, ticket = nxt
+                    task = asyncio.ensure_future(self._attempt(name, extractor, prompt, bool(queue)))
+                    pending[task] = (name, ticket)
+                    started = True
+
+                delay = None
+                if self.hedge and not hedged and queue:
+                    delay = self._hedge_delay(next(iter(pending.values()))[0])
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    nxt = self._next_allowed(queue)
+                    if nxt is None:
+                        hedged = True    # nothing left to hedge to; just wait
+                        continue
+                    name, extractor, ticket = nxt
+                    logger.info("Hedging slow call (> %.2fs) to %s", delay, name)
+                    task = asyncio.ensure_future(self._attempt(name, extractor, prompt, bool(queue)))
+                    pending[task] = (name, ticket)
+                    hedged = True
+                    self.hedged += 1
+                    continue
+
+                for task in done:
+                    name, ticket = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        logger.warning("%s call failed: %s", name, exc)
+                        self.failed[name] += 1
+                        cause = exc.__cause__
+                        provider_registry.record_failure(name, exc, getattr(cause, "status", None),
+                                                         retry_after=getattr(cause, "retry_after", None),
+                                                         ticket=ticket)
+                        errors.append(f"{name}: {exc}")
+                        continue
+                    self.served[name] += 1
+                    provider_registry.record_success(name, result[1], ticket=ticket)
+                    return result
+        finally:
+            for task in pending:
+                task.cancel()
+        raise AllProvidersFailed("; ".join(errors) or "no providers")
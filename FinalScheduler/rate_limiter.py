@@ -0,0 +1,292 @@
+"""
+rate_limiter.py
+===============
+Process-wide, per-provider admission control for LLM calls.
+
+Every call made through ``llm_transport`` takes a slot from its provider's
+limiter first. A limiter combines two controls:
+
+- an AIMD concurrency limit: in-flight calls may grow by roughly one per
+  window of successful calls, and the limit is halved on every 429;
+- a token bucket on the request rate, refilled at the provider's
+  requests-per-minute budget. The budget is also halved on 429 and recovers
+  additively back to the configured ceiling.
+
+Server signals take priority over both. ``Retry-After`` on a 429, or an
+``x-ratelimit-remaining-*`` header that reaches zero, blocks the provider
+until the matching reset time.
+
+State is held under a ``threading.Lock`` and waiters poll, so the same
+limiter works for every event loop and for the sync path (NLP worker
+threads). Concurrent uploads therefore share one budget per provider.
+
+A caller that can go elsewhere (the provider router, while another
+provider is left) passes a ``timeout`` to ``slot``. A provider that cannot
+admit the call in time raises ``ProviderBusy`` instead of waiting out a
+Retry-After block of up to two minutes.
+
+Configuration (environment)
+---------------------------
+LLM_INITIAL_CONCURRENCY             starting in-flight limit          (default 2)
+LLM_MAX_CONCURRENCY                 in-flight ceiling per provider    (default 8)
+LLM_REQUESTS_PER_MINUTE             rate ceiling for unknown hosts    (default 60)
+LLM_<PROVIDER>_REQUESTS_PER_MINUTE  per-provider ceiling, e.g. LLM_GROQ_REQUESTS_PER_MINUTE
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+INITIAL_CONCURRENCY         = int(os.getenv("LLM_INITIAL_CONCURRENCY", "2"))
+MAX_CONCURRENCY             = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+
+# Free-tier request budgets; override with LLM_<PROVIDER>_REQUESTS_PER_MINUTE
+PROVIDER_REQUESTS_PER_MINUTE = {
+    "cerebras": 30.0,
+    "groq":     30.0,
+    "gemini":   15.0,
+}
+
+DECREASE_FACTOR  = 0.5
+MIN_RATE_PER_MIN = 1.0
+# Longest a wait may sleep before re-checking the limiter state
+POLL_INTERVAL_SECONDS = 0.05
+# Ignore reset hints beyond this; a daily quota is not worth blocking on
+MAX_COOLDOWN_SECONDS  = 120.0
+# A burst of 429s from calls already in flight counts as one congestion event
+DECREASE_HOLDOFF_SECONDS = 1.0
+
+
+
+class ProviderBusy(RuntimeError):
+    """Raised when a provider cannot admit a call within the caller's timeout."""
+
+    def __init__(self, provider: str, retry_after: float) -> None:
+        super().__init__(f"{provider} busy for another {retry_after:.1f}s")
+        self.provider    = provider
+        self.retry_after = retry_after
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS  = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Seconds from ``"12"``, ``"1.5"``, ``"250ms"`` or ``"2m59.56s"`` (None if unparseable)."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        return None
+    return sum(float(n) * _UNIT_SECONDS[u] for n, u in parts)
+
+
+def _configured_rpm(provider: str) -> float:
+    env = os.getenv(f"LLM_{provider.upper()}_REQUESTS_PER_MINUTE")
+    if env:
+        return float(env)
+    return PROVIDER_REQUESTS_PER_MINUTE.get(provider, DEFAULT_REQUESTS_PER_MINUTE)
+
+
+# ===========================================================================
+# Per-provider limiter
+# ===========================================================================
+
+class ProviderLimiter:
+    """AIMD concurrency limit plus an adaptive token bucket for one provider."""
+
+    def __init__(
+        self,
+        provider:            str,
+        requests_per_minute: Optional[float] = None,
+        initial_concurrency: int             = INITIAL_CONCURRENCY,
+        max_concurrency:     int             = MAX_CONCURRENCY,
+    ) -> None:
+        self.provider        = provider
+        self.max_rpm         = requests_per_minute or _configured_rpm(provider)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit           = float(min(max(1, initial_concurrency), self.max_concurrency))
+        self.rpm             = self.max_rpm
+        self.in_flight       = 0
+        self.blocked_until   = 0.0
+        # The bucket holds at most one concurrency window of requests
+        self._tokens         = self.limit
+        self._refilled_at    = time.monotonic()
+        self._decreased_at   = 0.0
+        self._lock           = threading.Lock()
+        self.successes       = 0
+        self.throttled       = 0
+
+    # ------------------------------------------------------------------ #
+    # Admission                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _refill(self, now: float) -> None:
+        capacity = max(1.0, self.limit)
+        self._tokens      = min(capacity, self._tokens + (now - self._refilled_at) * self.rpm / 60.0)
+        self._refilled_at = now
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a slot; returns None on success, otherwise the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return POLL_INTERVAL_SECONDS
+            self._refill(now)
+            if self._tokens < 1.0:
+                return (1.0 - self._tokens) * 60.0 / self.rpm
+            self._tokens   -= 1.0
+            self.in_flight += 1
+            return None
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """Wait for a slot; with ``timeout``, raise ProviderBusy once the wait would run past it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait is None:
+                return
+            if deadline is not None and time.monotonic() + min(wait, POLL_INTERVAL_SECONDS) > deadline:
+                raise ProviderBusy(self.provider, wait)
+            await asyncio.sleep(min(wait, POLL_INTERVAL_SECONDS * 20))
+
+    def acquire_sync(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait is None:
+                return
+            time.sleep(min(wait, POLL_INTERVAL_SECONDS * 20))
+
+    # ------------------------------------------------------------------ #
+    # Feedback                                                             #
+    # ------------------------------------------------------------------ #
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Additive increase: about +1 in-flight slot per window of successes."""
+        with self._lock:
+            self.successes += 1
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(1.0, self.limit))
+            self.rpm   = min(self.max_rpm, self.rpm + self.max_rpm / 20.0)
+        if headers:
+            self._apply_headers(headers)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None,
+                        headers: Optional[Mapping[str, str]] = None) -> None:
+        """Multiplicative decrease, plus a cooldown when the server says how long."""
+        now = time.monotonic()
+        with self._lock:
+            self.throttled += 1
+            if retry_after is not None:
+                self._block_for(min(retry_after, MAX_COOLDOWN_SECONDS))
+            if now - self._decreased_at >= DECREASE_HOLDOFF_SECONDS:
+                self._decreased_at = now
+                self.limit   = max(1.0, self.limit * DECREASE_FACTOR)
+                self.rpm     = max(MIN_RATE_PER_MIN, self.rpm * DECREASE_FACTOR)
+                self._tokens = min(self._tokens, 0.0)
+                logger.warning("LLM %s rate limited: concurrency -> %d, rate -> %.1f/min",
+                               self.provider, int(self.limit), self.rpm)
+        if headers:
+            self._apply_headers(headers)
+
+    def _block_for(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def _apply_headers(self, headers: Mapping[str, str]) -> None:
+        """Honour ``x-ratelimit-remaining-<kind>[-window]`` reaching zero until its reset."""
+        lowered = {k.lower(): v for k, v in headers.items()}
+        for name, value in lowered.items():
+            if not name.startswith("x-ratelimit-remaining-"):
+                continue
+            try:
+                remaining = float(value)
+            except (TypeError, ValueError):
+                continue
+            if remaining > 0:
+                continue
+            reset = parse_duration(lowered.get(name.replace("-remaining-", "-reset-", 1)))
+            if reset is not None and reset <= MAX_COOLDOWN_SECONDS:
+                with self._lock:
+                    self._block_for(reset)
+                logger.info("LLM %s: %s exhausted; pausing %.1fs", self.provider, name, reset)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency_limit":   int(self.limit),
+                "in_flight":           self.in_flight,
+                "requests_per_minute": round(self.rpm, 1),
+                "blocked_for":         round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                "successes":           self.successes,
+                "throttled":           self.throttled,
+            }
+
+
+# ===========================================================================
+# Registry
+# ===========================================================================
+
+class RateLimiter:
+    """One ProviderLimiter per provider, shared by every caller in the process."""
+
+    def __init__(self) -> None:
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_provider(self, provider: str) -> ProviderLimiter:
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None:
+                limiter = self._limiters[provider] = ProviderLimiter(provider)
+            return limiter
+
+    @asynccontextmanager
+    async def slot(self, provider: str, timeout: Optional[float] = None) -> AsyncIterator[ProviderLimiter]:
+        limiter = self.for_provider(provider)
+        await limiter.acquire(timeout)
+        try:
+            yield limiter
+        finally:
+            limiter.release()
+
+    @contextmanager
+    def slot_sync(self, provider: str) -> Iterator[ProviderLimiter]:
+        limiter = self.for_provider(provider)
+        limiter.acquire_sync()
+        try:
+            yield limiter
+        finally:
+            limiter.release()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {l.provider: l.snapshot() for l in limiters}
+
+
+rate_limiter = RateLimiter()
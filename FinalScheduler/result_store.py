@@ -0,0 +1,276 @@
+"""
+result_store.py
+===============
+Bounded, multi-tenant in-process store for generated timetables and parsed
+configurations.
+
+Entries are keyed by (organisation, course, year, semester, job id) so that
+concurrent organisations no longer overwrite each other's results. Every
+entry is size-accounted (serialised JSON bytes), expires after a TTL and is
+evicted least-recently-used first once the configured byte budget is
+exceeded.
+
+Configuration (environment)
+---------------------------
+RESULT_STORE_MAX_BYTES    Total byte budget across all entries  (default 64 MiB)
+RESULT_STORE_TTL_SECONDS  Default time-to-live of an entry      (default 3600)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+DEFAULT_MAX_BYTES   = int(os.getenv("RESULT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = float(os.getenv("RESULT_STORE_TTL_SECONDS", "3600"))
+
+# Namespaces used by app.py
+NS_RESULTS        = "results"
+NS_PARSED_CONFIG  = "parsed_config"
+
+DEFAULT_SCOPE_PART = "_"
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate resident size of a value as its compact JSON byte length."""
+    try:
+        return len(json.dumps(value, default=str, separators=(",", ":")).encode())
+    except (TypeError, ValueError):
+        return len(repr(value).encode())
+
+
+# ===========================================================================
+# Generic bounded cache
+# ===========================================================================
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float]) -> None:
+        self.value      = value
+        self.size       = size
+        self.expires_at = expires_at
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and a total byte budget.
+
+    - ``get`` refreshes recency; expired entries are dropped lazily.
+    - ``put`` evicts least-recently-used entries until the budget fits.
+    - A single value larger than the whole budget is rejected.
+    """
+
+    def __init__(
+        self,
+        max_bytes:   int             = DEFAULT_MAX_BYTES,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: Optional[int]   = None,
+    ) -> None:
+        self.max_bytes   = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes  = 0
+        self._lock   = threading.Lock()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------ #
+    # Internal helpers (caller holds the lock)                             #
+    # ------------------------------------------------------------------ #
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items()
+                   if e.expires_at is not None and e.expires_at <= now]
+        for k in expired:
+            self._drop(k)
+
+    def _evict_to_fit(self, incoming: int) -> None:
+        while self._entries and (
+            self._bytes + incoming > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) >= self.max_entries)
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+            logger.debug("Evicted %s (%d bytes)", key, entry.size)
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                           #
+    # ------------------------------------------------------------------ #
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry.expires_at is not None and entry.expires_at <= now:
+                self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(
+        self,
+        key:   Hashable,
+        value: Any,
+        ttl:   Optional[float] = None,
+        size:  Optional[int]   = None,
+    ) -> bool:
+        """Store a value. Returns False when the value exceeds the whole budget."""
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            logger.warning("Value for %s (%d bytes) exceeds cache budget (%d bytes)",
+                           key, size, self.max_bytes)
+            return False
+        ttl = self.ttl_seconds if ttl is None else ttl
+        now = time.monotonic()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._drop(key)
+            self._purge_expired(now)
+            self._evict_to_fit(size)
+            self._entries[key] = _Entry(value, size, expires_at)
+            self._bytes += size
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            self._drop(key)
+            return entry.value if entry is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the live (key, value) pairs, least recently used first."""
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return [(k, e.value) for k, e in self._entries.items()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return {
+                "entries":     len(self._entries),
+                "bytes":       self._bytes,
+                "max_bytes":   self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits":        self.hits,
+                "misses":      self.misses,
+                "evictions":   self.evictions,
+            }
+
+
+# ===========================================================================
+# Multi-tenant result store
+# ===========================================================================
+
+class ResultScope(NamedTuple):
+    """Tenant scope of a result: one organisation's course/year/semester."""
+    organisation_id: str
+    course:          str
+    year:            str
+    semester:        str
+
+    @classmethod
+    def build(
+        cls,
+        organisation_id: Optional[str] = None,
+        course:          Optional[str] = None,
+        year:            Optional[str] = None,
+        semester:        Optional[str] = None,
+    ) -> "ResultScope":
+        """Normalise the same way db_utils builds its queries (lower + strip)."""
+        def norm(v: Optional[str]) -> str:
+            return (v or "").lower().strip() or DEFAULT_SCOPE_PART
+        return cls(norm(organisation_id), norm(course), norm(year), norm(semester))
+
+
+class ResultStore:
+    """
+    Stores per-job documents under (namespace, scope, job_id) and remembers
+    the latest job id per (namespace, scope) so that read endpoints can be
+    queried without a job id.
+    """
+
+    def __init__(
+        self,
+        max_bytes:   int             = DEFAULT_MAX_BYTES,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self._cache  = BoundedCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        self._latest: Dict[Tuple[str, ResultScope], str] = {}
+        self._lock   = threading.Lock()
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def put(
+        self,
+        namespace: str,
+        scope:     ResultScope,
+        value:     Dict[str, Any],
+        job_id:    Optional[str]   = None,
+        ttl:       Optional[float] = None,
+    ) -> str:
+        """Store a document and mark it as the latest for its scope. Returns the job id."""
+        job_id = job_id or self.new_job_id()
+        if self._cache.put((namespace, scope, job_id), value, ttl=ttl):
+            with self._lock:
+                self._latest[(namespace, scope)] = job_id
+        return job_id
+
+    def get(
+        self,
+        namespace: str,
+        scope:     ResultScope,
+        job_id:    Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Fetch a document by job id, or the latest one for the scope."""
+        if job_id is None:
+            with self._lock:
+                job_id = self._latest.get((namespace, scope))
+            if job_id is None:
+                return None
+        value = self._cache.get((namespace, scope, job_id))
+        if value is None:
+            with self._lock:
+                if self._latest.get((namespace, scope)) == job_id:
+                    self._latest.pop((namespace, scope), None)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
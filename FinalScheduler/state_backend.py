@@ -0,0 +1,256 @@
+"""
+state_backend.py
+================
+Pluggable shared-state backend for parsed configs, results, job state and
+GA progress.
+
+The in-memory backend keeps everything in this process (bounded by the
+ResultStore byte budget). The Redis backend keeps it in Redis so that any
+uvicorn/gunicorn worker, in any container behind the load balancer, can
+serve a job started by another one.
+
+Configuration (environment)
+---------------------------
+STATE_BACKEND  "memory" (default) or "redis"
+REDIS_URL      Redis connection URL          (default redis://localhost:6379/0)
+STATE_PREFIX   Key prefix used in Redis       (default synchron)
+
+For local testing the Redis backend accepts any redis-py compatible client,
+e.g. ``RedisStateBackend(client=fakeredis.FakeRedis())``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from result_store import (
+    DEFAULT_TTL_SECONDS,
+    BoundedCache,
+    ResultScope,
+    ResultStore,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower().strip()
+REDIS_URL     = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_PREFIX  = os.getenv("STATE_PREFIX", "synchron")
+
+NS_PROGRESS = "progress"
+
+# Job lifecycle states
+JOB_QUEUED    = "queued"
+JOB_RUNNING   = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED    = "failed"
+
+
+# ===========================================================================
+# Interface
+# ===========================================================================
+
+class StateBackend:
+    """
+    Shared-state interface used by app.py.
+
+    Scoped documents (results, parsed configs) are addressed by
+    (namespace, ResultScope, job_id); job state and progress by job_id only.
+    """
+
+    name = "base"
+
+    new_job_id = staticmethod(ResultStore.new_job_id)
+
+    def put(
+        self,
+        namespace: str,
+        scope:     ResultScope,
+        value:     Dict[str, Any],
+        job_id:    Optional[str]   = None,
+        ttl:       Optional[float] = None,
+    ) -> str:
+        raise NotImplementedError
+
+    def get(
+        self,
+        namespace: str,
+        scope:     ResultScope,
+        job_id:    Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set_job(self, job_id: str, state: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update_job(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        """Read-modify-write helper; last writer wins (jobs have a single owner)."""
+        state = self.get_job(job_id) or {"job_id": job_id}
+        state.update(fields)
+        self.set_job(job_id, state)
+        return state
+
+    def set_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        self.set_job(f"{NS_PROGRESS}:{job_id}", progress)
+
+    def get_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_job(f"{NS_PROGRESS}:{job_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# ===========================================================================
+# In-memory backend
+# ===========================================================================
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local backend; only correct with a single worker."""
+
+    name = "memory"
+
+    def __init__(self, store: Optional[ResultStore] = None) -> None:
+        self._store = store or ResultStore()
+        self._jobs  = BoundedCache(max_bytes=8 * 1024 * 1024)
+
+    def put(self, namespace, scope, value, job_id=None, ttl=None) -> str:
+        return self._store.put(namespace, scope, value, job_id=job_id, ttl=ttl)
+
+    def get(self, namespace, scope, job_id=None):
+        return self._store.get(namespace, scope, job_id)
+
+    def set_job(self, job_id, state, ttl=None) -> None:
+        self._jobs.put(job_id, dict(state), ttl=ttl)
+
+    def get_job(self, job_id):
+        state = self._jobs.get(job_id)
+        return dict(state) if state is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self._store.stats(), "jobs": len(self._jobs)}
+
+
+# ===========================================================================
+# Redis backend
+# ===========================================================================
+
+class RedisStateBackend(StateBackend):
+    """
+    Redis backend. Every key carries a TTL so Redis' own ``maxmemory``
+    policy together with expiry bounds memory; documents are stored as
+    compact JSON.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        client:      Any             = None,
+        url:         str             = REDIS_URL,
+        prefix:      str             = STATE_PREFIX,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+            client = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=5)
+        self._redis      = client
+        self.prefix      = prefix
+        self.ttl_seconds = ttl_seconds
+
+    # ------------------------------------------------------------------ #
+    # Key helpers                                                          #
+    # ------------------------------------------------------------------ #
+
+    def _scope_key(self, namespace: str, scope: ResultScope) -> str:
+        return ":".join((self.prefix, namespace, *scope))
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _ttl_ms(self, ttl: Optional[float]) -> Optional[int]:
+        ttl = self.ttl_seconds if ttl is None else ttl
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, default=str, separators=(",", ":"))
+
+    @staticmethod
+    def _loads(raw: Any) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return json.loads(raw)
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                           #
+    # ------------------------------------------------------------------ #
+
+    def put(self, namespace, scope, value, job_id=None, ttl=None) -> str:
+        job_id = job_id or self.new_job_id()
+        base   = self._scope_key(namespace, scope)
+        px     = self._ttl_ms(ttl)
+        pipe   = self._redis.pipeline()
+        pipe.set(f"{base}:{job_id}", self._dumps(value), px=px)
+        pipe.set(f"{base}:latest", job_id, px=px)
+        pipe.execute()
+        return job_id
+
+    def get(self, namespace, scope, job_id=None):
+        base = self._scope_key(namespace, scope)
+        if job_id is None:
+            latest = self._redis.get(f"{base}:latest")
+            if latest is None:
+                return None
+            job_id = latest.decode() if isinstance(latest, bytes) else latest
+        return self._loads(self._redis.get(f"{base}:{job_id}"))
+
+    def set_job(self, job_id, state, ttl=None) -> None:
+        self._redis.set(self._job_key(job_id), self._dumps(state), px=self._ttl_ms(ttl))
+
+    def get_job(self, job_id):
+        return self._loads(self._redis.get(self._job_key(job_id)))
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"backend": self.name, "prefix": self.prefix}
+        try:
+            info = self._redis.info("memory")
+            stats["used_memory"] = info.get("used_memory")
+            stats["maxmemory"]   = info.get("maxmemory")
+        except Exception as exc:
+            stats["error"] = str(exc)
+        return stats
+
+
+# ===========================================================================
+# Factory
+# ===========================================================================
+
+def create_state_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    """Build the configured backend; falls back to memory if Redis is unusable."""
+    if kind == "redis":
+        try:
+            backend = RedisStateBackend()
+            backend._redis.ping()
+            logger.info("State backend: redis (%s)", REDIS_URL)
+            return backend
+        except Exception as exc:
+            logger.warning("Redis state backend unavailable (%s); using in-memory state", exc)
+    elif kind != "memory":
+        logger.warning("Unknown STATE_BACKEND '%s'; using in-memory state", kind)
+    logger.info("State backend: memory")
+    return InMemoryStateBackend()
+
+
+state_backend: StateBackend = create_state_backend()
@@ -0,0 +1,289 @@
+"""
+structured_loader.py
+====================
+Deterministic loader for uploads that are already structured, so they can
+skip the LLM entirely:
+
+(a) JSON already in the extractor's ``TimetableData`` schema (including the
+    ``{"success": ..., "data": {...}}`` envelope returned by our own API);
+(b) CSV / Excel files whose sheets all match a registered table template
+    (subjects, faculty, rooms, labs, departments, sections, periods) by
+    their header row.
+
+Anything that does not match exactly returns ``None`` and goes through the
+normal LLM extraction. Table matching is strict on purpose: every
+non-empty header must be a known column, so no column is silently dropped.
+JSON top-level sections outside the schema (e.g. ``special_requirements``)
+cannot be loaded. They are dropped, logged at WARNING and listed in
+``extraction_info.ignored_sections``.
+
+Templates are derived from the pydantic models; extra header spellings are
+declared as aliases. New layouts can be added with ``register_template``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from lazy_imports import lazy_module
+from upload_spool import FileSource, read_source, readable, source_size
+from timetable_extractor import (
+    CSV_EXTENSIONS,
+    EXCEL_EXTENSIONS,
+    Department,
+    ExtractionInfo,
+    Faculty,
+    JSON_EXTENSIONS,
+    Lab,
+    Period,
+    Room,
+    Section,
+    Subject,
+    TimetableData,
+)
+
+pd = lazy_module("pandas")
+
+logger = logging.getLogger(__name__)
+
+# A JSON document must carry at least one of these to count as our schema
+CORE_SECTIONS = {"subjects", "faculty", "rooms", "labs", "departments", "time_slots"}
+
+_LIST_SPLIT = re.compile(r"\s*[,;/]\s*")
+_NON_ALNUM  = re.compile(r"[^a-z0-9]+")
+
+
+# ===========================================================================
+# Templates
+# ===========================================================================
+
+@dataclass(frozen=True)
+class TableTemplate:
+    """A table layout: header row -> rows of ``model``, stored under ``target``."""
+    name:    str
+    model:   Type[BaseModel]
+    target:  str
+    aliases: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def required(self) -> set:
+        return {n for n, f in self.model.model_fields.items() if f.is_required()}
+
+    @property
+    def columns(self) -> set:
+        return set(self.model.model_fields)
+
+    def list_fields(self) -> set:
+        return {n for n, f in self.model.model_fields.items()
+                if getattr(f.annotation, "__origin__", None) in (list, List)}
+
+
+TEMPLATES: Dict[str, TableTemplate] = {}
+
+
+def register_template(template: TableTemplate) -> None:
+    TEMPLATES[template.name] = template
+
+
+for _template in (
+    TableTemplate("subjects", Subject, "subjects", {
+        "subject_code": "subject_id", "code": "subject_id", "subject_name": "name", "subject": "name",
+    }),
+    TableTemplate("faculty", Faculty, "faculty", {
+        "faculty_name": "name", "teacher": "name", "teacher_name": "name",
+        "teacher_id": "faculty_id", "employee_id": "faculty_id", "dept": "department",
+    }),
+    TableTemplate("rooms", Room, "rooms", {
+        "room_name": "name", "room_no": "room_id", "room_number": "room_id", "dept": "department",
+    }),
+    TableTemplate("labs", Lab, "labs", {"lab_name": "name", "lab_code": "lab_id"}),
+    TableTemplate("departments", Department, "departments", {
+        "department_id": "dept_id", "department_name": "name", "dept_name": "name",
+    }),
+    # Sections carry their department id; they are grouped under departments
+    TableTemplate("sections", Section, "sections", {
+        "section_name": "name", "department": "dept_id", "dept": "dept_id", "department_id": "dept_id",
+    }),
+    TableTemplate("periods", Period, "periods", {
+        "period": "id", "period_id": "id", "period_no": "id", "start": "start_time", "end": "end_time",
+    }),
+):
+    register_template(_template)
+
+
+def _norm_header(value: Any) -> str:
+    return _NON_ALNUM.sub("_", str(value).strip().lower()).strip("_")
+
+
+def match_template(headers: List[Any]) -> Optional[Tuple[TableTemplate, List[Optional[str]]]]:
+    """Return (template, field per column) when every non-empty header is a known column."""
+    normalized = [_norm_header(h) if h is not None and str(h).strip() and str(h) != "nan" else ""
+                  for h in headers]
+    best: Optional[Tuple[TableTemplate, List[Optional[str]]]] = None
+    for template in TEMPLATES.values():
+        known = template.columns | ({"dept_id", "dept_name"} if template.target == "sections" else set())
+        mapped: List[Optional[str]] = []
+        for h in normalized:
+            col = template.aliases.get(h, h)
+            mapped.append(col if col in known else None)
+        if any(h and m is None for h, m in zip(normalized, mapped)):
+            continue
+        if not template.required <= set(m for m in mapped if m):
+            continue
+        if best is None or len(template.required) > len(best[0].required):
+            best = (template, mapped)
+    return best
+
+
+# ===========================================================================
+# Table conversion
+# ===========================================================================
+
+def _rows(template: TableTemplate, mapped: List[Optional[str]], df: "pd.DataFrame") -> List[Dict[str, Any]]:
+    list_fields = template.list_fields()
+    records: List[Dict[str, Any]] = []
+    cells = df.fillna("").astype(str).apply(lambda col: col.str.strip())
+    for values in cells.itertuples(index=False, name=None):
+        if not any(values):
+            continue
+        record: Dict[str, Any] = {}
+        for col, value in zip(mapped, values):
+            if not col or value == "":
+                continue
+            if col in list_fields:
+                record[col] = [v for v in _LIST_SPLIT.split(value) if v]
+            elif value.endswith(".0") and value[:-2].isdigit():
+                record[col] = value[:-2]        # spreadsheet integers read back as "3.0"
+            else:
+                record[col] = value
+        records.append(record)
+    return records
+
+
+def _tables_to_data(tables: List[Tuple[TableTemplate, List[Optional[str]], "pd.DataFrame"]]) -> Dict[str, Any]:
+    data:     Dict[str, Any]             = {}
+    sections: List[Dict[str, Any]]       = []
+    for template, mapped, df in tables:
+        rows = _rows(template, mapped, df)
+        if template.target == "sections":
+            sections.extend(rows)
+        elif template.target == "periods":
+            data.setdefault("time_slots", {}).setdefault("periods", []).extend(rows)
+        else:
+            data.setdefault(template.target, []).extend(rows)
+
+    if sections:
+        departments = {d["dept_id"]: d for d in data.setdefault("departments", [])}
+        for row in sections:
+            dept_id   = row.pop("dept_id", "") or "GEN"
+            dept_name = row.pop("dept_name", "") or dept_id
+            dept = departments.get(dept_id)
+            if dept is None:
+                dept = departments[dept_id] = {"dept_id": dept_id, "name": dept_name, "sections": []}
+                data["departments"].append(dept)
+            dept.setdefault("sections", []).append(row)
+    return data
+
+
+def _load_tables(file_content: FileSource, lower: str) -> Optional[Dict[str, Any]]:
+    if lower.endswith(CSV_EXTENSIONS):
+        frames = {"csv": pd.read_csv(readable(file_content), dtype=str)}
+    else:
+        frames = pd.read_excel(readable(file_content), sheet_name=None, dtype=str)
+
+    tables = []
+    for sheet, df in frames.items():
+        if df.shape[1] == 0 or (df.empty and all(str(c).startswith("Unnamed") for c in df.columns)):
+            continue
+        match = match_template(list(df.columns))
+        if match is None:
+            logger.info("Sheet '%s' matches no registered template; using LLM extraction", sheet)
+            return None
+        tables.append((match[0], match[1], df))
+    if not tables:
+        return None
+    logger.info("Structured upload: %s", ", ".join(t[0].name for t in tables))
+    return _tables_to_data(tables)
+
+
+# ===========================================================================
+# JSON
+# ===========================================================================
+
+def _load_json(file_content: FileSource) -> Optional[Dict[str, Any]]:
+    try:
+        doc = json.loads(read_source(file_content))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    # Accept our own API envelope ({"success": true, "data": {...}})
+    if isinstance(doc, dict) and isinstance(doc.get("data"), dict) and "success" in doc:
+        doc = doc["data"]
+    if not isinstance(doc, dict):
+        return None
+    if not CORE_SECTIONS & doc.keys():
+        return None
+    return doc
+
+
+# ===========================================================================
+# Public API
+# ===========================================================================
+
+def load_structured(
+    file_content: FileSource,
+    filename:     str,
+    college_name: Optional[str] = None,
+    session:      Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Validated TimetableData dict for structured uploads, or None when the
+    file needs LLM extraction. ``file_content`` is the raw bytes or the path
+    of a spooled upload.
+    """
+    lower = filename.lower()
+    try:
+        if lower.endswith(JSON_EXTENSIONS):
+            raw, method = _load_json(file_content), "structured_json"
+        elif lower.endswith(CSV_EXTENSIONS + EXCEL_EXTENSIONS):
+            raw, method = _load_tables(file_content, lower), "structured_template"
+        else:
+            return None
+    except Exception as exc:
+        logger.info("Structured detection failed for '%s' (%s); using LLM extraction", filename, exc)
+        return None
+    if raw is None:
+        return None
+
+    raw.pop("extraction_info", None)
+    # Extra top-level sections (e.g. special_requirements) are not part of the schema
+    ignored = sorted(raw.keys() - set(TimetableData.model_fields))
+    if ignored:
+        logger.warning("Structured upload '%s': ignoring sections outside the schema: %s", filename, ignored)
+        raw = {k: v for k, v in raw.items() if k not in ignored}
+    try:
+        timetable = TimetableData.model_validate(raw)
+    except ValidationError as exc:
+        logger.info("Structured upload '%s' failed validation; using LLM extraction: %s", filename, exc)
+        return None
+
+    if college_name:
+        timetable.college_info.name = college_name
+    if session:
+        timetable.college_info.session = session
+    timetable.extraction_info = ExtractionInfo(
+        extracted_at = datetime.now().isoformat(),
+        source_file  = filename,
+        text_length  = source_size(file_content),
+        model        = "none",
+        method       = method,
+        chunks_used  = 0,
+        ignored_sections = ignored,
+    )
+    return timetable.model_dump()
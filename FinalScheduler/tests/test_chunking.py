@@ -0,0 +1,42 @@
+from chunking import LayoutChunker, estimate_tokens, normalize_chunk
+
+BUDGET = 5_000
+
+
+def page(n, tag, rows=45):
+    # Content depends on the tag only, so a page keeps its text when renumbered
+    seed  = sum(map(ord, tag))
+    lines = [f"=== PAGE {n} ==="]
+    lines += [f"{tag} row {j}: Monday 9:00 Room {(seed * 37 + j) % 900} SUB{(j * 7) % 97} Dr. {tag}{j % 5}"
+              for j in range(rows)]
+    return "\n".join(lines)
+
+
+def document(tags):
+    return "\n".join(page(n, tag) for n, tag in enumerate(tags, 1))
+
+
+def keys(chunks):
+    return {normalize_chunk(c) for c in chunks}
+
+
+def test_chunks_respect_budget_and_keep_pages_whole():
+    text    = document([f"p{i}" for i in range(30)])
+    chunks  = LayoutChunker(BUDGET, 150, content_defined=True).chunk(text)
+    assert all(estimate_tokens(c) <= BUDGET for c in chunks)
+    assert sum(c.count("=== PAGE ") for c in chunks) == 30
+    assert "\n".join(chunks).count(" row ") == text.count(" row ")
+
+
+def test_inserted_page_keeps_later_chunks_stable():
+    tags     = [f"p{i}" for i in range(30)]
+    revised  = tags[:2] + ["inserted"] + tags[2:]
+    chunker  = LayoutChunker(BUDGET, 150, content_defined=True)
+    before   = keys(chunker.chunk(document(tags)))
+    after    = chunker.chunk(document(revised))
+    reused   = sum(normalize_chunk(c) in before for c in after)
+    assert reused >= len(after) - 3
+
+    greedy_before = keys(LayoutChunker(BUDGET, 150).chunk(document(tags)))
+    greedy_after  = LayoutChunker(BUDGET, 150).chunk(document(revised))
+    assert reused > sum(normalize_chunk(c) in greedy_before for c in greedy_after)
@@ -0,0 +1,55 @@
+import circuit_breaker
+from circuit_breaker import NO_TRIAL, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+
+
+def tripped():
+    breaker = CircuitBreaker("test")
+    for _ in range(circuit_breaker.CONSECUTIVE_429):
+        breaker.record_failure(http_status=429)
+    assert breaker.state == STATE_OPEN
+    return breaker
+
+
+def test_late_success_does_not_close_open_breaker():
+    breaker = tripped()
+    breaker.record_success(0.5)
+    assert breaker.state == STATE_OPEN
+    assert breaker.allow() is None
+
+
+def test_closed_breaker_admits_without_trial():
+    assert CircuitBreaker("test").allow() == NO_TRIAL
+
+
+def test_trial_success_closes_half_open_breaker():
+    breaker = tripped()
+    breaker.open_until = 0.0                    # cooldown elapsed
+    ticket = breaker.allow()
+    assert ticket
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow() is None              # one trial at a time
+    breaker.record_success(0.5, ticket)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_late_outcomes_do_not_resolve_half_open():
+    breaker = tripped()
+    breaker.open_until = 0.0
+    ticket = breaker.allow()
+    breaker.record_success(0.5, NO_TRIAL)       # a call admitted before the trip
+    breaker.record_success(0.5)
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.record_failure(http_status=500, ticket=NO_TRIAL)
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.record_success(0.5, ticket)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_trial_failure_reopens_with_longer_cooldown():
+    breaker  = tripped()
+    cooldown = breaker.cooldown
+    breaker.open_until = 0.0
+    ticket = breaker.allow()
+    breaker.record_failure(http_status=500, ticket=ticket)
+    assert breaker.state == STATE_OPEN
+    assert breaker.cooldown == 2 * cooldown
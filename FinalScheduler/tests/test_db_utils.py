@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+db_utils  = pytest.importorskip("db_utils")
+
+from result_store import BoundedCache
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    coll = mongomock.MongoClient().db.organisationdatas
+    monkeypatch.setattr(db_utils, "config_cache", BoundedCache(max_bytes=1 << 20, ttl_seconds=None, max_entries=2))
+    db_utils.set_config_collections(coll)
+    yield coll
+    db_utils.set_config_collections(None)
+
+
+def insert_config(coll, semester, **fields):
+    doc = {"course": "btech", "year": "2nd", "semester": semester, "updatedAt": 1, "__v": 0, **fields}
+    return coll.insert_one(doc).inserted_id
+
+
+def test_evicted_configs_are_not_remembered(collection):
+    for semester in ("1st", "2nd", "3rd"):
+        insert_config(collection, semester)
+        assert db_utils.get_config_entry("BTech", "2nd", semester) is not None
+    assert len(db_utils.config_cache) == 2
+
+
+def test_change_stream_event_drops_config_by_document_id(collection):
+    doc_id = insert_config(collection, "1st")
+    db_utils.get_config_entry("btech", "2nd", "1st")
+    assert db_utils._invalidate_document(doc_id) == ("", "btech", "2nd", "1st")
+    assert len(db_utils.config_cache) == 0
+    assert db_utils._invalidate_document(doc_id) is None
+
+
+class CountingCollection:
+    """Records the projection of every find_one on a mongomock collection."""
+
+    def __init__(self, coll):
+        self.coll        = coll
+        self.projections = []
+
+    def find_one(self, query, projection=None):
+        self.projections.append(projection)
+        return self.coll.find_one(query, projection=projection)
+
+
+@pytest.fixture
+def counted(collection):
+    spy = CountingCollection(collection)
+    db_utils.set_config_collections(spy)
+    return spy
+
+
+def test_read_through_cache_serves_fresh_hits_without_queries(counted):
+    insert_config(counted.coll, "1st")
+    first = db_utils.get_config_entry("btech", "2nd", "1st")
+    again = db_utils.get_config_entry("BTech ", "2nd", "1st")
+    assert again is first
+    assert counted.projections == [db_utils.CONFIG_PROJECTION]
+
+
+def test_projection_keeps_only_scheduler_fields(counted):
+    insert_config(counted.coll, "1st", faculty=[{"name": "A"}], audit_log=["x"] * 100)
+    config = db_utils.get_config_by_params("btech", "2nd", "1st")
+    assert config["faculty"] == [{"name": "A"}]
+    assert "audit_log" not in config
+    assert not {"_id", "updatedAt", "__v"} & set(config)
+
+
+def test_stale_entry_is_revalidated_by_version_only(counted, monkeypatch):
+    monkeypatch.setattr(db_utils, "CONFIG_CACHE_REVALIDATE_SECONDS", 0)
+    doc_id = insert_config(counted.coll, "1st", rooms=["R1"])
+    first  = db_utils.get_config_entry("btech", "2nd", "1st")
+
+    assert db_utils.get_config_entry("btech", "2nd", "1st") is first
+    assert counted.projections[-1] == db_utils.VERSION_PROJECTION
+
+    counted.coll.update_one({"_id": doc_id}, {"$set": {"rooms": ["R2"], "updatedAt": 2}})
+    changed = db_utils.get_config_entry("btech", "2nd", "1st")
+    assert changed is not first and changed.config["rooms"] == ["R2"]
+    assert counted.projections[-2:] == [db_utils.VERSION_PROJECTION, db_utils.CONFIG_PROJECTION]
+
+
+def test_async_lookup_shares_the_cache(counted):
+    insert_config(counted.coll, "1st")
+    entry = asyncio.run(db_utils.get_config_entry_async("btech", "2nd", "1st"))
+    assert db_utils.get_config_entry("btech", "2nd", "1st") is entry
+    assert len(counted.projections) == 1
+
+
+def test_missing_config_is_not_cached(counted):
+    assert db_utils.get_config_entry("btech", "2nd", "9th") is None
+    assert len(db_utils.config_cache) == 0
@@ -0,0 +1,30 @@
+from entity_index import EntityIndex
+
+ENTITIES = {
+    "faculty":  {"Dr. Sharma": "FAC001", "Prof. Mehta": "FAC002", "Dr. A Rao": "FAC003", "A Rao": "FAC004"},
+    "rooms":    {"Lab 1": "R1", "Lab-1": "R2", "Room 101": "R101", "Room 102": "R102"},
+    "sections": {"CSE-A": "CSE_A"},
+    "subjects": {"Data Structures": "CS201", "Operating Systems": "CS301"},
+}
+
+
+def test_candidates_keep_matches_and_fill_kinds_without_hits():
+    selected = EntityIndex(ENTITIES).candidates("Dr. Sharma is absent on Monday", top_k=1)
+    assert selected["faculty"]["Dr. Sharma"] == "FAC001"
+    # No subject or section was mentioned: the prompt still gets valid ids
+    assert selected["subjects"] == {"Data Structures": "CS201"}
+    assert selected["sections"] == {"CSE-A": "CSE_A"}
+
+
+def test_canonical_form_folds_case_punctuation_and_mentions():
+    index = EntityIndex(ENTITIES)
+    assert index.canonicalize("Dr. Sharma absent Monday!") == index.canonicalize("sharma  absent monday")
+    assert index.canonicalize("Prof. Mehta absent Monday") == "<fac002> absent monday"
+
+
+def test_colliding_names_keep_both_ids_and_separate_keys():
+    index = EntityIndex(ENTITIES)
+    assert index.collisions[("a", "rao")] == {"FAC003", "FAC004"}
+    assert index.collisions[("lab", "1")] == {"R1", "R2"}
+    assert index.canonicalize("Dr. A Rao absent Monday") != index.canonicalize("A Rao absent Monday")
+    assert index.canonicalize("Block Lab 1 on Friday") != index.canonicalize("Block Lab-1 on Friday")
@@ -0,0 +1,61 @@
+import hashlib
+import os
+import sqlite3
+
+import extraction_cache
+from extraction_cache import ExtractionCache, content_key
+
+
+def test_content_key_matches_running_hash():
+    data = b"%PDF-1.7 timetable"
+    h = hashlib.sha256()
+    h.update(data[:5])
+    h.update(data[5:])
+    assert content_key(h, "model", "v3") == content_key(data, "model", "v3")
+    assert content_key(data, "model", "v3") != content_key(data, "model", "v4")
+
+
+def test_round_trip_uses_wal(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "c.sqlite3"))
+    assert cache.put("k", {"sections": [1, 2]})
+    assert cache.get("k") == {"sections": [1, 2]}
+    assert cache.get("missing") is None
+    mode = cache._connect().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode.lower() == "wal"
+
+
+def test_second_connection_sees_committed_writes(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    writer, reader = ExtractionCache(path), ExtractionCache(path)
+    writer.put("k", [1])
+    assert reader.get("k") == [1]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "TOUCH_INTERVAL_SECONDS", 0)
+    cache = ExtractionCache(str(tmp_path / "c.sqlite3"))
+    value = lambda: os.urandom(1500).hex()    # ~1.5 kB compressed
+    for i in range(3):
+        cache.put(f"k{i}", value())
+    conn = cache._connect()
+    for key, age in (("k0", 100), ("k1", 60), ("k2", 50)):
+        conn.execute("UPDATE extraction_cache SET accessed_at = accessed_at - ? WHERE key = ?", (age, key))
+    cache.get("k0")                            # k0 is now the most recently used
+    cache.max_bytes = cache.stats()["bytes"] + 500
+    cache.put("k3", value())
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None and cache.get("k3") is not None
+
+
+def test_oversized_value_is_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "c.sqlite3"), max_bytes=100)
+    assert not cache.put("k", os.urandom(1000).hex())
+    assert cache.stats()["entries"] == 0
+
+
+def test_corrupt_value_reads_as_miss(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "c.sqlite3"))
+    cache._connect().execute(
+        "INSERT INTO extraction_cache VALUES ('k', ?, 3, 0, 0)", (sqlite3.Binary(b"bad"),))
+    assert cache.get("k") is None
@@ -0,0 +1,16 @@
+import asyncio
+
+import pytest
+
+from llm_transport import LLMTransport, LLMTransportError
+from rate_limiter import rate_limiter
+
+
+def test_blocked_provider_fails_at_once_as_429():
+    rate_limiter.for_provider("blocked-test").on_rate_limited(retry_after=60)
+    transport = LLMTransport()
+    with pytest.raises(LLMTransportError) as info:
+        asyncio.run(transport.chat("http://unused.invalid/v1", {}, {}, provider="blocked-test",
+                                   retries=3, admit_timeout=0.05))
+    assert info.value.status == 429
+    assert info.value.retry_after > 50
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+
+import nlp_processor
+from nlp_processor import TimetableNLPProcessor
+from result_store import BoundedCache
+
+CONFIG = {
+    "faculty":  [{"name": "Dr. Sharma", "faculty_id": "FAC001"}, {"name": "Prof. Mehta", "faculty_id": "FAC002"}],
+    "rooms":    [{"name": f"Room {n}", "room_id": f"R{n}"} for n in range(101, 111)],
+    "sections": [{"name": "CSE-A", "section_id": "CSE_A"}],
+    "subjects": [{"name": "Data Structures", "subject_id": "CS201"}],
+    "time_slots": {"working_days": ["Monday", "Tuesday"], "periods": [1, 2, 3]},
+}
+REPLY = json.dumps({
+    "intent": "update_constraints",
+    "constraints": {"hard_constraints": {"max_classes_per_day_per_section": 5}, "soft_constraints": {}},
+    "events": [],
+})
+
+
+@pytest.fixture(autouse=True)
+def llm_only(monkeypatch):
+    monkeypatch.setattr(nlp_processor, "NLP_LLM_API_KEY", "test-key")
+    monkeypatch.setattr(nlp_processor, "NLP_RULES_ENABLED", False)
+    monkeypatch.setattr(nlp_processor, "nlp_result_cache", BoundedCache(ttl_seconds=None))
+    monkeypatch.setattr(nlp_processor, "_prompt_prefix_cache", BoundedCache(ttl_seconds=None))
+
+
+def processor(config=CONFIG, reply=REPLY):
+    proc = TimetableNLPProcessor(config)
+    proc.prompts = []
+
+    def call(system_prompt, user_text):
+        proc.prompts.append(system_prompt)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    async def call_async(system_prompt, user_text):
+        return call(system_prompt, user_text)
+
+    proc._call_llm, proc._call_llm_async = call, call_async
+    return proc
+
+
+def test_equivalent_requests_share_one_llm_call():
+    proc  = processor()
+    first = proc.parse_request("Max 5 classes a day for Dr. Sharma!")
+    again = asyncio.run(proc.parse_request_async("max 5 classes a day for sharma"))
+    assert again == first and len(proc.prompts) == 1
+    again["intent"] = "mutated"                 # callers get copies
+    assert proc.parse_request("Max 5 classes a day for Dr. Sharma")["intent"] == "update_constraints"
+
+
+def test_cache_is_keyed_by_config():
+    processor().parse_request("Max 5 classes a day")
+    other = processor({**CONFIG, "sections": [{"name": "CSE-B", "section_id": "CSE_B"}]})
+    other.parse_request("Max 5 classes a day")
+    assert len(other.prompts) == 1
+
+
+def test_failures_are_not_cached():
+    failing = processor(reply=RuntimeError("503"))
+    assert failing.parse_request("Max 5 classes a day")["error"] == "Parsing Failed"
+    proc = processor()
+    proc.parse_request("Max 5 classes a day")
+    assert len(proc.prompts) == 1
+
+
+def test_instruction_prefix_is_built_once_per_config(monkeypatch):
+    builds = []
+    original = TimetableNLPProcessor._build_instruction_prefix
+    monkeypatch.setattr(TimetableNLPProcessor, "_build_instruction_prefix",
+                        lambda self: builds.append(1) or original(self))
+    first, second = processor(), processor()
+    first.parse_request("Max 5 classes a day")
+    second.parse_request("Max 6 classes a day")
+    assert len(builds) == 1
+    assert first.prompts[0].startswith(first._instruction_prefix())
+
+
+def test_large_config_prompt_lists_only_relevant_entities(monkeypatch):
+    monkeypatch.setattr(nlp_processor, "NLP_FULL_CONTEXT_MAX_ENTITIES", 5)
+    monkeypatch.setattr(nlp_processor, "NLP_PROMPT_TOP_K", 1)
+    proc = processor()
+    proc.parse_request("Room 105 is under maintenance")
+    prompt = proc.prompts[0]
+    assert '"R105"' in prompt and '"R110"' not in prompt
+    assert '"CS201"' in prompt                  # kinds without a mention still list valid ids
@@ -0,0 +1,76 @@
+import pytest
+
+from nlp_rules import RuleParser
+
+ENTITIES = {
+    "faculty":  {"Dr. Sharma": "FAC001", "Prof. Mehta": "FAC002"},
+    "rooms":    {"Room 101": "R101"},
+    "sections": {"CSE-A": "CSE_A"},
+}
+WORKING_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+@pytest.fixture
+def parser():
+    return RuleParser(ENTITIES, WORKING_DAYS)
+
+
+def only_event(result):
+    assert result is not None
+    assert len(result["events"]) == 1
+    return result["events"][0]
+
+
+@pytest.mark.parametrize("text, start, end", [
+    ("Dr. Sharma is absent Monday to Wednesday", "Monday", "Wednesday"),
+    ("Dr. Sharma is absent from Monday to Wednesday", "Monday", "Wednesday"),
+    ("Dr. Sharma is absent Tuesday through Thursday", "Tuesday", "Thursday"),
+    ("Dr. Sharma is on leave Monday till Friday", "Monday", "Friday"),
+    ("Dr. Sharma is absent on Friday", "Friday", "Friday"),
+    ("Dr. Sharma is absent all week", "Monday", "Friday"),
+])
+def test_faculty_absence_ranges(parser, text, start, end):
+    event = only_event(parser.parse(text))
+    assert event["type"] == "faculty_absence"
+    assert event["faculty_id"] == "FAC001"
+    assert (event["start_day"], event["end_day"]) == (start, end)
+
+
+@pytest.mark.parametrize("text", [
+    "Dr. Sharma is absent Monday and Wednesday",   # a list, not a range
+    "Dr. Sharma is absent Monday Wednesday",
+    "Dr. Sharma is absent until Wednesday",        # open-ended
+    "Dr. Sharma is absent from Tuesday",
+    "Dr. Sharma is absent Wednesday to Monday",    # reversed
+    "Dr. Sharma is absent Saturday",               # not a working day
+    "Dr. Sharma is absent Friday to Saturday",
+])
+def test_ambiguous_schedules_escalate(parser, text):
+    assert parser.parse(text) is None
+
+
+def test_room_and_section_events(parser):
+    room = only_event(parser.parse("Room 101 under maintenance on Friday"))
+    assert room == {"type": "resource_unavailable", "room_id": "R101",
+                    "start_day": "Friday", "end_day": "Friday"}
+    section = only_event(parser.parse("CSE-A is on a field trip Thursday"))
+    assert section["type"] == "section_unavailable"
+    assert section["section_id"] == "CSE_A"
+
+
+def test_periods(parser):
+    event = only_event(parser.parse("Dr. Sharma is absent Monday periods 1 to 3"))
+    assert event["timeslots"] == [1, 2, 3]
+
+
+def test_max_classes_has_no_soft_constraints(parser):
+    result = parser.parse("Max 5 classes a day")
+    assert result["intent"] == "update_constraints"
+    assert set(result["constraints"]) == {"hard_constraints"}
+    assert result["constraints"]["hard_constraints"]["max_classes_per_day_per_section"] == 5
+
+
+def test_unknown_words_and_multiple_entities_escalate(parser):
+    assert parser.parse("Dr. Sharma is absent Monday unless it rains") is None
+    assert parser.parse("Dr. Sharma and Prof. Mehta are absent Monday") is None
+    assert parser.parse("Dr. Sharma is not absent Monday") is None
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import pdf_extraction
+
+
+def test_pool_is_shut_down_after_idle_timeout(monkeypatch):
+    monkeypatch.setattr(pdf_extraction, "PDF_POOL_IDLE_SECONDS", 0.1)
+    try:
+        first = pdf_extraction._acquire_pool()
+        assert pdf_extraction._acquire_pool() is first
+        pdf_extraction._release_pool()
+        time.sleep(0.3)
+        assert pdf_extraction._pool is first        # still in use by the other extraction
+
+        pdf_extraction._release_pool()
+        time.sleep(0.3)
+        assert pdf_extraction._pool is None
+    finally:
+        pdf_extraction.shutdown_pdf_pool()
+
+
+def test_idle_timer_firing_after_reacquire_keeps_pool():
+    try:
+        pool = pdf_extraction._acquire_pool()
+        pdf_extraction._shutdown_if_idle()          # a timer that fired just as the pool was taken
+        assert pdf_extraction._pool is pool
+        assert pdf_extraction._pool_users == 1
+    finally:
+        pdf_extraction._release_pool()
+        pdf_extraction.shutdown_pdf_pool()
+
+
+class CancelledPool:
+    """A pool that was shut down with cancel_futures=True right after it was handed out."""
+
+    def submit(self, *args, **kwargs):
+        future = Future()
+        future.cancel()
+        return future
+
+
+def test_cancelled_extraction_retries_on_fresh_pool(monkeypatch):
+    fitz = pytest.importorskip("fitz")
+    doc  = fitz.open()
+    for n in range(8):
+        doc.new_page().insert_text((72, 72), f"Page body {n}")
+    data = doc.tobytes()
+
+    real  = pdf_extraction._acquire_pool
+    pools = iter([CancelledPool()])
+    monkeypatch.setattr(pdf_extraction, "_acquire_pool", lambda: next(pools, None) or real())
+    try:
+        text = pdf_extraction.extract_pdf_text(data, workers=2)
+    finally:
+        pdf_extraction.shutdown_pdf_pool()
+    assert all(f"Page body {n}" in text for n in range(8))
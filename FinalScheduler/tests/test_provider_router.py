@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+import provider_router
+from provider_router import FAILOVER_ADMIT_SECONDS, AllProvidersFailed, ProviderRouter, latency_tracker
+from timetable_extractor import TimetableExtractor
+
+
+class FakeExtractor:
+    """Stands in for TimetableExtractor._call_llm_async."""
+
+    def __init__(self, reply=None, error=None, delay=0.0):
+        self.reply = reply
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    async def _call_llm_async(self, prompt, retries=None, admit_timeout=None):
+        self.calls.append({"retries": retries, "admit_timeout": admit_timeout})
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.reply, self.delay, "stop"
+
+
+def test_fails_fast_while_another_provider_is_left():
+    first  = FakeExtractor(error=RuntimeError("429"))
+    second = FakeExtractor(reply="ok")
+    router = ProviderRouter([("a", first), ("b", second)], hedge=False)
+    assert asyncio.run(router.call("p"))[0] == "ok"
+    assert first.calls  == [{"retries": 1, "admit_timeout": FAILOVER_ADMIT_SECONDS}]
+    assert second.calls == [{"retries": None, "admit_timeout": None}]   # last in line: full retries
+    assert router.stats()["failed"] == {"a": 1}
+
+
+def test_all_providers_failed():
+    router = ProviderRouter([("a", FakeExtractor(error=RuntimeError("down")))], hedge=False)
+    with pytest.raises(AllProvidersFailed):
+        asyncio.run(router.call("p"))
+
+
+class FakeRegistry:
+    """provider_registry stand-in: breakers open for ``refused``, outcomes recorded."""
+
+    def __init__(self, refused=()):
+        self.refused  = set(refused)
+        self.outcomes = []
+
+    def allow(self, name):
+        return None if name in self.refused else 0
+
+    def record_success(self, name, latency, ticket=None):
+        self.outcomes.append((name, "ok"))
+
+    def record_failure(self, name, error, http_status=None, retry_after=None, ticket=None):
+        self.outcomes.append((name, "failed"))
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    fake = FakeRegistry()
+    monkeypatch.setattr(provider_router, "provider_registry", fake)
+    return fake
+
+
+def test_each_chunk_fails_over_on_its_own(registry):
+    async def flaky(prompt, retries=None, admit_timeout=None):
+        if "chunk B" in prompt:
+            raise RuntimeError("503")
+        return json.dumps({"subjects": [{"name": "A"}]} if "chunk A" in prompt else {}), 0.0, "stop"
+
+    async def steady(prompt, retries=None, admit_timeout=None):
+        return json.dumps({"subjects": [{"name": "B"}]}), 0.0, "stop"
+
+    first, second = FakeExtractor(), FakeExtractor()
+    first._call_llm_async, second._call_llm_async = flaky, steady
+    router = ProviderRouter([("a", first), ("b", second)], hedge=False)
+    extractor = TimetableExtractor("test-key", enable_cache=False, test_connection=False)
+    merged, _, _ = asyncio.run(extractor._extract_all_chunks(["chunk A", "chunk B"], None, router.call))
+
+    assert {s["name"] for s in merged["subjects"]} == {"A", "B"}
+    assert router.stats() == {"served": {"a": 2, "b": 1}, "failed": {"a": 1}, "hedged": 0}
+    assert registry.outcomes.count(("a", "failed")) == 1
+
+
+def test_open_breaker_is_skipped_without_a_request(registry):
+    registry.refused.add("a")
+    first, second = FakeExtractor(reply="a"), FakeExtractor(reply="b")
+    router = ProviderRouter([("a", first), ("b", second)], hedge=False)
+    assert asyncio.run(router.call("p"))[0] == "b"
+    assert first.calls == []
+
+
+def test_all_breakers_open_still_tries_the_primary(registry):
+    registry.refused.update({"a", "b"})
+    first = FakeExtractor(reply="a")
+    router = ProviderRouter([("a", first), ("b", FakeExtractor(reply="b"))], hedge=False)
+    assert asyncio.run(router.call("p"))[0] == "a"
+
+
+def test_slow_call_is_hedged_to_the_next_provider(registry):
+    for _ in range(5):
+        latency_tracker.record("hedge-slow", 0.01)
+    slow, fast = FakeExtractor(reply="slow", delay=5), FakeExtractor(reply="fast")
+    router = ProviderRouter([("hedge-slow", slow), ("hedge-fast", fast)], hedge=True, percentile=95)
+
+    async def main():
+        started = asyncio.get_running_loop().time()
+        result  = await router.call("p")
+        return result, asyncio.get_running_loop().time() - started
+
+    (text, _, _), elapsed = asyncio.run(main())
+    assert text == "fast" and elapsed < 1
+    assert router.hedged == 1
+    assert router.stats()["served"] == {"hedge-fast": 1}
+
+
+def test_no_hedge_before_enough_latency_samples(registry):
+    slow, fast = FakeExtractor(reply="slow", delay=0.2), FakeExtractor(reply="fast")
+    router = ProviderRouter([("unsampled", slow), ("other", fast)], hedge=True)
+    assert asyncio.run(router.call("p"))[0] == "slow"
+    assert router.hedged == 0 and fast.calls == []
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import ProviderBusy, ProviderLimiter, parse_duration
+
+
+def test_timed_acquire_raises_while_blocked():
+    limiter = ProviderLimiter("test", requests_per_minute=600)
+    limiter.on_rate_limited(retry_after=60)
+    with pytest.raises(ProviderBusy) as info:
+        asyncio.run(limiter.acquire(timeout=0.1))
+    assert info.value.retry_after > 50
+
+
+def test_concurrency_limit_caps_in_flight_calls():
+    limiter = ProviderLimiter("test", requests_per_minute=6000, initial_concurrency=2)
+    assert limiter.try_acquire() is None
+    assert limiter.try_acquire() is None
+    assert limiter.try_acquire() == rate_limiter.POLL_INTERVAL_SECONDS
+    limiter.release()
+    time.sleep(0.02)                        # bucket refill at 100/s
+    assert limiter.try_acquire() is None
+
+
+def test_additive_increase_is_about_one_slot_per_window():
+    limiter = ProviderLimiter("test", requests_per_minute=600, initial_concurrency=2, max_concurrency=4)
+    for _ in range(2):
+        limiter.on_success()
+    assert int(limiter.limit) == 2
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.limit == 4.0
+
+
+def test_rate_limit_halves_once_per_burst():
+    limiter = ProviderLimiter("test", requests_per_minute=60, initial_concurrency=8, max_concurrency=8)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()              # same burst: no second decrease
+    assert (limiter.limit, limiter.rpm) == (4.0, 30.0)
+    assert limiter.throttled == 2
+    limiter._decreased_at -= rate_limiter.DECREASE_HOLDOFF_SECONDS
+    limiter.on_rate_limited()
+    assert (limiter.limit, limiter.rpm) == (2.0, 15.0)
+
+
+def test_successes_recover_rate_up_to_ceiling():
+    limiter = ProviderLimiter("test", requests_per_minute=60)
+    limiter.on_rate_limited()
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.rpm == 60
+
+
+def test_retry_after_blocks_admission():
+    limiter = ProviderLimiter("test", requests_per_minute=600)
+    limiter.on_rate_limited(retry_after=5)
+    wait = limiter.try_acquire()
+    assert 4 < wait <= 5
+    limiter.blocked_until = 0.0
+    # Once unblocked, only the (halved) token bucket remains: 300/min
+    assert limiter.try_acquire() <= 0.2
+
+
+def test_exhausted_remaining_header_blocks_until_reset():
+    limiter = ProviderLimiter("test", requests_per_minute=600)
+    limiter.on_success({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m30s"})
+    assert 80 < limiter.try_acquire() <= 90
+    limiter.blocked_until = 0.0
+    limiter.on_success({"X-RateLimit-Remaining-Tokens": "5", "X-RateLimit-Reset-Tokens": "10s"})
+    assert limiter.try_acquire() is None
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("12", 12.0), ("1.5", 1.5), ("250ms", 0.25), ("2m59.56s", 179.56), ("soon", None), (None, None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+def test_untimed_acquire_waits_for_a_slot():
+    limiter = ProviderLimiter("test", requests_per_minute=6000, initial_concurrency=1)
+
+    async def main():
+        await limiter.acquire()
+        asyncio.get_running_loop().call_later(0.1, limiter.release)
+        await asyncio.wait_for(limiter.acquire(), timeout=2)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
@@ -0,0 +1,57 @@
+import time
+
+from result_store import NS_RESULTS, BoundedCache, ResultScope, ResultStore
+
+SCOPE_A = ResultScope.build("Org", "B.Tech ", "2nd", "3rd")
+SCOPE_B = ResultScope.build("Org", "M.Tech", "2nd", "3rd")
+
+
+def test_scope_is_normalised():
+    assert SCOPE_A == ResultScope.build(" org", "b.tech", "2ND", "3rd")
+    assert ResultScope.build().organisation_id == "_"
+
+
+def test_lru_eviction_keeps_byte_budget():
+    cache = BoundedCache(max_bytes=100, ttl_seconds=None)
+    cache.put("a", "x", size=40)
+    cache.put("b", "y", size=40)
+    cache.get("a")                      # "b" is now least recently used
+    cache.put("c", "z", size=40)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" and cache.get("c") == "z"
+    assert cache.stats()["bytes"] <= 100
+    assert cache.stats()["evictions"] == 1
+
+
+def test_value_larger_than_budget_is_rejected():
+    cache = BoundedCache(max_bytes=10)
+    assert not cache.put("big", "x", size=11)
+    assert cache.get("big") is None
+
+
+def test_entries_expire():
+    cache = BoundedCache(ttl_seconds=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=60)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_latest_per_scope_and_isolation():
+    store = ResultStore()
+    first = store.put(NS_RESULTS, SCOPE_A, {"n": 1})
+    store.put(NS_RESULTS, SCOPE_A, {"n": 2})
+    store.put(NS_RESULTS, SCOPE_B, {"n": 3})
+    assert store.get(NS_RESULTS, SCOPE_A)["n"] == 2
+    assert store.get(NS_RESULTS, SCOPE_A, first)["n"] == 1
+    assert store.get(NS_RESULTS, SCOPE_B)["n"] == 3
+    assert store.get(NS_RESULTS, SCOPE_B, first) is None
+
+
+def test_latest_pointer_dropped_when_document_expires():
+    store = ResultStore(ttl_seconds=0.05)
+    store.put(NS_RESULTS, SCOPE_A, {"n": 1})
+    time.sleep(0.1)
+    assert store.get(NS_RESULTS, SCOPE_A) is None
+    assert (NS_RESULTS, SCOPE_A) not in store._latest
@@ -0,0 +1,79 @@
+import pytest
+
+import state_backend
+from result_store import NS_PARSED_CONFIG, NS_RESULTS, ResultScope
+from state_backend import InMemoryStateBackend, RedisStateBackend, create_state_backend
+
+SCOPE_A = ResultScope.build("org-a", "B.Tech", "2nd", "3rd")
+SCOPE_B = ResultScope.build("org-b", "B.Tech", "2nd", "3rd")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "memory":
+        return InMemoryStateBackend()
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisStateBackend(client=fakeredis.FakeRedis(), prefix="test", ttl_seconds=60)
+
+
+def test_latest_and_by_job_id(backend):
+    first  = backend.put(NS_RESULTS, SCOPE_A, {"status": "completed", "n": 1})
+    second = backend.put(NS_RESULTS, SCOPE_A, {"status": "completed", "n": 2})
+    assert backend.get(NS_RESULTS, SCOPE_A)["n"] == 2
+    assert backend.get(NS_RESULTS, SCOPE_A, first)["n"] == 1
+    assert backend.get(NS_RESULTS, SCOPE_A, second)["n"] == 2
+
+
+def test_scopes_and_namespaces_are_isolated(backend):
+    job_id = backend.put(NS_RESULTS, SCOPE_A, {"n": 1})
+    assert backend.get(NS_RESULTS, SCOPE_B) is None
+    assert backend.get(NS_RESULTS, SCOPE_B, job_id) is None
+    assert backend.get(NS_PARSED_CONFIG, SCOPE_A) is None
+
+
+def test_job_state_and_progress(backend):
+    backend.set_job("j1", {"job_id": "j1", "status": "queued"})
+    backend.update_job("j1", status="running")
+    assert backend.get_job("j1") == {"job_id": "j1", "status": "running"}
+    backend.set_progress("j1", {"generation": 3})
+    assert backend.get_progress("j1") == {"generation": 3}
+    assert backend.get_job("missing") is None
+
+
+def test_redis_keys_carry_ttl_and_latest_pointer():
+    fakeredis = pytest.importorskip("fakeredis")
+    client  = fakeredis.FakeRedis()
+    backend = RedisStateBackend(client=client, prefix="test", ttl_seconds=60)
+    job_id  = backend.put(NS_RESULTS, SCOPE_A, {"n": 1})
+    base    = ":".join(("test", NS_RESULTS, *SCOPE_A))
+    assert client.get(f"{base}:latest").decode() == job_id
+    assert 0 < client.pttl(f"{base}:{job_id}") <= 60_000
+    assert 0 < client.pttl(f"{base}:latest") <= 60_000
+    backend.set_job(job_id, {"status": "queued"})
+    assert 0 < client.pttl(f"test:job:{job_id}") <= 60_000
+
+
+def test_shared_redis_is_seen_by_every_worker():
+    fakeredis = pytest.importorskip("fakeredis")
+    server  = fakeredis.FakeServer()
+    worker1 = RedisStateBackend(client=fakeredis.FakeRedis(server=server), prefix="test")
+    worker2 = RedisStateBackend(client=fakeredis.FakeRedis(server=server), prefix="test")
+    job_id  = worker1.put(NS_RESULTS, SCOPE_A, {"n": 1})
+    worker1.set_progress(job_id, {"generation": 7})
+    assert worker2.get(NS_RESULTS, SCOPE_A)["n"] == 1
+    assert worker2.get_progress(job_id) == {"generation": 7}
+
+
+def test_factory_uses_redis_when_reachable(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(state_backend, "RedisStateBackend",
+                        lambda: RedisStateBackend(client=fakeredis.FakeRedis()))
+    assert create_state_backend("redis").name == "redis"
+
+
+def test_factory_falls_back_to_memory(monkeypatch):
+    def unreachable():
+        raise ConnectionError("no redis")
+    monkeypatch.setattr(state_backend, "RedisStateBackend", unreachable)
+    assert create_state_backend("redis").name == "memory"
+    assert create_state_backend("bogus").name == "memory"
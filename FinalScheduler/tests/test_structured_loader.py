@@ -0,0 +1,21 @@
+import json
+from pathlib import Path
+
+from structured_loader import load_structured
+
+SAMPLE = Path(__file__).resolve().parent.parent / "corrected_timetable_config.json"
+
+
+def test_sample_config_with_extra_sections_loads_without_llm():
+    doc = json.loads(SAMPLE.read_text())
+    assert "special_requirements" in doc
+    result = load_structured(SAMPLE.read_bytes(), "corrected_timetable_config.json")
+    assert result is not None
+    assert result["extraction_info"]["method"] == "structured_json"
+    assert "special_requirements" not in result
+    assert result["extraction_info"]["ignored_sections"] == ["special_requirements"]
+    assert len(result["subjects"]) == len(doc["subjects"])
+
+
+def test_json_without_core_sections_needs_llm():
+    assert load_structured(json.dumps({"special_requirements": {}}).encode(), "x.json") is None
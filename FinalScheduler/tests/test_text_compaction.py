@@ -0,0 +1,88 @@
+from text_compaction import compact_text
+
+DAYS     = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+SLOTS    = ["9:00-10:00", "10:00-11:00", "11:15-12:15"]
+SECTIONS = ["A", "B", "C", "D", "E", "F"]
+
+
+def grid_page(n, section):
+    """One page of a PDF grid timetable as pdf_extraction renders it."""
+    subjects = [f"SUB{section}{d}{s}" for d in range(len(DAYS)) for s in range(len(SLOTS))]
+    lines = [f"=== PAGE {n} ===", "ABC Institute of Technology", "Time Table 2025-26", f"Section {section}", "Day"]
+    lines += SLOTS
+    for d, day in enumerate(DAYS):
+        lines.append(day)
+        lines += subjects[d * len(SLOTS):(d + 1) * len(SLOTS)]
+    lines += [f"Faculty: Dr. {section}1 (Maths), Dr. {section}2 (Physics)", f"Page {n} of {len(SECTIONS)}"]
+    lines += [f"=== TABLES PAGE {n} ===", "Table 1:", "| Day | " + " | ".join(SLOTS) + " |",
+              "| --- | " + " | ".join("---" for _ in SLOTS) + " |"]
+    for d, day in enumerate(DAYS):
+        lines.append(f"| {day} | " + " | ".join(subjects[d * len(SLOTS):(d + 1) * len(SLOTS)]) + " |")
+    return lines, subjects
+
+
+def grid_document():
+    lines, subjects = [], []
+    for n, section in enumerate(SECTIONS, 1):
+        page, page_subjects = grid_page(n, section)
+        lines += page
+        subjects += page_subjects
+    return "\n".join(lines), subjects
+
+
+def page_blocks(text):
+    """{marker: body lines} for every block of the compacted text."""
+    blocks, current = {}, None
+    for line in text.splitlines():
+        if line.startswith("=== "):
+            current = blocks.setdefault(line, [])
+        elif current is not None:
+            current.append(line)
+    return blocks
+
+
+def test_grid_timetable_keeps_every_page_body():
+    text, subjects = grid_document()
+    compact, report = compact_text(text)
+    blocks = page_blocks(compact)
+
+    for n, section in enumerate(SECTIONS, 1):
+        body = blocks[f"=== PAGE {n} ==="]
+        assert f"Section {section}" in body
+        for line in DAYS + SLOTS + ["Day"]:
+            assert body.count(line) == 1, (n, line)
+        assert any(l.startswith(f"Faculty: Dr. {section}1") for l in body)
+        # Every grid row survives in the table block too
+        table = blocks[f"=== TABLES PAGE {n} ==="]
+        assert len([r for r in table if r.startswith("|")]) == len(DAYS) + 1
+
+    for subject in subjects:
+        assert compact.count(subject) == 2, subject      # page text + table
+    assert report.tokens_after > report.tokens_before * 0.7
+
+
+def test_headers_and_page_numbers_dropped_from_later_pages():
+    text, _ = grid_document()
+    blocks  = page_blocks(compact_text(text)[0])
+
+    assert "ABC Institute of Technology" in blocks["=== PAGE 1 ==="]
+    for n in range(2, len(SECTIONS) + 1):
+        body = blocks[f"=== PAGE {n} ==="]
+        assert "ABC Institute of Technology" not in body
+        assert "Time Table 2025-26" not in body
+        assert not any(l.startswith("Page ") for l in body)
+
+
+def test_repeats_within_a_page_are_kept():
+    pages = []
+    for n in range(1, 5):
+        pages += [f"=== PAGE {n} ===", "ABC Institute", f"Section {n}", "Lab", "Lab",
+                  "Data Structures Lab", "Data Structures Lab", "Lab", "Library", "Library", "ABC Institute"]
+    blocks = page_blocks(compact_text("\n".join(pages))[0])
+
+    assert blocks["=== PAGE 1 ==="].count("ABC Institute") == 2
+    for n in range(2, 5):
+        body = blocks[f"=== PAGE {n} ==="]
+        assert body.count("Lab") == 3 and body.count("Library") == 2
+        assert body.count("Data Structures Lab") == 2
+        assert "ABC Institute" not in body
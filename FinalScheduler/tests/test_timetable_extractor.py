@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+import time
+
+from timetable_extractor import FINISH_TRUNCATED, TimetableExtractor, stitch_continuation
+
+
+def extractor():
+    return TimetableExtractor("test-key", enable_cache=False, test_connection=False)
+
+
+def stub_llm(replies):
+    # Reply by the chunk tag found in the prompt; Stage-1 has no tag
+    async def call(prompt):
+        for tag, reply in replies.items():
+            if tag in prompt:
+                return reply
+        return json.dumps({"college_info": {"name": "X"}}), 0.0, "stop"
+    return call
+
+
+def run(chunks, replies):
+    return asyncio.run(extractor()._extract_all_chunks(chunks, None, stub_llm(replies)))
+
+
+def test_complete_chunks_are_not_incomplete():
+    ok = (json.dumps({"subjects": [{"name": "Maths"}]}), 0.0, "stop")
+    _, _, incomplete = run(["chunk A", "chunk B"], {"chunk A": ok, "chunk B": ok})
+    assert incomplete == 0
+
+
+def test_empty_and_failed_chunks_are_reported():
+    ok = (json.dumps({"subjects": [{"name": "Maths"}]}), 0.0, "stop")
+    merged, _, incomplete = run(
+        ["chunk A", "chunk B", "chunk C"],
+        {"chunk A": ok, "chunk B": ("{}", 0.0, "stop"), "chunk C": ("not json", 0.0, "stop")},
+    )
+    assert merged["subjects"] == [{"name": "Maths"}]
+    assert incomplete == 2
+
+
+def test_truncated_chunk_is_reported():
+    ok  = (json.dumps({"subjects": [{"name": "Maths"}]}), 0.0, "stop")
+    cut = ('{"subjects": [{"name": "Phys', 0.0, FINISH_TRUNCATED)
+    _, _, incomplete = run(["chunk A", "chunk B"], {"chunk A": ok, "chunk B": cut})
+    assert incomplete >= 1
+
+
+def test_stage2_key_depends_on_structure_context():
+    ex = extractor()
+    chunk = "=== PAGE 1 ===\nMonday 9:00 Maths"
+    assert ex._stage_cache_key("stage2", chunk, '{"a":1}') != ex._stage_cache_key("stage2", chunk, '{"a":2}')
+    assert ex._stage_cache_key("stage2", chunk, '{"a":1}') == ex._stage_cache_key("stage2", chunk, '{"a":1}')
+
+
+class CountingExtractor(TimetableExtractor):
+    """Records the thread text extraction runs on; LLM calls answer from a stub."""
+
+    def __init__(self, **kwargs):
+        super().__init__("test-key", test_connection=False, **kwargs)
+        self.text_threads = []
+        self.llm_calls    = 0
+
+    def _extract_text(self, file_content, filename):
+        self.text_threads.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return super()._extract_text(file_content, filename)
+
+    async def _call_llm_async(self, prompt, retries=None, admit_timeout=None):
+        self.llm_calls += 1
+        return json.dumps({"college_info": {"name": "X"}, "subjects": [{"subject_id": "S1", "name": "Maths"}]}), 0.0, "stop"
+
+
+CSV = b"Day,Time,Subject\nMonday,9:00,Maths\n"
+
+
+def test_async_extraction_keeps_the_loop_responsive():
+    ex = CountingExtractor(enable_cache=False)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        try:
+            result = await ex.extract_timetable_data_async(CSV, "t.csv")
+        finally:
+            task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result["college_info"]["name"] == "X"
+    assert ex.text_threads and ex.text_threads[0].startswith("extract")
+    assert ticks >= 10          # the loop kept running during the 0.2 s parse
+
+
+def test_cache_hit_skips_parsing_and_llm(tmp_path):
+    ex = CountingExtractor(enable_cache=True, cache_path=str(tmp_path / "c.sqlite3"))
+    first  = asyncio.run(ex.extract_timetable_data_async(CSV, "t.csv"))
+    calls  = ex.llm_calls
+    second = asyncio.run(ex.extract_timetable_data_async(CSV, "t.csv"))
+    assert len(ex.text_threads) == 1 and ex.llm_calls == calls
+    assert second["extraction_info"]["cache_hit"] and not first["extraction_info"]["cache_hit"]
+
+
+def test_blocking_wrapper_runs_outside_a_loop():
+    result = CountingExtractor(enable_cache=False).extract_timetable_data(CSV, "t.csv", college_name="Y")
+    assert result["college_info"]["name"] == "Y"
+
+
+def page(n):
+    return f"=== PAGE {n} ===\n" + "\n".join(f"Monday 9:00 Subject{n}-{i} Room {i}" for i in range(15))
+
+
+def test_stitch_drops_fences_and_repeated_tail():
+    partial = '{"subjects": [{"subject_id": "S1", "name": "Mat'
+    assert stitch_continuation(partial, '```json\n"name": "Maths"}]}\n```') == partial + 'hs"}]}'
+    assert stitch_continuation('{"a": [1, 2', ', 3]}') == '{"a": [1, 2, 3]}'
+
+
+def test_truncated_chunk_is_split_and_merged():
+    prompts = []
+
+    async def call(prompt):
+        prompts.append(prompt)
+        if "Subject1-0" in prompt and "Subject2-0" in prompt:
+            return '{"subjects": [{"subject_id": "S1", "na', 0.0, FINISH_TRUNCATED
+        sid = "S1" if "Subject1-0" in prompt else "S2"
+        return json.dumps({"subjects": [{"subject_id": sid}]}), 0.0, "stop"
+
+    data, truncated = asyncio.run(extractor()._extract_chunk_llm(page(1) + "\n" + page(2), "1", "{}", call))
+    assert not truncated
+    assert sorted(s["subject_id"] for s in data["subjects"]) == ["S1", "S2"]
+    assert len(prompts) == 3
+
+
+def test_unsplittable_chunk_is_continued_and_stitched():
+    replies = iter([
+        ('{"subjects": [{"subject_id": "S1", "name": "Mat', 0.0, FINISH_TRUNCATED),
+        ('"name": "Maths"}, {"subject_id": "S2", "name": "Physics"}]}', 0.0, "stop"),
+    ])
+    prompts = []
+
+    async def call(prompt):
+        prompts.append(prompt)
+        return next(replies)
+
+    data, truncated = asyncio.run(extractor()._extract_chunk_llm("Monday 9:00 Maths", "1", "{}", call))
+    assert not truncated
+    assert [s["name"] for s in data["subjects"]] == ["Maths", "Physics"]
+    assert '"name": "Mat' in prompts[1]     # the continuation shows where the reply stopped
+
+
+def test_reply_still_truncated_after_continuations_is_flagged():
+    async def call(prompt):
+        return '{"subjects": [{"subject_id": "S1"', 0.0, FINISH_TRUNCATED
+
+    _, truncated = asyncio.run(extractor()._extract_chunk_llm("Monday 9:00 Maths", "1", "{}", call))
+    assert truncated
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+import pytest
+
+from upload_spool import UploadLimitMiddleware, UploadTooLarge, spool_upload
+
+
+class FakeUpload:
+    """The parts of Starlette's UploadFile that spool_upload uses."""
+
+    def __init__(self, data, filename="t.pdf", memory=1024):
+        self.filename = filename
+        self.size     = len(data)
+        self.file     = tempfile.SpooledTemporaryFile(max_size=memory)
+        self.file.write(data)
+        self.file.seek(0)
+
+    async def read(self, n):
+        return self.file.read(n)
+
+
+def test_large_file_gets_a_named_spool_path():
+    data   = os.urandom(3 * 1024 * 1024)
+    upload = FakeUpload(data)
+    spool  = asyncio.run(spool_upload(upload, max_bytes=4 * 1024 * 1024, block=64 * 1024))
+    path   = spool.path
+    try:
+        assert spool.on_disk and not path.startswith("/proc/")
+        assert spool.sha256 == hashlib.sha256(data).hexdigest()
+        upload.file.close()                 # the spool does not depend on Starlette's file
+        with open(spool.source, "rb") as fh:
+            assert fh.read() == data
+    finally:
+        spool.close()
+    assert not os.path.exists(path)
+
+
+def test_small_file_stays_in_memory():
+    upload = FakeUpload(b"tiny", memory=1024)
+    with asyncio.run(spool_upload(upload, max_bytes=100)) as spool:
+        assert spool.source == b"tiny"
+
+
+def test_file_over_limit_is_refused():
+    upload = FakeUpload(os.urandom(5_000))
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(upload, max_bytes=4_000))
+
+
+def call(middleware, chunks, headers=()):
+    sent = []
+
+    async def receive():
+        if chunks:
+            body = chunks.pop(0)
+            return {"type": "http.request", "body": body, "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": "/upload", "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+async def echo_app(scope, receive, send):
+    # Reads the whole body like a form parser, failing on a disconnect
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise RuntimeError("client disconnected")
+        size += len(message["body"])
+        if not message["more_body"]:
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(size).encode()})
+
+
+def test_declared_length_over_limit_is_rejected_before_reading():
+    read = []
+
+    async def app(scope, receive, send):
+        read.append(True)
+
+    sent = call(UploadLimitMiddleware(app, 100, {"/upload"}), [b"x" * 500],
+                [(b"content-length", b"500")])
+    assert not read
+    assert sent[0]["status"] == 413
+    assert json.loads(sent[1]["body"])["detail"]
+
+
+def test_undeclared_body_is_cut_off_at_limit():
+    sent = call(UploadLimitMiddleware(echo_app, 100, {"/upload"}), [b"x" * 60, b"x" * 60, b"x" * 60])
+    assert [m.get("status") for m in sent if m["type"] == "http.response.start"] == [413]
+
+
+def test_body_within_limit_and_other_paths_pass_through():
+    sent = call(UploadLimitMiddleware(echo_app, 100, {"/upload"}), [b"x" * 40, b"x" * 40])
+    assert sent[0]["status"] == 200 and sent[1]["body"] == b"80"
+    sent = call(UploadLimitMiddleware(echo_app, 10, {"/other"}), [b"x" * 40])
+    assert sent[0]["status"] == 200
@@ -0,0 +1,229 @@
+"""
+text_compaction.py
+==================
+Token-minimising rewrite of extracted document text before it is chunked
+and sent to the LLM. Layout markers (``=== ... ===``) and table row
+boundaries are preserved, so chunking.py still sees the same structure.
+
+Applied, in order:
+
+- Page headers/footers: a line among the first or last few text lines of
+  a ``=== PAGE`` block that sits there on at least half of the pages (and
+  on three or more) is kept on the first page it appears on and dropped
+  from later pages. ``Page 3 of 10`` / ``- 3 -`` page numbers in those
+  positions are dropped. Lines in the body of a page, single words (grid
+  cells such as ``Lab``), lines with a time or a day name, and
+  ``=== TABLES PAGE`` blocks are never removed, and nothing is
+  deduplicated within a page.
+- Markdown tables: the ``| --- |`` separator row is dropped, columns that
+  are empty in every row (header included) are removed, and cell padding
+  is stripped (``| a | b |`` -> ``|a|b|``).
+- Sheet/CSV rows: the ``Row N:`` prefix is dropped, all-empty columns are
+  removed and `` | `` becomes ``|``.
+- Whitespace: runs of spaces/tabs collapse to one, trailing space is
+  removed, blank-line runs collapse to one.
+
+The Stage-1 context is also re-inserted as compact JSON (see
+timetable_extractor).
+
+``compact_text`` returns the text plus a ``CompactionReport``; running
+totals are kept in ``compaction_stats`` (reported by /api/health).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set, Tuple
+
+from chunking import MARKER, estimate_tokens
+
+_WS         = re.compile(r"[ \t\u00a0]+")
+_BLANKS     = re.compile(r"\n{3,}")
+_SEPARATOR  = re.compile(r"^\|(?:\s*:?-{3,}:?\s*\|)+$")
+_ROW_PREFIX = re.compile(r"^\s*Row \d+:\s?")
+_CELL_SEP   = re.compile(r"\s*\|\s*")
+_PAGE_NO    = re.compile(r"^\s*(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|-\s*\d+\s*-)\s*$", re.IGNORECASE)
+
+# A PDF line is boilerplate when it recurs on at least this share of pages,
+# within this many text lines of the top or bottom of the page
+REPEAT_PAGE_RATIO = 0.5
+REPEAT_MIN_PAGES  = 3
+REPEAT_MIN_WORDS  = 2
+EDGE_LINES        = 3
+
+# Grid content that legitimately repeats on every page (time slots, days)
+_GRID_LINE = re.compile(
+    r"\b\d{1,2}[:.]\d{2}\b|\b(?:mon|tue|wed|thu|fri|sat|sun)(?:day|sday|nesday|rsday|urday)?\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class CompactionReport:
+    chars_before:  int
+    chars_after:   int
+    tokens_before: int
+    tokens_after:  int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chars_before":  self.chars_before,
+            "chars_after":   self.chars_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after":  self.tokens_after,
+            "tokens_saved":  self.tokens_saved,
+        }
+
+
+class CompactionStats:
+    """Thread-safe running totals of tokens saved."""
+
+    def __init__(self) -> None:
+        self.documents     = 0
+        self.tokens_before = 0
+        self.tokens_after  = 0
+        self._lock         = threading.Lock()
+
+    def record(self, report: CompactionReport) -> None:
+        with self._lock:
+            self.documents     += 1
+            self.tokens_before += report.tokens_before
+            self.tokens_after  += report.tokens_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "documents":    self.documents,
+                "tokens_saved": saved,
+                "saved_ratio":  round(saved / self.tokens_before, 4) if self.tokens_before else None,
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+# ===========================================================================
+# Blocks
+# ===========================================================================
+
+def _blocks(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """(marker line, body lines) in document order; the first marker may be ''."""
+    blocks: List[Tuple[str, List[str]]] = [("", [])]
+    for line in lines:
+        if MARKER.match(line):
+            blocks.append((line.strip(), []))
+        else:
+            blocks[-1][1].append(line)
+    return blocks
+
+
+def _drop_empty_columns(rows: List[List[str]]) -> List[List[str]]:
+    width = max((len(r) for r in rows), default=0)
+    keep  = [c for c in range(width) if any(c < len(r) and r[c] for r in rows)]
+    return [[r[c] if c < len(r) else "" for c in keep] for r in rows]
+
+
+def _compact_table(lines: List[str]) -> List[str]:
+    """A run of markdown table rows -> compact rows without the separator or empty columns."""
+    rows = [[cell.strip() for cell in line.strip().strip("|").split("|")]
+            for line in lines if not _SEPARATOR.match(line.strip())]
+    return ["|" + "|".join(r) + "|" for r in _drop_empty_columns(rows) if any(r)]
+
+
+def _compact_sheet(lines: List[str]) -> List[str]:
+    """``Row N: a | b`` lines -> ``a|b`` with all-empty columns removed."""
+    rows = [_CELL_SEP.split(_ROW_PREFIX.sub("", line).strip()) for line in lines if line.strip()]
+    return ["|".join(r) for r in _drop_empty_columns(rows) if any(r)]
+
+
+def _compact_body(lines: List[str]) -> List[str]:
+    out:   List[str] = []
+    table: List[str] = []
+    for line in lines:
+        if line.lstrip().startswith("|"):
+            table.append(line)
+            continue
+        if table:
+            out.extend(_compact_table(table))
+            table = []
+        out.append(line)
+    if table:
+        out.extend(_compact_table(table))
+    return out
+
+
+def _edge_indices(body: List[str]) -> Set[int]:
+    """Indices of the first/last EDGE_LINES text lines of a page: where headers and footers sit."""
+    text = [i for i, l in enumerate(body) if l.strip() and not l.lstrip().startswith("|")]
+    return set(text[:EDGE_LINES] + text[-EDGE_LINES:])
+
+
+def _repeated_edge_lines(blocks: List[Tuple[str, List[str]]]) -> Set[str]:
+    pages  = [body for marker, body in blocks if marker.startswith("=== PAGE")]
+    counts: Counter = Counter()
+    for body in pages:
+        counts.update({body[i].strip() for i in _edge_indices(body)})
+    needed = max(REPEAT_MIN_PAGES, int(len(pages) * REPEAT_PAGE_RATIO + 0.999))
+    return {line for line, n in counts.items()
+            if n >= needed and len(line.split()) >= REPEAT_MIN_WORDS and not _GRID_LINE.search(line)}
+
+
+def _strip_page_furniture(body: List[str], repeated: Set[str], seen: Set[str]) -> List[str]:
+    """Drop page numbers and headers/footers already shown on an earlier page."""
+    edges = _edge_indices(body)
+    found: Set[str]  = set()
+    kept:  List[str] = []
+    for i, line in enumerate(body):
+        if i in edges:
+            key = line.strip()
+            if _PAGE_NO.match(line):
+                continue
+            if key in repeated:
+                found.add(key)
+                if key in seen:
+                    continue
+        kept.append(line)
+    # Only later pages lose the line; repeats within this page stay
+    seen.update(found)
+    return kept
+
+
+# ===========================================================================
+# Public API
+# ===========================================================================
+
+def compact_text(text: str) -> Tuple[str, CompactionReport]:
+    """Compact extracted text; returns (compact_text, report)."""
+    lines    = [_WS.sub(" ", l).rstrip() for l in text.splitlines()]
+    blocks   = _blocks(lines)
+    repeated = _repeated_edge_lines(blocks)
+    seen:  Set[str]  = set()
+    out:   List[str] = []
+
+    for marker, body in blocks:
+        if marker:
+            out.append(marker)
+        if marker.startswith(("=== SHEET", "=== CSV")):
+            out.extend(_compact_sheet(body))
+            continue
+        if marker.startswith("=== PAGE"):
+            body = _strip_page_furniture(body, repeated, seen)
+        out.extend(_compact_body(body))
+
+    compact = _BLANKS.sub("\n\n", "\n".join(out)).strip()
+    report  = CompactionReport(
+        chars_before  = len(text),
+        chars_after   = len(compact),
+        tokens_before = estimate_tokens(text),
+        tokens_after  = estimate_tokens(compact),
+    )
+    compaction_stats.record(report)
+    return compact, report
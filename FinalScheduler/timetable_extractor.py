@@ -5,38 +5,73 @@ Production-grade LLM-based timetable extraction using Cerebras Inference API.
 
 Optimizations Applied
 ---------------------
-OPT-1  Chunked extraction   — large docs split into overlapping chunks; results merged
-OPT-2  Async parallel calls — httpx + asyncio; all chunks extracted concurrently
-OPT-3  Response caching     — SHA-256 keyed shelve cache; skips API on re-extraction
+OPT-0  Text compaction      — repeated page lines, table separators, empty columns and
+                              whitespace stripped before chunking (text_compaction.py)
+OPT-1  Chunked extraction   — large docs packed into token-bounded chunks along page / table /
+                              sheet boundaries (chunking.py); results merged
+OPT-2  Async parallel calls — asyncio over the shared pooled transport (llm_transport.py)
+OPT-3  Response caching     — SQLite cache keyed on raw-upload SHA-256 + model + prompt version;
+                              checked before text extraction (extraction_cache.py)
 OPT-4  Streaming response   — tokens streamed and assembled; lower perceived latency
 OPT-5  json-repair library  — replaces brittle regex cleaning; handles all LLM JSON quirks
 OPT-6  Pydantic validation  — typed schema replaces _apply_defaults; fail-fast on bad data
 OPT-7  Markdown tables      — PDF tables rendered as markdown; LLMs parse these natively
 OPT-8  Two-stage extraction — Stage-1 extracts structure; Stage-2 extracts content with context
+OPT-9  Deferred imports     — PyMuPDF/pdfplumber/pandas/httpx load on the first parse request
+OPT-10 Pooled transport     — keep-alive/HTTP-2 connections reused across calls and documents
+OPT-11 Page-parallel PDF    — PyMuPDF text + table finder across a process pool; pages with
+                              malformed tables escalate to pdfplumber (pdf_extraction.py)
+OPT-12 Adaptive rate limits — per-provider AIMD concurrency + token bucket driven by 429s,
+                              Retry-After and x-ratelimit-* headers (rate_limiter.py)
+OPT-13 Document Stage-1     — structure extracted once from a structure-dense digest; Stage-2
+                              fans out over all chunks concurrently (N+1 calls instead of 2N)
+OPT-14 Per-call failover    — a failed Stage-1/Stage-2 call moves to the next provider while
+                              finished chunks are kept; optional hedging (provider_router.py)
+OPT-15 Native async API     — extract_timetable_data_async runs on the caller's loop; parsing
+                              and cache I/O run on a shared executor (EXTRACT_WORKERS)
+OPT-16 Progress events      — optional callback receives text/structure/per-chunk results and
+                              the running merge as they complete (SSE endpoint in app.py)
+OPT-17 Chunk-level cache    — Stage-1 keyed on its digest, Stage-2 on each chunk's normalized
+                              text and the Stage-1 context (+ model + prompt version); opt-in
+                              content-defined chunk boundaries (EXTRACT_CONTENT_DEFINED_CHUNKS=1)
+                              keep unchanged pages in identical chunks, so a revised upload only
+                              re-sends the chunks around the change, at the price of more chunks
+OPT-18 Truncation recovery  — a reply cut off at max_tokens (finish_reason "length") has its
+                              chunk split in half and re-extracted; where it cannot be split,
+                              continuation requests are stitched onto the partial JSON
 """
 
 from __future__ import annotations
 
 import asyncio
+import copy
 import hashlib
-import io
 import json
 import logging
-import random
+import os
 import re
-import shelve
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
-
-import fitz          # PyMuPDF
-import httpx
-import pandas as pd
-import pdfplumber
-import requests
-from json_repair import repair_json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
 from pydantic import BaseModel, Field, ValidationError
 
+from chunking import LayoutChunker, estimate_tokens, normalize_chunk
+from text_compaction import compact_text
+from lazy_imports import lazy_module
+from extraction_cache import DEFAULT_PATH as CACHE_PATH, content_key, get_extraction_cache
+from llm_transport import LLMTransportError, llm_transport
+
+from pdf_extraction import extract_pdf_text, table_to_markdown
+from upload_spool import FileSource, hash_source, read_source, readable
+
+# Heavy parsing libraries are imported on first use (see lazy_imports.py)
+pd          = lazy_module("pandas")
+pdfplumber  = lazy_module("pdfplumber")
+json_repair = lazy_module("json_repair")
+
 # ---------------------------------------------------------------------------
 # Logging
 # ---------------------------------------------------------------------------
@@ -67,17 +102,33 @@ DEFAULT_MODEL             = "llama3.1-8b"
 DEFAULT_MAX_INPUT_CHARS   = 20_000   # ~5 000 tokens; fits 8 192-token context
 DEFAULT_MAX_OUTPUT_TOKENS = 2_000
 DEFAULT_CHUNK_SIZE        = 18_000
-DEFAULT_CHUNK_OVERLAP     = 500
+DEFAULT_CHUNK_TOKENS      = 5_000    # 8 192 context − 2 000 output − prompt and Stage-1 context
+DEFAULT_OVERLAP_TOKENS    = 150      # only where an oversized page/table/sheet is split
 DEFAULT_MAX_RETRIES       = 2
-RETRY_BACKOFF_SECS        = 1
-CACHE_PATH                = "extraction_cache"
+
+# Truncated replies (finish_reason "length"): halve the chunk this many times,
+# then fall back to up to MAX_CONTINUATIONS "continue where you stopped" calls
+MAX_SPLIT_DEPTH         = int(os.getenv("LLM_TRUNCATION_SPLIT_DEPTH", "2"))
+MAX_CONTINUATIONS       = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+CONTINUATION_TAIL_CHARS = 600
+STITCH_OVERLAP_CHARS    = 300
+FINISH_TRUNCATED        = "length"
 
 DOCUMENT_PLACEHOLDER = "%%DOCUMENT_TEXT%%"
 CONTEXT_PLACEHOLDER  = "%%CONTEXT_JSON%%"
+PARTIAL_PLACEHOLDER  = "%%PARTIAL_TAIL%%"
+
+# Threads for file parsing and cache I/O, shared by all concurrent uploads
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Content-defined chunk boundaries (chunking.py) make the per-chunk cache survive
+# inserted pages, but cost 25-60% more chunks on every cold extraction: opt-in
+CONTENT_DEFINED_CHUNKS = os.getenv("EXTRACT_CONTENT_DEFINED_CHUNKS", "0") == "1"
 
 PDF_EXTENSIONS   = (".pdf",)
 EXCEL_EXTENSIONS = (".xlsx", ".xls", ".xlsm")
 CSV_EXTENSIONS   = (".csv",)
+JSON_EXTENSIONS  = (".json",)
 
 
 # ===========================================================================
@@ -201,8 +252,10 @@ class ExtractionInfo(BaseModel):
     text_length:  int
     model:        str
     method:       str
-    chunks_used:  int  = 1
-    cache_hit:    bool = False
+    chunks_used:      int       = 1
+    chunks_cached:    int       = 0
+    cache_hit:        bool      = False
+    ignored_sections: List[str] = Field(default_factory=list)   # input sections outside the schema
 
 class TimetableData(BaseModel):
     """Root validated schema — every field has a safe default."""
@@ -279,6 +332,66 @@ DOCUMENT:
 {DOCUMENT_PLACEHOLDER}
 """
 
+CONTINUATION_PROMPT = f"""
+
+Your previous reply to the request above stopped at the output limit. It ended with:
+{PARTIAL_PLACEHOLDER}
+
+Continue the JSON exactly where it stopped. Output ONLY the remaining text: no repetition,
+no explanation, no code fences.
+"""
+
+# A single LLM call: prompt -> (response_text, latency, finish_reason). Defaults
+# to the extractor's own provider; a ProviderRouter substitutes per-call failover.
+LLMCall = Callable[[str], Awaitable[Tuple[str, float, Optional[str]]]]
+
+# Progress sink: (event_name, payload). Called on the event loop as work completes.
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# Lines worth showing Stage-1 from beyond the first chunk
+STRUCTURE_LINE = re.compile(
+    r"\b\d{1,2}[:.]\d{2}\b|===|\b(?:mon|tue|wed|thu|fri|sat)[a-z]*\b|\b(?:period|break|lunch|recess"
+    r"|department|dept|section|semester|sem|year|room|hall|lab|elective|session|college|institute)\b",
+    re.IGNORECASE,
+)
+
+# Part of every cache key: editing a prompt invalidates earlier results
+PROMPT_VERSION = hashlib.sha256((STAGE1_PROMPT + STAGE2_PROMPT).encode()).hexdigest()[:12]
+
+
+def stitch_continuation(partial: str, continuation: str) -> str:
+    """Append a continuation reply, dropping fences and any tail of ``partial`` it repeats."""
+    more = re.sub(r"```(?:json)?", "", continuation).strip("\n")
+    for k in range(min(len(more), len(partial), STITCH_OVERLAP_CHARS), 7, -1):
+        if partial.endswith(more[:k]):
+            return partial + more[k:]
+    return partial + more
+
+
+# ===========================================================================
+# Shared text-extraction executor
+# ===========================================================================
+
+_text_executor: Optional[ThreadPoolExecutor] = None
+_text_executor_lock = threading.Lock()
+
+
+def get_text_executor() -> ThreadPoolExecutor:
+    """Executor for blocking parsing work (PDF/Excel/CSV text, cache I/O)."""
+    global _text_executor
+    with _text_executor_lock:
+        if _text_executor is None:
+            _text_executor = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS, thread_name_prefix="extract")
+        return _text_executor
+
+
+def shutdown_text_executor() -> None:
+    global _text_executor
+    with _text_executor_lock:
+        pool, _text_executor = _text_executor, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 
 # ===========================================================================
 # TimetableExtractor
@@ -290,17 +403,19 @@ class TimetableExtractor:
 
     Extraction pipeline
     -------------------
-    1. File bytes  → raw text          (_extract_text)
-    2. Raw text    → overlapping chunks (_chunk_document)         [OPT-1]
-    3. Chunks      → async parallel    (_extract_all_chunks)      [OPT-2]
-       per chunk:
-         a. Stage-1 LLM call (structure)                         [OPT-8]
-         b. Stage-2 LLM call (content + context)                 [OPT-8]
-         both calls use streaming                                 [OPT-4]
+    0. File bytes  → cache lookup      (_cached_extract)          [OPT-3]
+    1. File bytes  → raw text          (_extract_text, executor)  [OPT-15]
+    2. Raw text    → layout chunks     (_chunk_document)          [OPT-1]
+    3. Chunks      → async parallel    (_extract_all_chunks)      [OPT-2, OPT-12]
+         a. Stage-1 LLM call once on the structure digest        [OPT-8, OPT-13]
+         b. Stage-2 LLM call per chunk, all concurrent, sharing
+            the Stage-1 context                                   [OPT-8, OPT-13]
+         unchanged digest / chunks served from the stage cache   [OPT-17]
+         all calls use streaming                                  [OPT-4]
          JSON parsed with json-repair                             [OPT-5]
     4. Chunk dicts → merged dict       (_merge_dicts)             [OPT-1]
     5. Merged dict → Pydantic model    (_validate)                [OPT-6]
-    6. Result      → shelve cache      (_cached_extract)          [OPT-3]
+    6. Result      → SQLite cache      (_cached_extract)          [OPT-3]
     PDF tables rendered as markdown before LLM sees them          [OPT-7]
     """
 
@@ -312,11 +427,13 @@ class TimetableExtractor:
         max_input_chars:   int  = DEFAULT_MAX_INPUT_CHARS,
         max_output_tokens: int  = DEFAULT_MAX_OUTPUT_TOKENS,
         chunk_size:        int  = DEFAULT_CHUNK_SIZE,
-        chunk_overlap:     int  = DEFAULT_CHUNK_OVERLAP,
+        chunk_tokens:      int  = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens:    int  = DEFAULT_OVERLAP_TOKENS,
         max_retries:       int  = DEFAULT_MAX_RETRIES,
         enable_cache:      bool = True,
         cache_path:        str  = CACHE_PATH,
         enable_streaming:  bool = True,
+        test_connection:   bool = True,
     ) -> None:
         self.cerebras_api_key  = cerebras_api_key
         self.endpoint_url      = endpoint_url
@@ -324,14 +441,18 @@ class TimetableExtractor:
         self.max_input_chars   = max_input_chars
         self.max_output_tokens = max_output_tokens
         self.chunk_size        = chunk_size
-        self.chunk_overlap     = chunk_overlap
+        self.chunk_tokens      = chunk_tokens
+        self.overlap_tokens    = overlap_tokens
         self.max_retries       = max_retries
         self.enable_cache      = enable_cache
         self.cache_path        = cache_path
         self.enable_streaming  = enable_streaming
         self.is_connected:     bool = False
 
-        self._test_connection()
+        # Callers that probe health in the background (llm_providers) skip the
+        # blocking startup ping.
+        if test_connection:
+            self._test_connection()
         logger.info(
             "TimetableExtractor ready | model=%s connected=%s cache=%s streaming=%s",
             self.model, self.is_connected, self.enable_cache, self.enable_streaming,
@@ -357,30 +478,51 @@ class TimetableExtractor:
             "stream":      stream,
         }
 
-    def _cache_key(self, text: str) -> str:
-        return hashlib.sha256(text.encode()).hexdigest()
+    def _cache_key(self, file_content: FileSource, content_hash: Optional[Any] = None) -> str:
+        if content_hash is None:
+            content_hash = hash_source(file_content)
+        return content_key(content_hash, self.model, PROMPT_VERSION)
+
+    def _stage_cache_key(self, stage: str, text: str, *context: str) -> str:
+        """OPT-17: key for one Stage-1/Stage-2 result, from the normalized input text and its context."""
+        return content_key(normalize_chunk(text).encode(), stage, self.model, PROMPT_VERSION, *context)
 
     # ------------------------------------------------------------------ #
     # Connection test                                                      #
     # ------------------------------------------------------------------ #
 
-    def _test_connection(self) -> None:
-        try:
-            r = requests.post(
-                self.endpoint_url,
-                headers=self._build_headers(),
-                json={**self._build_payload("ping"), "max_tokens": 5},
-                timeout=10,
-            )
-            self.is_connected = r.status_code == 200
+    def _ping_payload(self) -> Dict[str, Any]:
+        return {**self._build_payload("ping"), "max_tokens": 5}
+
+    def _connection_result(self, status: Optional[int], exc: Optional[Exception] = None) -> Optional[int]:
+        self.is_connected = status == 200
+        if status is None:
+            logger.warning("Cerebras connection test failed: %s", exc)
+        else:
             logger.log(
                 logging.INFO if self.is_connected else logging.WARNING,
                 "Cerebras API: %s (HTTP %s)",
-                "OK" if self.is_connected else "FAILED", r.status_code,
+                "OK" if self.is_connected else "FAILED", status,
             )
-        except requests.exceptions.RequestException as exc:
-            logger.warning("Cerebras connection test failed: %s", exc)
-            self.is_connected = False
+        return status
+
+    def _test_connection(self, timeout: float = 10) -> Optional[int]:
+        """Ping the endpoint; sets ``is_connected`` and returns the HTTP status (None if unreachable)."""
+        try:
+            resp = llm_transport.chat_sync(self.endpoint_url, self._build_headers(),
+                                           self._ping_payload(), timeout=timeout, retries=1)
+            return self._connection_result(resp.status)
+        except LLMTransportError as exc:
+            return self._connection_result(exc.status, exc)
+
+    async def _test_connection_async(self, timeout: float = 10) -> Optional[int]:
+        """Async variant of :meth:`_test_connection` over the shared pool."""
+        try:
+            resp = await llm_transport.chat(self.endpoint_url, self._build_headers(),
+                                            self._ping_payload(), timeout=timeout, retries=1)
+            return self._connection_result(resp.status)
+        except LLMTransportError as exc:
+            return self._connection_result(exc.status, exc)
 
     # ------------------------------------------------------------------ #
     # OPT-5: JSON parsing with json-repair                                 #
@@ -397,7 +539,7 @@ class TimetableExtractor:
         end   = text.rfind("}")
         if start == -1 or end == -1:
             raise ValueError(f"No JSON object found (first 200 chars): {raw[:200]}")
-        repaired = repair_json(text[start : end + 1])
+        repaired = json_repair.repair_json(text[start : end + 1])
         return json.loads(repaired)
 
     # ------------------------------------------------------------------ #
@@ -418,22 +560,23 @@ class TimetableExtractor:
     # ------------------------------------------------------------------ #
 
     def _chunk_document(self, text: str) -> List[str]:
-        """Split text into overlapping chunks to avoid hard truncation."""
-        if len(text) <= self.chunk_size:
+        """
+        Pack whole pages / table blocks / sheets into chunks of at most
+        ``chunk_tokens`` tokens; only a block that is too big on its own is
+        split at row boundaries, with its header repeated (chunking.py).
+        """
+        if estimate_tokens(text) <= self.chunk_tokens:
             return [text]
-        chunks: List[str] = []
-        start = 0
-        while start < len(text):
-            end = start + self.chunk_size
-            chunks.append(text[start:end])
-            if end >= len(text):
-                break
-            start = end - self.chunk_overlap
+        # Content-defined boundaries keep unchanged pages in the same chunks across
+        # revisions, which is what lets the per-chunk cache hit after an insert (OPT-17)
+        chunker = LayoutChunker(self.chunk_tokens, self.overlap_tokens,
+                                content_defined=self.enable_cache and CONTENT_DEFINED_CHUNKS)
+        chunks  = chunker.chunk(text)
         logger.info(
-            "Document split into %d chunks (size=%d overlap=%d)",
-            len(chunks), self.chunk_size, self.chunk_overlap,
+            "Document split into %d chunks (budget=%d tokens)",
+            len(chunks), self.chunk_tokens,
         )
-        return chunks
+        return chunks or [text]
 
     # ------------------------------------------------------------------ #
     # OPT-1: Merge chunk results                                           #
@@ -485,213 +628,357 @@ class TimetableExtractor:
     # ------------------------------------------------------------------ #
 
     async def _call_llm_async(
-        self, client: httpx.AsyncClient, prompt: str
-    ) -> Tuple[str, float]:
+        self, prompt: str, retries: Optional[int] = None, admit_timeout: Optional[float] = None,
+    ) -> Tuple[str, float, Optional[str]]:
         """
-        Single async LLM call with retry.
+        Single async LLM call over the shared transport (pooling + retry).
         Uses streaming when enabled (OPT-4), plain POST otherwise.
-        Returns (response_text, latency_seconds).
+        Returns (response_text, latency_seconds, finish_reason).
+        ``retries`` / ``admit_timeout`` let a router fail fast (OPT-14).
         """
-        response_text: str = ""          # always defined; safe to log in except block
-        last_exc: Optional[Exception] = None
-        for attempt in range(1, self.max_retries + 1):
-            response_text = ""
-            t0 = time.time()
-            try:
-                if self.enable_streaming:
-                    collected: List[str] = []
-                    async with client.stream(
-                        "POST",
-                        self.endpoint_url,
-                        headers=self._build_headers(),
-                        json=self._build_payload(prompt, stream=True),
-                        timeout=90,
-                    ) as resp:
-                        if resp.status_code != 200:
-                            body = await resp.aread()
-                            raise APIConnectionError(f"HTTP {resp.status_code}: {body[:200]}")
-                        async for line in resp.aiter_lines():
-                            line = line.strip()
-                            if not line or not line.startswith("data: "):
-                                continue
-                            payload = line[6:]
-                            if payload == "[DONE]":
-                                break
-                            try:
-                                delta = (
-                                    json.loads(payload)["choices"][0]
-                                    .get("delta", {})
-                                    .get("content", "")
-                                )
-                                collected.append(delta)
-                            except (json.JSONDecodeError, KeyError):
-                                continue
-                    response_text = "".join(collected)
-                else:
-                    resp = await client.post(
-                        self.endpoint_url,
-                        headers=self._build_headers(),
-                        json=self._build_payload(prompt, stream=False),
-                        timeout=90,
-                    )
-                    if resp.status_code != 200:
-                        raise APIConnectionError(f"HTTP {resp.status_code}: {resp.text[:200]}")
-                    response_text = resp.json()["choices"][0]["message"]["content"]
-
-                latency = time.time() - t0
-                logger.debug("LLM call done in %.2fs (%d chars)", latency, len(response_text))
-                return response_text, latency
-
-            except Exception as exc:
-                last_exc = exc
-                logger.warning("LLM attempt %d/%d failed: %s", attempt, self.max_retries, exc)
-                if attempt < self.max_retries:
-                    # Exponential backoff: sleep longer on successive retries
-                    # Jitter: add random delay so concurrent tasks retry at different times
-                    backoff_delay = RETRY_BACKOFF_SECS * (2 ** (attempt - 1))
-                    jitter = random.uniform(0.5, 1.5)
-                    sleep_time = backoff_delay + jitter
-                    logger.info("Retrying in %.2fs...", sleep_time)
-                    await asyncio.sleep(sleep_time)
-
-        raise APIConnectionError(
-            f"All {self.max_retries} LLM attempts failed. Last: {last_exc}"
-        ) from last_exc
+        retries = retries or self.max_retries
+        try:
+            resp = await llm_transport.chat(
+                self.endpoint_url,
+                self._build_headers(),
+                self._build_payload(prompt, stream=self.enable_streaming),
+                stream        = self.enable_streaming,
+                retries       = retries,
+                admit_timeout = admit_timeout,
+            )
+        except LLMTransportError as exc:
+            raise APIConnectionError(
+                f"All {retries} LLM attempts failed. Last: {exc}"
+            ) from exc
+        logger.debug("LLM call done in %.2fs (%d chars)", resp.latency, len(resp.text))
+        return resp.text, resp.latency, resp.finish_reason
 
     # ------------------------------------------------------------------ #
-    # OPT-8: Two-stage extraction per chunk                                #
+    # OPT-8 + OPT-13: Document-level Stage-1, fanned-out Stage-2           #
     # ------------------------------------------------------------------ #
 
-    async def _extract_chunk(
-        self, client: httpx.AsyncClient, chunk: str, idx: int
-    ) -> Dict[str, Any]:
+    def _structure_digest(self, text: str, chunks: List[str]) -> str:
         """
-        Stage-1: extract structure (college, time_slots, departments, rooms).
-        Stage-2: extract content  (subjects, labs, faculty) using Stage-1 context.
-        Merge both stage outputs and return.
+        Stage-1 input: the whole document when it fits in one chunk, otherwise
+        the head of the document followed by every later line that looks
+        structural (times, days, department/section/room keywords, sheet and
+        page markers), capped at ``chunk_size``.
         """
-        logger.info("Chunk %d | Stage-1 start", idx)
+        if len(chunks) <= 1:
+            return chunks[0] if chunks else text
+        head   = chunks[0][: self.chunk_size // 2]
+        budget = self.chunk_size - len(head)
+        picked: List[str] = []
+        seen:   set       = set()
+        for line in text[len(head):].splitlines():
+            line = line.strip()
+            if not line or line in seen or not STRUCTURE_LINE.search(line):
+                continue
+            budget -= len(line) + 1
+            if budget < 0:
+                break
+            seen.add(line)
+            picked.append(line)
+        logger.info("Stage-1 digest: %d head chars + %d structural lines", len(head), len(picked))
+        return head + "\n\n=== STRUCTURAL LINES (rest of document) ===\n" + "\n".join(picked)
+
+    # ------------------------------------------------------------------ #
+    # OPT-17: Chunk-level cache                                            #
+    # ------------------------------------------------------------------ #
+
+    async def _stage_cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enable_cache:
+            return None
+        cache = get_extraction_cache(self.cache_path)
+        return await asyncio.get_running_loop().run_in_executor(get_text_executor(), cache.get, key)
+
+    async def _stage_cache_put(self, key: str, data: Dict[str, Any]) -> None:
+        # Parse failures come back as {} and are never cached, so they get retried
+        if not self.enable_cache or not data:
+            return
+        cache = get_extraction_cache(self.cache_path)
+        await asyncio.get_running_loop().run_in_executor(get_text_executor(), cache.put, key, data)
+
+    # ------------------------------------------------------------------ #
+    # OPT-18: Truncated replies                                            #
+    # ------------------------------------------------------------------ #
 
-        # Stage-1 ──────────────────────────────────────────────────────
-        s1_prompt = STAGE1_PROMPT.replace(DOCUMENT_PLACEHOLDER, chunk)
-        raw1, lat1 = await self._call_llm_async(client, s1_prompt)
+    async def _continue_truncated(
+        self, prompt: str, partial: str, llm_call: LLMCall, label: str,
+    ) -> Tuple[str, float, bool]:
+        """
+        Ask for the rest of a reply cut off at max_tokens and stitch it on.
+        Returns (text, extra_latency, still_truncated).
+        """
+        text, latency = partial, 0.0
+        for attempt in range(1, MAX_CONTINUATIONS + 1):
+            logger.warning("%s | reply truncated at %d chars; continuation %d/%d",
+                           label, len(text), attempt, MAX_CONTINUATIONS)
+            follow_up = prompt + CONTINUATION_PROMPT.replace(PARTIAL_PLACEHOLDER, text[-CONTINUATION_TAIL_CHARS:])
+            more, more_latency, finish = await llm_call(follow_up)
+            text     = stitch_continuation(text, more)
+            latency += more_latency
+            if finish != FINISH_TRUNCATED:
+                return text, latency, False
+        return text, latency, True
+
+    def _split_truncated(self, chunk: str) -> List[str]:
+        """Halve a chunk along layout boundaries; a single piece means it cannot be split."""
+        return LayoutChunker(estimate_tokens(chunk) // 2, self.overlap_tokens).chunk(chunk)
+
+    async def _extract_structure(self, digest: str, llm_call: LLMCall) -> Tuple[Dict[str, Any], bool, bool]:
+        """
+        Stage-1: college info, time slots, departments, rooms — once per
+        document. Returns (data, cached, complete); ``complete`` is False
+        when the reply stayed truncated or parsed to nothing.
+        """
+        key    = self._stage_cache_key("stage1", digest)
+        cached = await self._stage_cache_get(key)
+        if cached is not None:
+            logger.info("Stage-1 cache HIT")
+            return cached, True, True
+
+        logger.info("Stage-1 start (%d chars)", len(digest))
+        prompt = STAGE1_PROMPT.replace(DOCUMENT_PLACEHOLDER, digest)
+        raw, latency, finish = await llm_call(prompt)
+        truncated = finish == FINISH_TRUNCATED
+        if truncated:
+            # The digest is one unit of context, so it is continued rather than split
+            raw, extra, truncated = await self._continue_truncated(prompt, raw, llm_call, "Stage-1")
+            latency += extra
         try:
-            s1_data = self._parse_json(raw1)
+            data = self._parse_json(raw)
         except ValueError as exc:
-            logger.warning("Chunk %d Stage-1 parse failed: %s", idx, exc)
-            s1_data = {}
+            logger.warning("Stage-1 parse failed: %s", exc)
+            data = {}
+        logger.info("Stage-1 done (%.2fs)", latency)
+        if not truncated:
+            await self._stage_cache_put(key, data)
+        return data, False, bool(data) and not truncated
 
-        logger.info("Chunk %d | Stage-1 done (%.2fs) → Stage-2 start", idx, lat1)
-
-        # Stage-2 ──────────────────────────────────────────────────────
-        s2_prompt = (
+    async def _extract_chunk(
+        self, chunk: str, idx: int, context_json: str, llm_call: LLMCall,
+    ) -> Tuple[Dict[str, Any], bool, bool]:
+        """
+        Stage-2: subjects, labs, faculty for one chunk against the shared
+        Stage-1 context. Returns (data, cached, complete), as for Stage-1.
+        The cache key covers the chunk text and the context it was extracted
+        against, so a cached result is never merged under a changed structure.
+        """
+        key    = self._stage_cache_key("stage2", chunk, context_json)
+        cached = await self._stage_cache_get(key)
+        if cached is not None:
+            logger.info("Chunk %d | Stage-2 cache HIT", idx)
+            return cached, True, True
+
+        data, truncated = await self._extract_chunk_llm(chunk, str(idx), context_json, llm_call)
+        if not truncated:
+            await self._stage_cache_put(key, data)
+        return data, False, bool(data) and not truncated
+
+    async def _extract_chunk_llm(
+        self, chunk: str, label: str, context_json: str, llm_call: LLMCall, depth: int = 0,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        One Stage-2 call; returns (data, truncated). A reply cut off at
+        max_tokens is retried as two halves of the chunk (merged), down to
+        MAX_SPLIT_DEPTH, and only then continued in place (OPT-18).
+        """
+        logger.info("Chunk %s | Stage-2 start", label)
+        prompt = (
             STAGE2_PROMPT
-            .replace(CONTEXT_PLACEHOLDER,  json.dumps(s1_data, indent=2))
+            .replace(CONTEXT_PLACEHOLDER,  context_json)
             .replace(DOCUMENT_PLACEHOLDER, chunk)
         )
-        raw2, lat2 = await self._call_llm_async(client, s2_prompt)
+        raw, latency, finish = await llm_call(prompt)
+        truncated = finish == FINISH_TRUNCATED
+
+        if truncated and depth < MAX_SPLIT_DEPTH:
+            pieces = self._split_truncated(chunk)
+            if len(pieces) > 1:
+                logger.warning("Chunk %s | reply truncated; re-extracting as %d pieces", label, len(pieces))
+                parts = await asyncio.gather(*(
+                    self._extract_chunk_llm(piece, f"{label}.{n}", context_json, llm_call, depth + 1)
+                    for n, piece in enumerate(pieces, 1)
+                ))
+                return self._merge_dicts([data for data, _ in parts]), any(t for _, t in parts)
+
+        if truncated:
+            raw, extra, truncated = await self._continue_truncated(prompt, raw, llm_call, f"Chunk {label}")
+            latency += extra
         try:
-            s2_data = self._parse_json(raw2)
+            data = self._parse_json(raw)
         except ValueError as exc:
-            logger.warning("Chunk %d Stage-2 parse failed: %s", idx, exc)
-            s2_data = {}
-
-        logger.info("Chunk %d | Stage-2 done (%.2fs)", idx, lat2)
-        return self._merge_dicts([s1_data, s2_data])
+            logger.warning("Chunk %s Stage-2 parse failed: %s", label, exc)
+            data = {}
+        logger.info("Chunk %s | Stage-2 done (%.2fs)", label, latency)
+        return data, truncated
 
     # ------------------------------------------------------------------ #
     # OPT-2: Parallel extraction across all chunks                         #
     # ------------------------------------------------------------------ #
 
-    async def _extract_all_chunks(self, chunks: List[str]) -> Dict[str, Any]:
-        """Fire all chunk extractions concurrently (throttled) and merge."""
-        # Limit to 1 active concurrent chunk extraction at a time to prevent HTTP 429
-        sem = asyncio.Semaphore(1)
-
-        async def sem_extract(client: httpx.AsyncClient, chunk: str, idx: int):
-            async with sem:
-                return await self._extract_chunk(client, chunk, idx)
+    async def _extract_all_chunks(
+        self,
+        chunks:   List[str],
+        text:     Optional[str]              = None,
+        llm_call: Optional[LLMCall]          = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[Dict[str, Any], int, int]:
+        """
+        One Stage-1 call on the structure digest, then every chunk's Stage-2
+        concurrently against that context: N+1 LLM calls instead of 2N.
+        Admission is left to the shared per-provider limiter in the transport
+        (OPT-12), which ramps concurrency up until the provider returns 429s.
+        Every call goes through ``llm_call``, so a router can fail single
+        calls over to another provider (OPT-14).
+
+        Stage results are cached per chunk (OPT-17): chunks whose text is
+        unchanged since an earlier upload are served from the cache and merged
+        with the freshly extracted ones. Returns (merged, cached_chunk_count,
+        incomplete_count); a stage counts as incomplete when it failed, parsed
+        to ``{}`` or stayed truncated, and the caller must not cache a merge
+        with any.
+
+        With ``progress`` set, "structure", "chunk" (with the running merge)
+        and "chunk_failed" events are emitted as calls complete (OPT-16).
+        """
+        llm_call     = llm_call or self._call_llm_async
+        digest       = self._structure_digest(text or "\n".join(chunks), chunks)
+        structure, structure_cached, structure_complete = await self._extract_structure(digest, llm_call)
+        context_json = json.dumps(structure, separators=(",", ":"), ensure_ascii=False)
+        if progress is not None:
+            progress("structure", {"data": structure, "cached": structure_cached})
+
+        async def indexed(chunk: str, idx: int) -> Tuple[int, Any]:
+            try:
+                return idx, await self._extract_chunk(chunk, idx, context_json, llm_call)
+            except Exception as exc:
+                return idx, exc
 
-        async with httpx.AsyncClient() as client:
-            tasks   = [sem_extract(client, c, i) for i, c in enumerate(chunks, 1)]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks   = [asyncio.ensure_future(indexed(c, i)) for i, c in enumerate(chunks, 1)]
+        results: Dict[int, Any] = {}
+        cached  = 0
+        incomplete = 0 if structure_complete else 1
+        running = copy.deepcopy(structure) if progress is not None else None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                idx, outcome = await next_done
+                if isinstance(outcome, Exception):
+                    results[idx] = outcome
+                    if progress is not None:
+                        progress("chunk_failed", {"chunk": idx, "total": len(chunks), "error": str(outcome)})
+                    continue
+                data, hit, complete = outcome
+                results[idx] = data
+                cached      += hit
+                incomplete  += not complete
+                if progress is not None:
+                    running = self._merge_dicts([running, copy.deepcopy(data)])
+                    progress("chunk", {"chunk": idx, "total": len(chunks), "cached": hit,
+                                       "data": data, "merged": running})
+        finally:
+            # Cancelled (e.g. the client went away): stop the remaining LLM calls
+            for task in tasks:
+                task.cancel()
 
         successful: List[Dict[str, Any]] = []
-        for idx, r in enumerate(results, 1):
+        for idx in range(1, len(chunks) + 1):
+            r = results[idx]
             if isinstance(r, Exception):
                 logger.error("Chunk %d failed: %s", idx, r)
+                incomplete += 1
             else:
                 successful.append(r)
 
         if not successful:
             raise ExtractionError("All chunk extractions failed")
 
-        logger.info("%d/%d chunks succeeded", len(successful), len(chunks))
-        return self._merge_dicts(successful)
+        logger.info("%d/%d chunks succeeded (%d from cache, %d incomplete stages)",
+                    len(successful), len(chunks), cached, incomplete)
+        return self._merge_dicts([structure, *successful]), cached, incomplete
 
     # ------------------------------------------------------------------ #
     # OPT-3: Cache layer                                                   #
     # ------------------------------------------------------------------ #
 
-    def _cached_extract(self, document_text: str) -> Tuple[Dict[str, Any], bool]:
+    async def _cached_extract(
+        self,
+        file_content: FileSource,
+        filename:     str,
+        llm_call:     Optional[LLMCall]          = None,
+        progress:     Optional[ProgressCallback] = None,
+        content_hash: Optional[Any]              = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
         """
-        Return (result_dict, cache_hit).
-        On cache miss: run full extraction pipeline and store result.
+        Return (result_dict, meta, cache_hit).
+        The cache is keyed on the raw bytes, so a hit skips text extraction too;
+        ``content_hash`` (a running sha256 from the upload spool) saves re-reading them.
+        On cache miss: extract text on the shared executor, run the chunk
+        pipeline on the caller's event loop and store the result.
         """
-        key = self._cache_key(document_text)
-
-        if self.enable_cache:
-            try:
-                with shelve.open(self.cache_path) as cache:
-                    if key in cache:
-                        logger.info("Cache HIT (key=%s…)", key[:12])
-                        return cache[key], True
-            except Exception as exc:
-                logger.warning("Cache read failed: %s", exc)
+        loop  = asyncio.get_running_loop()
+        pool  = get_text_executor()
+        key   = await loop.run_in_executor(pool, self._cache_key, file_content, content_hash)
+        cache = get_extraction_cache(self.cache_path) if self.enable_cache else None
+
+        if cache is not None:
+            entry = await loop.run_in_executor(pool, cache.get, key)
+            if entry is not None:
+                logger.info("Cache HIT (key=%s…)", key[:12])
+                if progress is not None:
+                    progress("cache_hit", entry["meta"])
+                return entry["data"], entry["meta"], True
+
+        document_text = await loop.run_in_executor(pool, self._extract_text, file_content, filename)
+        if not document_text.strip():
+            raise ExtractionError(f"No text could be extracted from '{filename}'")
+        document_text, report = await loop.run_in_executor(pool, compact_text, document_text)
+        logger.info(
+            "Raw text: %d chars | compacted %d -> %d tokens (-%d)",
+            len(document_text), report.tokens_before, report.tokens_after, report.tokens_saved,
+        )
 
         chunks = self._chunk_document(document_text)
-
-        # FastAPI/uvicorn already runs an event loop, so asyncio.run() would
-        # crash with "cannot be called from a running event loop".
-        # Instead, spin up a *new* loop in a background thread.
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
-            future = pool.submit(asyncio.run, self._extract_all_chunks(chunks))
-            result = future.result()
-
-        if self.enable_cache:
-            try:
-                with shelve.open(self.cache_path) as cache:
-                    cache[key] = result
-                logger.info("Cache WRITE (key=%s…)", key[:12])
-            except Exception as exc:
-                logger.warning("Cache write failed: %s", exc)
-
-        return result, False
+        if progress is not None:
+            progress("text_extracted", {
+                "text_length": len(document_text),
+                "pages":       document_text.count("=== PAGE "),
+                "sheets":      document_text.count("=== SHEET: "),
+                "chunks":      len(chunks),
+                "compaction":  report.as_dict(),
+            })
+        result, cached, incomplete = await self._extract_all_chunks(chunks, document_text, llm_call, progress)
+        meta = {"text_length": len(document_text), "chunks_used": len(chunks), "chunks_cached": cached}
+
+        if cache is not None and incomplete:
+            # A partial merge would otherwise be served for this document from now on
+            logger.warning("Cache SKIP (key=%s…): %d incomplete stages", key[:12], incomplete)
+        elif cache is not None and await loop.run_in_executor(pool, cache.put, key, {"data": result, "meta": meta}):
+            logger.info("Cache WRITE (key=%s…)", key[:12])
+
+        return result, meta, False
 
     # ------------------------------------------------------------------ #
     # OPT-7: PDF table → markdown                                          #
     # ------------------------------------------------------------------ #
 
-    @staticmethod
-    def _table_to_markdown(table: List[List[Any]]) -> str:
-        """Convert a pdfplumber table (list of rows) to a markdown table."""
-        if not table:
-            return ""
-        rows      = [[str(c).strip() if c else "" for c in row] for row in table]
-        header    = "| " + " | ".join(rows[0])   + " |"
-        separator = "| " + " | ".join("---" for _ in rows[0]) + " |"
-        body      = "\n".join("| " + " | ".join(r) + " |" for r in rows[1:])
-        return "\n".join(filter(None, [header, separator, body]))
+    _table_to_markdown = staticmethod(table_to_markdown)
 
     # ------------------------------------------------------------------ #
     # File text extraction                                                 #
     # ------------------------------------------------------------------ #
 
-    def _extract_text_from_pdf(self, file_content: bytes) -> str:
+    def _extract_text_from_pdf(self, file_content: FileSource) -> str:
+        """Page-parallel extraction (pdf_extraction.py); whole-document pdfplumber as last resort."""
+        try:
+            return extract_pdf_text(file_content)
+        except Exception as exc:
+            logger.warning("PyMuPDF extraction failed (%s); trying pdfplumber", exc)
+
         parts: List[str] = []
         try:
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+            with pdfplumber.open(readable(file_content)) as pdf:
                 for page_num, page in enumerate(pdf.pages, start=1):
                     text = page.extract_text() or ""
                     if text:
@@ -703,23 +990,28 @@ class TimetableExtractor:
                             md = self._table_to_markdown(table)
                             if md:
                                 parts.append(f"\nTable {t_idx}:\n{md}")
-            result = "\n".join(parts).strip()
-            if result:
-                return result
-            logger.warning("pdfplumber returned empty; trying PyMuPDF")
-        except Exception as exc:
-            logger.warning("pdfplumber failed (%s); trying PyMuPDF", exc)
-
-        # PyMuPDF fallback
-        try:
-            doc   = fitz.open(stream=file_content, filetype="pdf")
-            parts = [f"\n=== PAGE {i+1} (PyMuPDF) ===\n{doc[i].get_text()}" for i in range(len(doc))]
-            doc.close()
             return "\n".join(parts).strip()
         except Exception as exc:
             raise ExtractionError(f"PDF extraction failed with both libraries: {exc}") from exc
 
-    def _extract_text_from_excel(self, file_content: bytes, filename: str) -> str:
+    @staticmethod
+    def _frame_to_lines(df: "pd.DataFrame") -> List[str]:
+        """
+        Format every non-empty row as "  Row N: a | b | c" with column-wise
+        string operations instead of iterrows (N is the 1-based sheet row).
+        """
+        if df.empty:
+            return []
+        cells  = df.fillna("").astype(str).apply(lambda col: col.str.strip())
+        filled = cells.ne("").any(axis=1)
+        cells  = cells[filled]
+        if cells.empty:
+            return []
+        joined = cells.iloc[:, 0].str.cat(cells.iloc[:, 1:], sep=" | ") if cells.shape[1] > 1 else cells.iloc[:, 0]
+        lines  = "  Row " + (cells.index + 1).astype(str) + ": " + joined
+        return lines.tolist()
+
+    def _extract_text_from_excel(self, file_content: FileSource, filename: str) -> str:
         lower   = filename.lower()
         engines = (
             ["openpyxl"]           if lower.endswith((".xlsx", ".xlsm"))
@@ -729,17 +1021,13 @@ class TimetableExtractor:
         for engine in engines:
             parts: List[str] = []
             try:
-                ef = pd.ExcelFile(io.BytesIO(file_content), engine=engine)
-                for sheet in ef.sheet_names:
+                # One pass over the workbook: every sheet, in order, as strings
+                sheets = pd.read_excel(readable(file_content), sheet_name=None,
+                                       engine=engine, header=None, dtype=str)
+                for sheet, df in sheets.items():
                     parts.append(f"\n=== SHEET: {sheet} ===")
-                    df = pd.read_excel(io.BytesIO(file_content), sheet_name=sheet,
-                                       engine=engine, header=None)
-                    for idx, row in df.iterrows():
-                        cells    = [str(v).strip() if pd.notna(v) else "" for v in row]
-                        row_text = " | ".join(cells)
-                        if row_text.strip():
-                            parts.append(f"  Row {idx+1}: {row_text}")
-                logger.info("Excel extracted with engine=%s", engine)
+                    parts.extend(self._frame_to_lines(df))
+                logger.info("Excel extracted with engine=%s (%d sheets)", engine, len(sheets))
                 return "\n".join(parts).strip()
             except Exception as exc:
                 logger.warning("Excel engine '%s' failed: %s", engine, exc)
@@ -748,20 +1036,23 @@ class TimetableExtractor:
             f"Excel extraction failed for '{filename}': {last_exc}"
         ) from last_exc
 
-    def _extract_text_from_csv(self, file_content: bytes) -> str:
+    def _extract_text_from_csv(self, file_content: FileSource) -> str:
         parts = ["\n=== CSV FILE ==="]
         try:
-            df = pd.read_csv(io.BytesIO(file_content), header=None)
-            for idx, row in df.iterrows():
-                cells    = [str(v).strip() if pd.notna(v) else "" for v in row]
-                row_text = " | ".join(cells)
-                if row_text.strip():
-                    parts.append(f"  Row {idx+1}: {row_text}")
+            df = pd.read_csv(readable(file_content), header=None, dtype=str)
+            parts.extend(self._frame_to_lines(df))
         except Exception as exc:
             raise ExtractionError(f"CSV extraction failed: {exc}") from exc
         return "\n".join(parts).strip()
 
-    def _extract_text(self, file_content: bytes, filename: str) -> str:
+    def _extract_text_from_json(self, file_content: FileSource) -> str:
+        """JSON not in our schema (see structured_loader.py) is handed to the LLM as text."""
+        try:
+            return json.dumps(json.loads(read_source(file_content)), indent=1, ensure_ascii=False)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ExtractionError(f"JSON extraction failed: {exc}") from exc
+
+    def _extract_text(self, file_content: FileSource, filename: str) -> str:
         lower = filename.lower()
         if lower.endswith(PDF_EXTENSIONS):
             return self._extract_text_from_pdf(file_content)
@@ -769,29 +1060,44 @@ class TimetableExtractor:
             return self._extract_text_from_excel(file_content, filename)
         if lower.endswith(CSV_EXTENSIONS):
             return self._extract_text_from_csv(file_content)
-        supported = PDF_EXTENSIONS + EXCEL_EXTENSIONS + CSV_EXTENSIONS
+        if lower.endswith(JSON_EXTENSIONS):
+            return self._extract_text_from_json(file_content)
+        supported = PDF_EXTENSIONS + EXCEL_EXTENSIONS + CSV_EXTENSIONS + JSON_EXTENSIONS
         raise ValueError(f"Unsupported format '{filename}'. Supported: {supported}")
 
     # ------------------------------------------------------------------ #
     # Public API                                                           #
     # ------------------------------------------------------------------ #
 
-    def extract_timetable_data(
+    async def extract_timetable_data_async(
         self,
-        file_content:  bytes,
+        file_content:  FileSource,
         filename:      str,
         college_name:  Optional[str] = None,
-        session:       Optional[str] = None,
+        session:       Optional[str]              = None,
+        router:        Optional[Any]              = None,
+        progress:      Optional[ProgressCallback] = None,
+        content_hash:  Optional[Any]              = None,
     ) -> Dict[str, Any]:
         """
         Extract structured timetable data from a file.
 
+        Runs on the caller's event loop: file parsing and cache I/O go to the
+        shared text executor, LLM calls go over the loop's pooled transport.
+
         Parameters
         ----------
-        file_content : bytes   Raw file bytes.
+        file_content : bytes | str  Raw file bytes, or the path of a spooled upload
+                                    (upload_spool.py); parsers open the path directly.
         filename     : str     Original filename (determines parsing strategy).
         college_name : str     Optional override for detected college name.
         session      : str     Optional override for detected academic session.
+        router       : ProviderRouter  Optional per-call failover across providers;
+                                       this extractor still does text extraction and caching.
+        progress     : callable        Optional ``(event, payload)`` sink for partial results:
+                                       cache_hit, text_extracted, structure, chunk, chunk_failed.
+        content_hash : hashlib sha256  Optional running hash of the file bytes, so the
+                                       cache key needs no second pass over the file.
 
         Returns
         -------
@@ -805,14 +1111,10 @@ class TimetableExtractor:
         logger.info("=== Extraction start: '%s' ===", filename)
         t_start = time.time()
 
-        # Step 1 — raw text
-        document_text = self._extract_text(file_content, filename)
-        if not document_text.strip():
-            raise ExtractionError(f"No text could be extracted from '{filename}'")
-        logger.info("Raw text: %d chars", len(document_text))
-
-        # Step 2 — LLM extraction (cached + chunked + async + two-stage)
-        raw_data, cache_hit = self._cached_extract(document_text)
+        # Steps 1+2 — raw text and LLM extraction (byte-keyed cache + chunked + async + two-stage)
+        raw_data, meta, cache_hit = await self._cached_extract(
+            file_content, filename, router.call if router is not None else None, progress, content_hash,
+        )
 
         # Step 3 — Pydantic validation
         timetable = self._validate(raw_data)
@@ -827,11 +1129,12 @@ class TimetableExtractor:
         timetable.extraction_info = ExtractionInfo(
             extracted_at = datetime.now().isoformat(),
             source_file  = filename,
-            text_length  = len(document_text),
-            model        = self.model,
+            text_length  = meta["text_length"],
+            model        = router.model_label() if router is not None else self.model,
             method       = "cerebras_two_stage_async",
-            chunks_used  = len(self._chunk_document(document_text)),
-            cache_hit    = cache_hit,
+            chunks_used   = meta["chunks_used"],
+            chunks_cached = meta.get("chunks_cached", 0),
+            cache_hit     = cache_hit,
         )
 
         logger.info(
@@ -839,3 +1142,27 @@ class TimetableExtractor:
             time.time() - t_start, cache_hit, timetable.extraction_info.chunks_used,
         )
         return timetable.model_dump()
+
+    def extract_timetable_data(
+        self,
+        file_content:  FileSource,
+        filename:      str,
+        college_name:  Optional[str] = None,
+        session:       Optional[str] = None,
+        router:        Optional[Any] = None,
+    ) -> Dict[str, Any]:
+        """
+        Blocking wrapper around :meth:`extract_timetable_data_async` for
+        scripts and worker threads. Must not be called from a running event
+        loop; async code awaits the async variant directly.
+        """
+        async def run() -> Dict[str, Any]:
+            try:
+                return await self.extract_timetable_data_async(
+                    file_content, filename, college_name, session, router,
+                )
+            finally:
+                # The transport pool is per loop and this loop is about to close
+                await llm_transport.aclose()
+
+        return asyncio.run(run())
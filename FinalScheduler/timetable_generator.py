@@ -3,7 +3,6 @@ import copy
 import json
 import random
 import numpy as np
-import pandas as pd
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional, Set, Callable
 from copy import deepcopy
@@ -12,6 +11,11 @@ import logging
 import threading
 import time
 
+from lazy_imports import lazy_module
+
+# pandas is only needed for CSV export
+pd = lazy_module("pandas")
+
 # Minimal logging - suppress warnings during initialization
 logging.basicConfig(level=logging.ERROR, format='%(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -104,8 +108,6 @@ class GenerationProgress:
                 progress['elapsed_time'] = str(datetime.now() - self.start_time)
             return progress
 
-generation_progress = GenerationProgress()
-
 class TimetableData:
     def __init__(self, config_file: str = None, config_dict: Dict = None, dynamic_events: List[Dict] = None):
         if config_dict:
@@ -1369,13 +1371,24 @@ class GeneticAlgorithm:
         self.best_solution: Optional[TimetableChromosome] = None
         self.generation_stats: List[Dict] = []
         self.progress_callback = progress_callback
+        # Per-run tracker so concurrent runs don't overwrite each other's progress
+        self.progress = GenerationProgress()
+
+    def _notify_progress(self):
+        """Push the current progress snapshot to the callback, if any"""
+        if self.progress_callback:
+            try:
+                self.progress_callback(self.progress.get_progress())
+            except Exception as e:
+                logger.error(f"Progress callback failed: {e}")
 
     def initialize_population(self):
         """Fast population initialization with progress tracking"""
         pop_size = min(30, int(self.data.ga_params.get('population_size', 30)))  # Reduced size
         self.population = []
         
-        generation_progress.update_initialization(0, pop_size)
+        self.progress.update_initialization(0, pop_size)
+        self._notify_progress()
         
         for i in range(pop_size):
             chromosome = TimetableChromosome(self.data)
@@ -1383,7 +1396,8 @@ class GeneticAlgorithm:
             self.population.append(chromosome)
             
             # Update initialization progress
-            generation_progress.update_initialization(i + 1, pop_size)
+            self.progress.update_initialization(i + 1, pop_size)
+            self._notify_progress()
             
             # Small sleep for responsiveness
             if i % 5 == 0:
@@ -1403,7 +1417,8 @@ class GeneticAlgorithm:
         best_fitness = float('-inf')
         stagnation_count = 0
 
-        generation_progress.update(0, generations, 0, 0, {}, "running", stagnation_count)
+        self.progress.update(0, generations, 0, 0, {}, "running", stagnation_count)
+        self._notify_progress()
 
         for generation in range(generations):
             # Sort population by fitness
@@ -1424,19 +1439,21 @@ class GeneticAlgorithm:
             avg_fitness = float(np.mean(fitness_scores))
 
             # Update progress frequently with stagnation info
-            generation_progress.update(
+            self.progress.update(
                 generation + 1, generations, best_fitness, avg_fitness,
                 current_best.constraint_violations, "running", stagnation_count
             )
+            self._notify_progress()
 
             # Early stopping check
             if stagnation_count >= stagnation_limit:
                 print(f"Early stopping at generation {generation}: No improvement for {stagnation_limit} generations")
-                generation_progress.update(
+                self.progress.update(
                     generation + 1, generations, best_fitness, avg_fitness,
                     self.best_solution.constraint_violations if self.best_solution else {},
                     "early_stopped", stagnation_count
                 )
+                self._notify_progress()
                 break
 
             # Small sleep for smooth progress
@@ -1466,14 +1483,15 @@ class GeneticAlgorithm:
 
         # Final update if not early stopped
         if stagnation_count < stagnation_limit:
-            generation_progress.update(
+            self.progress.update(
                 generations, generations, best_fitness, avg_fitness,
                 self.best_solution.constraint_violations if self.best_solution else {},
                 "completed", stagnation_count
             )
+            self._notify_progress()
         
         print(f"Evolution finished. Best fitness: {best_fitness:.2f}")
-        if generation_progress.early_stopped:
+        if self.progress.early_stopped:
             print(f"Early stopped due to stagnation after {stagnation_count} generations")
 
     def get_top_solutions(self, n: int = 3):
@@ -1519,7 +1537,7 @@ class GeneticAlgorithm:
         return self.get_top_solutions(3)
 
     def get_progress(self) -> dict:
-        return generation_progress.get_progress()
+        return self.progress.get_progress()
 
 class TimetableExporter:
     def __init__(self, solution: TimetableChromosome, data: TimetableData):
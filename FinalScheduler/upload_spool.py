@@ -0,0 +1,298 @@
+"""
+upload_spool.py
+===============
+Size limits and spooling for uploads, so they are never read into one bytes
+object.
+
+``UploadLimitMiddleware`` enforces the limit before the app sees the body.
+Starlette's multipart parser reads and spools the whole request before an
+endpoint runs, so a check in the endpoint comes too late. A declared
+``Content-Length`` over the limit is answered with 413 without reading
+anything. A body sent without one is counted as it arrives and cut off at
+the limit.
+
+``spool_upload`` then copies the upload into a ``SpooledUpload`` in one
+pass on a worker thread, hashing each block as it goes (SHA-256, the
+extraction cache key). Uploads up to ``UPLOAD_SPOOL_MEMORY_BYTES`` stay in
+memory. Larger ones go to a named temp file, and from then on the parsers
+get its path. Starlette's own spool file has no name (``O_TMPFILE``), so
+it cannot be handed to other processes. The named copy is what lets the
+PDF process pool open the document itself, instead of receiving a pickled
+copy of it for each worker. PyMuPDF, pdfplumber and pandas open the path
+too.
+
+``SpooledUpload.source`` is a ``FileSource``: the raw bytes, or a path.
+Resident memory per upload is therefore bounded by the spool threshold,
+not by the file size.
+
+Configuration (environment)
+---------------------------
+UPLOAD_SPOOL_MEMORY_BYTES   uploads larger than this go to disk   (default 2 MiB)
+UPLOAD_SPOOL_DIR            directory for spooled uploads         (default system temp dir)
+UPLOAD_CHUNK_BYTES          read/hash block size                  (default 1 MiB)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+from typing import Any, BinaryIO, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================================================
+# Constants
+# ===========================================================================
+
+SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(2 * 1024 * 1024)))
+SPOOL_DIR          = os.getenv("UPLOAD_SPOOL_DIR") or None
+CHUNK_BYTES        = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Raw upload bytes, or the path of a spooled upload on disk
+FileSource = Union[bytes, str]
+
+
+class UploadTooLarge(ValueError):
+    """Raised as soon as an upload exceeds its size limit."""
+
+    def __init__(self, size: int, max_bytes: int) -> None:
+        super().__init__(f"Upload exceeds {max_bytes} bytes (read {size})")
+        self.size      = size
+        self.max_bytes = max_bytes
+
+
+# ===========================================================================
+# FileSource helpers
+# ===========================================================================
+
+def readable(source: FileSource) -> Union[BinaryIO, str]:
+    """Something pandas / pdfplumber can open: the path itself, or a buffer over the bytes."""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+
+def read_source(source: FileSource) -> bytes:
+    """The whole content; only for formats that are parsed from one buffer (JSON)."""
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            return fh.read()
+    return source
+
+
+def source_size(source: FileSource) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+def hash_source(source: FileSource, block: int = CHUNK_BYTES) -> "hashlib._Hash":
+    """Running SHA-256 of the content, read block by block for a path."""
+    if not isinstance(source, str):
+        return hashlib.sha256(source)
+    h = hashlib.sha256()
+    with open(source, "rb") as fh:
+        for data in iter(lambda: fh.read(block), b""):
+            h.update(data)
+    return h
+
+
+# ===========================================================================
+# Spool
+# ===========================================================================
+
+class SpooledUpload:
+    """Size-capped, incrementally hashed upload kept in memory or in a named temp file."""
+
+    def __init__(
+        self,
+        max_bytes:    int,
+        memory_bytes: int           = SPOOL_MEMORY_BYTES,
+        directory:    Optional[str] = SPOOL_DIR,
+        suffix:       str           = "",
+    ) -> None:
+        self.max_bytes    = max_bytes
+        self.memory_bytes = memory_bytes
+        self.directory    = directory
+        self.suffix       = suffix
+        self.size         = 0
+        self.path:    Optional[str]        = None
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file:   Optional[BinaryIO]   = None
+        self._hash                         = hashlib.sha256()
+
+    @property
+    def on_disk(self) -> bool:
+        return self.path is not None
+
+    def write(self, data: bytes) -> None:
+        if self.size + len(data) > self.max_bytes:
+            raise UploadTooLarge(self.size + len(data), self.max_bytes)
+        self._hash.update(data)
+        self.size += len(data)
+        if self._file is None and self.size > self.memory_bytes:
+            self._rollover()
+        (self._file or self._buffer).write(data)
+
+    def _rollover(self) -> None:
+        fd, path = tempfile.mkstemp(prefix="upload-", suffix=self.suffix, dir=self.directory)
+        self._file = os.fdopen(fd, "wb")
+        self.path  = path
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+        logger.debug("Upload spooled to %s", path)
+
+    def finish(self) -> None:
+        """Flush to disk; call once the last block has been written."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def copy_from(self, raw: BinaryIO, block: int = CHUNK_BYTES) -> None:
+        """Copy a readable file object from its start, then finish (blocking; run in a thread)."""
+        raw.seek(0)
+        for data in iter(lambda: raw.read(block), b""):
+            self.write(data)
+        self.finish()
+
+    # ------------------------------------------------------------------ #
+    # Access                                                               #
+    # ------------------------------------------------------------------ #
+
+    @property
+    def source(self) -> FileSource:
+        return self.path if self.path is not None else self._buffer.getvalue()
+
+    def hasher(self) -> "hashlib._Hash":
+        """Copy of the running SHA-256 (extend it with key qualifiers without re-reading)."""
+        return self._hash.copy()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        """Discard the content and remove the spool file, if any."""
+        self.finish()
+        self._buffer = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+async def spool_upload(upload: Any, max_bytes: int, block: int = CHUNK_BYTES) -> SpooledUpload:
+    """
+    Spool an UploadFile-like object. A declared size over the limit is
+    refused before anything is read; otherwise ``UploadTooLarge`` is raised
+    at the first block past the limit. Starlette's file (``upload.file``) is
+    copied in one pass on a worker thread; other objects are read with
+    ``await upload.read(n)``.
+    """
+    declared = getattr(upload, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(declared, max_bytes)
+
+    suffix = os.path.splitext(getattr(upload, "filename", None) or "")[1].lower()
+    spool  = SpooledUpload(max_bytes, suffix=suffix)
+    raw    = getattr(upload, "file", None)
+    try:
+        if raw is not None:
+            await asyncio.to_thread(spool.copy_from, raw, block)
+            return spool
+        while True:
+            data = await upload.read(block)
+            if not data:
+                break
+            if spool.on_disk or spool.size + len(data) > spool.memory_bytes:
+                await asyncio.to_thread(spool.write, data)
+            else:
+                spool.write(data)
+        await asyncio.to_thread(spool.finish)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+# ===========================================================================
+# Request size limit
+# ===========================================================================
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping request bodies on ``paths`` at ``max_bytes``,
+    before the app (and its multipart parser) reads them. Responds 413 with
+    a JSON ``detail`` like an HTTPException would.
+    """
+
+    def __init__(self, app: Any, max_bytes: int, paths: Iterable[str] = (), detail: str = "Request too large") -> None:
+        self.app       = app
+        self.max_bytes = max_bytes
+        self.paths     = frozenset(paths)
+        self.detail    = detail
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or (self.paths and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope.get("headers") or ()).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            logger.info("Rejected %s: Content-Length %s > %d", scope["path"], declared.decode(), self.max_bytes)
+            await self._reject(send)
+            return
+
+        received = 0
+        over     = False
+        rejected = False
+
+        async def capped_receive() -> Any:
+            # Past the limit the app sees a disconnect, so it stops reading the body
+            nonlocal received, over
+            if over:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    logger.info("Rejected %s: body passed %d bytes", scope["path"], self.max_bytes)
+                    over = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Any) -> None:
+            # The app's own reply to the disconnect is replaced by the 413
+            nonlocal rejected
+            if not over:
+                await send(message)
+            elif not rejected:
+                rejected = True
+                await self._reject(send)
+
+        try:
+            await self.app(scope, capped_receive, guarded_send)
+        except Exception:
+            if not over:
+                raise
+        if over and not rejected:
+            await self._reject(send)
+
+    async def _reject(self, send: Any) -> None:
+        body = json.dumps({"detail": self.detail}).encode()
+        await send({
+            "type":    "http.response.start",
+            "status":  413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})